@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+batch_throughput
+----------------------------------
+
+Compares the chain steps per second of batch_mcmc, which advances many chains in lockstep,
+with those of a single mcmc_graph over the same nodes. Both start from the same graph and are
+run for a while before they are timed, so that they are timed on graphs from the chain rather
+than on the starting path.
+
+    $ python benchmarks/batch_throughput.py --nodes 100 --nodes 400 --chains 32
+"""
+
+import os
+import sys
+import json
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.batch import batch_mcmc
+from run_benchmarks import random_nodes
+
+
+def throughput(step, steps, chains, warm_up):
+	'''Chain steps per second of a function that advances chains chains by one step'''
+
+	for i in range(warm_up):
+		step()
+
+	start = time.perf_counter()
+	for i in range(steps):
+		step()
+
+	return chains * steps / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option('--nodes', multiple = True, type = int, default = [100, 400], show_default = True, help = 'number of nodes, may be repeated')
+@click.option('--chains', default = 32, show_default = True, help = 'chains in the batch')
+@click.option('--steps', default = 1000, show_default = True, help = 'timed steps of every chain')
+@click.option('--warm-up', default = 1000, show_default = True, help = 'steps of every chain before timing')
+@click.option('-T', 'T', default = 20.0, show_default = True, help = 'temperature of the chains')
+@click.option('--output', type = click.Path(dir_okay = False), help = 'JSON file to write the results to')
+def main(nodes, chains, steps, warm_up, T, output):
+	'''Times batch_mcmc against mcmc_graph'''
+
+	results = []
+	for n in nodes:
+		points = random_nodes(n, 2)
+		batch = batch_mcmc(points, chains, T = T, seed = 0)
+		single = mcmc_graph(points, T = T, keep_chain = False, seed = 0)
+
+		batched = throughput(batch.step, steps, chains, warm_up)
+		serial = throughput(single.predict_next, steps, 1, warm_up)
+
+		results.append(dict(nodes = n, chains = chains, batch = batched, single = serial, speedup = batched / serial))
+		click.echo('%5d nodes: batch %10.1f, single %10.1f chain steps/s, %.2fx' % (n, batched, serial, batched / serial))
+
+	if output:
+		with open(output, 'w') as f:
+			json.dump(dict(python = sys.version.split()[0], results = results), f, indent = 2)
+
+
+if __name__ == '__main__':
+	main()
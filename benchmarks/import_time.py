@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+import_time
+----------------------------------
+
+Measures how long a fresh interpreter takes to import each module of the package, and which
+of the heavy dependencies each import loads. Every measurement runs in a new process, so
+nothing is cached between them, and the median of several runs is reported.
+
+    $ python benchmarks/import_time.py --output import_time.json
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+import click
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = [
+	'mcmc_graph_simulator',
+	'mcmc_graph_simulator.cli',
+	'mcmc_graph_simulator.compact',
+	'mcmc_graph_simulator.mcmc_graph_simulator',
+	'mcmc_graph_simulator.sweep',
+	'mcmc_graph_simulator.tempering',
+]
+
+HEAVY = ['numpy', 'networkx', 'scipy', 'multiprocessing']
+
+PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+import %s
+seconds = time.perf_counter() - start
+print(json.dumps(dict(seconds = seconds, loaded = [m for m in %r if m in sys.modules])))
+'''
+
+
+def measure(module, repeats):
+	'''Median seconds to import module in a new interpreter, and the heavy modules it loaded'''
+
+	runs = []
+	for i in range(repeats):
+		output = subprocess.check_output([sys.executable, '-c', PROBE % (module, HEAVY)], cwd = ROOT)
+		runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+	seconds = sorted(run['seconds'] for run in runs)
+	return dict(module = module, seconds = seconds[len(seconds) // 2], loaded = runs[-1]['loaded'])
+
+
+@click.command()
+@click.option('--repeats', default = 7, show_default = True, help = 'imports of every module, the median is reported')
+@click.option('--output', type = click.Path(dir_okay = False), help = 'JSON file to write the results to')
+def main(repeats, output):
+	'''Times the import of every module of the package'''
+
+	results = []
+	for module in MODULES:
+		result = measure(module, repeats)
+		results.append(result)
+		click.echo('%-45s %8.1f ms   %s' % (module, 1000 * result['seconds'], ', '.join(result['loaded']) or '-'))
+
+	if output:
+		with open(output, 'w') as f:
+			json.dump(dict(python = sys.version.split()[0], results = results), f, indent = 2)
+
+
+if __name__ == '__main__':
+	main()
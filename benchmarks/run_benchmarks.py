@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+run_benchmarks
+----------------------------------
+
+Times the hot path of the simulator and writes the results as JSON.
+
+Every benchmark is run over three sweeps: the number of nodes, the dimension of the points,
+and the density of the graph the chain is in. Each benchmark reports operations per second and
+the peak memory a call of it allocates on top of the chain, and the node sweep gives the
+scaling exponent of every benchmark, the slope of log(time) against log(nodes).
+
+    $ python benchmarks/run_benchmarks.py --output results.json
+    $ python benchmarks/run_benchmarks.py --quick --compare results.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tracemalloc
+
+import click
+import numpy as np
+import networkx as nx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import mcmc_graph_simulator
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph, parallel_mcmc
+
+
+NODES = [10, 30, 100, 300, 1000, 2000]
+QUICK_NODES = [10, 30, 100]
+DIMENSIONS = [2, 3, 10]
+DENSITIES = [0.0, 0.05, 0.3]
+
+#the networkx functions copy or search the whole graph, so they are only timed on smaller graphs
+NETWORKX_LIMIT = 300
+
+
+def random_nodes(n, dimension, seed = 0):
+	'''The origin and n - 1 distinct random integer points'''
+
+	rng = np.random.default_rng(seed)
+	nodes = set([(0,) * dimension])
+	while len(nodes) < n:
+		nodes.add(tuple(int(x) for x in rng.integers(-10 * n, 10 * n, dimension)))
+
+	nodes.discard((0,) * dimension)
+	return [(0,) * dimension] + sorted(nodes)[:n - 1]
+
+
+def make_chain(n, dimension, density, seed = 0):
+	'''A chain whose graph has about density * n * (n - 1) / 2 edges, a path if density is 0'''
+
+	mcmc = mcmc_graph(random_nodes(n, dimension, seed), keep_chain = False, seed = seed)
+	state = mcmc.state
+	target = int(density * n * (n - 1) / 2)
+
+	rng = np.random.default_rng(seed)
+	while state.edge_count < target:
+		u, v = rng.integers(0, n, 2)
+		if u != v and not state.has_edge(u, v):
+			state.toggle(int(u), int(v))
+
+	mcmc._rebuild()
+	return mcmc
+
+
+def measure(operation, min_time = 0.2, max_repeats = 100000):
+	'''Seconds per call of operation, calling it until min_time has passed'''
+
+	repeats = 0
+	start = time.perf_counter()
+	elapsed = 0
+	while elapsed < min_time and repeats < max_repeats:
+		operation()
+		repeats += 1
+		elapsed = time.perf_counter() - start
+
+	return elapsed / repeats
+
+
+def peak_memory(operation):
+	'''Peak bytes allocated during one call of operation, not counting what was allocated before it'''
+
+	#tracing starts afresh for every operation, so each peak only covers its own allocations
+	tracemalloc.start()
+	try:
+		operation()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def benchmarks(mcmc, n, iterations):
+	'''The operations to time on a chain, by name, each a function of no arguments'''
+
+	operations = {}
+	operations['predict_next'] = mcmc.predict_next
+	operations['run'] = lambda: mcmc.run(iterations)
+
+	if n <= NETWORKX_LIMIT:
+		graph = mcmc.current_graph
+		anchor = mcmc.node0
+		operations['calculate_theta'] = lambda: mcmc.calculate_theta(graph, anchor, mcmc.r)
+		operations['get_bridges'] = lambda: mcmc.get_bridges(graph)
+		operations['get_longest_shortest_path'] = lambda: mcmc.get_longest_shortest_path(graph, anchor)
+		operations['mutate'] = lambda: mcmc.mutate(graph.copy(), mcmc.determine_mutation(graph))
+
+		graphs = [mcmc.state.to_networkx() for i in range(20)]
+		operations['quantile'] = lambda: mcmc.quantile(graphs)
+
+	return operations
+
+
+def run_case(n, dimension, density, iterations, min_time, parallel):
+	results = []
+
+	#peak memory is measured on a separate chain, since tracing allocations slows everything down
+	#and every operation is called once first, so that caches it fills on first use are not counted
+	mcmc = make_chain(n, dimension, density)
+	operations = benchmarks(mcmc, n, iterations)
+	for name, operation in operations.items():
+		operation()
+	peaks = dict((name, peak_memory(operation)) for name, operation in operations.items())
+
+	mcmc = make_chain(n, dimension, density)
+	for name, operation in benchmarks(mcmc, n, iterations).items():
+		seconds = measure(operation, min_time)
+		steps = iterations if name == 'run' else 1
+		results.append(dict(benchmark = name, nodes = n, dimension = dimension, density = density,
+			seconds = seconds, per_second = steps / seconds, peak_memory = peaks[name]))
+
+	if parallel:
+		nodes = random_nodes(n, dimension)
+		chains = parallel_mcmc(nodes, seed = 0, chains = 4, processes = 4)
+		seconds = measure(lambda: chains.run(iterations), min_time, 3)
+		results.append(dict(benchmark = 'parallel_mcmc.run', nodes = n, dimension = dimension, density = 0.0,
+			seconds = seconds, per_second = 4 * iterations / seconds, peak_memory = None))
+
+	return results
+
+
+def scaling(results):
+	'''Slope of log(seconds) against log(nodes) for every benchmark of the node sweep'''
+
+	exponents = {}
+	for name in sorted(set(r['benchmark'] for r in results)):
+		points = [(r['nodes'], r['seconds']) for r in results if r['benchmark'] == name and r['sweep'] == 'nodes']
+		if len(points) >= 2:
+			x, y = np.log(np.array(points, dtype = float)).T
+			exponents[name] = float(np.polyfit(x, y, 1)[0])
+
+	return exponents
+
+
+def compare(results, baseline):
+	'''Prints the speed of every case relative to the same case in an earlier run'''
+
+	old = dict(((r['benchmark'], r['sweep'], r['nodes'], r['dimension'], r['density']), r) for r in baseline['results'])
+	for r in results:
+		key = (r['benchmark'], r['sweep'], r['nodes'], r['dimension'], r['density'])
+		if key in old:
+			click.echo('%-28s %-10s n=%-5d d=%-3d density=%-5g %6.2fx' % (key + (r['per_second'] / old[key]['per_second'],)))
+
+
+@click.command()
+@click.option('--output', default = 'benchmark_results.json', help = 'JSON file to write the results to')
+@click.option('--quick', is_flag = True, help = 'only sweep up to 100 nodes')
+@click.option('--iterations', default = 1000, help = 'iterations of each end to end run')
+@click.option('--min-time', default = 0.2, help = 'seconds to time each case for')
+@click.option('--compare', 'baseline', type = click.Path(exists = True), help = 'earlier results to compare against')
+def main(output, quick, iterations, min_time, baseline):
+	'''Runs the benchmark sweeps'''
+
+	sweeps = []
+	for n in (QUICK_NODES if quick else NODES):
+		sweeps.append(('nodes', n, 2, 0.05))
+	for dimension in DIMENSIONS:
+		sweeps.append(('dimension', 100, dimension, 0.05))
+	for density in DENSITIES:
+		sweeps.append(('density', 100, 2, density))
+
+	results = []
+	for sweep, n, dimension, density in sweeps:
+		click.echo('%s: %d nodes, dimension %d, density %g' % (sweep, n, dimension, density))
+		for result in run_case(n, dimension, density, iterations, min_time, sweep == 'nodes' and n <= NETWORKX_LIMIT):
+			result['sweep'] = sweep
+			results.append(result)
+			peak = '%10.1f kB' % (result['peak_memory'] / 1024.0) if result['peak_memory'] is not None else ''
+			click.echo('\t%-28s %12.1f /s %s' % (result['benchmark'], result['per_second'], peak))
+
+	report = dict(
+		version = mcmc_graph_simulator.__version__,
+		python = platform.python_version(),
+		numpy = np.__version__,
+		networkx = nx.__version__,
+		machine = platform.platform(),
+		cpus = os.cpu_count(),
+		date = time.strftime('%Y-%m-%dT%H:%M:%S'),
+		results = results,
+		scaling = scaling(results))
+
+	with open(output, 'w') as f:
+		json.dump(report, f, indent = 2)
+
+	click.echo('scaling exponents:')
+	for name, exponent in report['scaling'].items():
+		click.echo('\t%-28s %.2f' % (name, exponent))
+
+	if baseline is not None:
+		with open(baseline) as f:
+			compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+from math import sqrt
+import numpy as np
+
+from .incremental import theta_engine
+from .bridges import bridge_index
+from .compact import compact_graph
+from .distance import distance_matrix
+from .edge_sets import edge_sets
+from .storage import chain_store, top_states
+from .observables import gelman_rubin
+
+
+class batch_mcmc:
+	'''Many independent chains over the same nodes, advanced together in lockstep.
+
+	The edges of every chain are kept as one K x E boolean array, with one row for each of the
+	K chains and one column for each of the E pairs of nodes, in the order of the condensed
+	upper triangle. Every step proposes a change to each chain at once: choosing to add or
+	remove, the change in the sum of the edge weights, the acceptance probability and the
+	acceptance test are all numpy operations over the whole batch, and so is picking a missing
+	pair, by drawing random pairs for every chain until each has drawn one that is not an edge.
+	No step reads a whole row of the array, so a step costs the same whatever the number of pairs.
+	Apart from the array itself nothing is kept for every pair: the nodes of a pair are worked out
+	from its position, and its weight is read from the distances when it is proposed, the same
+	way the shortest paths read it.
+
+	An edge to remove, or a missing edge of a graph with more than half of all pairs, is picked
+	from the edge_sets of its chain in constant time. The shortest paths from the anchor and the
+	bridges are updated chain by chain, with the same theta_engine and bridge_index that
+	mcmc_graph uses. Each chain follows the same Metropolis-Hastings rule as mcmc_graph, but draws
+	its random numbers differently, so it does not make the same moves as a mcmc_graph with the
+	same seed.
+	'''
+
+	def __init__(self, nodes, chains, r = 1, T = 1, distances = None, burn_in = 0, max_states = None, seed = None):
+		'''
+		Params
+		------
+		nodes : list of touples
+
+		chains : int
+			number of chains K
+
+		r : float
+		T : float
+			-both constants in the MCMC equations
+
+		distances : distance_matrix, optional
+			precomputed distances between the nodes
+
+		burn_in : int
+			number of states of each chain to discard at the start
+
+		max_states : int, optional
+			bound on the number of distinct states counted for each chain
+
+		seed : int, SeedSequence or numpy Generator, optional
+			seed for the random numbers of the whole batch
+		'''
+
+		self.r = r
+		self.T = T
+		self.chains = chains
+		self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+		self.nodes = [tuple(node) for node in nodes]
+		self.distances = distances if distances is not None else distance_matrix(self.nodes)
+		self.node0 = (0,)*len(self.nodes[0])
+
+		n = self.n = len(self.nodes)
+		self.pairs = n * (n - 1) // 2
+
+		self.states = []
+		self._theta = []
+		self._bridges = []
+		for k in range(chains):
+			state = compact_graph(self.nodes, self.distances, dense = False)
+			if self.node0 not in state.index:
+				raise ValueError("The origin must be one of the nodes")
+
+			for i in range(n - 1):
+				state.toggle(i, i+1)
+
+			self.states.append(state)
+
+		self._anchor = self.states[0].index[self.node0]
+
+		path = np.array([self._pair_index(i, i+1) for i in range(n - 1)], dtype = np.int64)
+		self.edges = np.zeros((chains, self.pairs), dtype = bool)
+		self.edges[:, path] = True
+		self.edge_count = np.full(chains, n - 1, dtype = np.int64)
+
+		self._edges = []
+		for state in self.states:
+			#r = 0 leaves only the sum of the shortest paths, the weights are summed for the whole batch
+			self._theta.append(theta_engine(state, self._anchor, 0, compact_graph.weight))
+			self._bridges.append(bridge_index(state))
+			self._edges.append(edge_sets(state, self._bridges[-1]))
+
+		self.sum_of_weights = np.full(chains, sum(self.distances.get(i, i+1) for i in range(n - 1)))
+		self.sum_of_paths = np.array([engine.theta for engine in self._theta])
+		self.bridge_count = np.array([len(bridges) for bridges in self._bridges], dtype = np.int64)
+
+		self.visits = [chain_store(False, burn_in, 1, max_states) for k in range(chains)]
+		self.keys = [self._key(k) for k in range(chains)]
+		self.steps = 0
+		self.accepted = np.zeros(chains, dtype = np.int64)
+
+		#running mean and variance of node0_connections, total_edges and longest_shortest_path for every chain
+		self.names = ['node0_connections', 'total_edges', 'longest_shortest_path']
+		self.count = 0
+		self.means = np.zeros((chains, 3))
+		self._m2 = np.zeros((chains, 3))
+
+		self._record(np.ones(chains, dtype = bool))
+
+	def _pair_index(self, i, j):
+		#position of the pair (i, j), i < j, in the condensed upper triangle
+		return i * self.n - i * (i + 1) // 2 + j - i - 1
+
+	def _pairs(self, index):
+		#the nodes i < j of every position in the condensed upper triangle, the inverse of _pair_index
+		n = self.n
+		index = np.asarray(index, dtype = np.int64)
+		i = n - 2 - np.floor(np.sqrt(4.0 * n * (n - 1) - 8.0 * index - 7) / 2 - 0.5).astype(np.int64)
+		#the square root can round across a row boundary
+		i -= (i * n - i * (i + 1) // 2 > index)
+		i += ((i + 1) * n - (i + 1) * (i + 2) // 2 <= index)
+		j = index - (i * n - i * (i + 1) // 2) + i + 1
+
+		return i, j
+
+	def _key(self, k):
+		return self._edges[k].key()
+
+	def _condensed(self, edge):
+		#position in the condensed upper triangle of the edge numbered i * n + j
+		i, j = divmod(edge, self.n)
+		return self._pair_index(i, j)
+
+	@property
+	def theta(self):
+		'''Theta value of the current graph of every chain'''
+
+		return self.r * self.sum_of_weights + self.sum_of_paths
+
+	def step(self):
+		'''Advances every chain by one Metropolis-Hastings step
+
+		Return
+		-----
+			boolean array, True for the chains whose proposal was accepted
+		'''
+
+		K = self.chains
+		n = self.n
+		E = self.pairs
+		uniforms = self.rng.random((3, K))
+
+		#propose adding or removing an edge in every chain, with the probabilities mcmc_graph uses
+		add = uniforms[0] < (E - self.edge_count) / float(E - (n - 1))
+
+		#pick uniformly among the edges that are not bridges, or among the missing pairs, from the
+		#edge sets when the graph is dense, and otherwise by drawing pairs until one is missing
+		choice = np.empty(K, dtype = np.int64)
+		drawing = []
+		for k, (adding, u) in enumerate(zip(add.tolist(), uniforms[1].tolist())):
+			sets = self._edges[k]
+			if not adding:
+				items = sets.removable.items
+			elif sets.absent is not None:
+				items = sets.absent.items
+			else:
+				drawing.append(k)
+				continue
+			choice[k] = self._condensed(items[int(u * len(items))])
+
+		rows = np.array(drawing, dtype = np.int64)
+		pairs = (uniforms[1, rows] * E).astype(np.int64)
+		taken = self.edges[rows, pairs]
+		while taken.any():
+			again = np.flatnonzero(taken)
+			pairs[again] = self.rng.integers(0, E, len(again))
+			taken[again] = self.edges[rows[again], pairs[again]]
+		choice[rows] = pairs
+
+		first, second = self._pairs(choice)
+		weights = np.array([self.distances.get(u, v) for u, v in zip(first.tolist(), second.tolist())])
+		delta = np.where(add, weights, -weights)
+		edges_i = self.edge_count
+		edges_j = edges_i + np.where(add, 1, -1)
+
+		#an added edge brings its far endpoint, and every child of it in the shortest path tree,
+		#closer to the anchor by at least the gap between the distances of the endpoints less the
+		#weight of the edge, and the bridges can only become fewer. That bounds the acceptance
+		#probability from above before any path is repaired, and a chain whose uniform is above
+		#the bound is rejected just as the full test would reject it. The weights are read the same
+		#way the shortest paths read them, and the slack covers the rounding of the float64 sums
+		#of the paths, which grows with theta
+		gaps = np.zeros(K)
+		for k in np.flatnonzero(add).tolist():
+			engine = self._theta[k]
+			u = int(first[k])
+			v = int(second[k])
+			du = engine.dist[u]
+			dv = engine.dist[v]
+			gaps[k] = (abs(du - dv) - weights[k]) * (1 + len(engine.children[v if dv > du else u]))
+
+		theta_i = self.theta
+		slack = 1e-9 + np.abs(theta_i) * 2.0**-40
+		with np.errstate(over = 'ignore', divide = 'ignore'):
+			bound = np.exp((self.r * delta - np.maximum(gaps, 0) + slack) / self.T) * (edges_j - (n - 1)) / (edges_j - self.bridge_count).astype(float)
+		skipped = add & (uniforms[2] > bound * (1 + 1e-9))
+
+		#the shortest paths and bridges of the other chains are repaired chain by chain
+		proposed_paths = self.sum_of_paths.copy()
+		proposed_bridges = self.bridge_count.copy()
+		for k in np.flatnonzero(~skipped).tolist():
+			u = int(first[k])
+			v = int(second[k])
+			state = self.states[k]
+			state.toggle(u, v)
+			proposed_paths[k] = self._theta[k].propose(state, u, v, state.weight(u, v), bool(add[k]))
+			proposed_bridges[k] = self._bridges[k].preview(state, u, v, bool(add[k]))
+
+		theta_j = self.r * (self.sum_of_weights + delta) + proposed_paths
+
+		with np.errstate(over = 'ignore'):
+			f_xi_xj = np.exp(-(theta_i - theta_j) / self.T)
+
+		#q_j_i / q_i_j of mcmc_graph._hastings_ratio, which for uniformly drawn pairs reduces to the
+		#number of edges above a spanning tree over the number of edges that are not bridges
+		with np.errstate(divide = 'ignore', invalid = 'ignore'):
+			ratio = np.where(add, (edges_j - (n - 1)) / (edges_j - proposed_bridges).astype(float),
+				(edges_i - self.bridge_count) / (edges_i - (n - 1)).astype(float))
+		accept = ~skipped & (uniforms[2] <= np.minimum(f_xi_xj * ratio, 1))
+
+		for k in np.flatnonzero(~skipped).tolist():
+			u = int(first[k])
+			v = int(second[k])
+
+			if accept[k]:
+				self._theta[k].accept()
+				became, stopped = self._bridges[k].accept()
+				self._edges[k].update(u, v, bool(add[k]), became, stopped)
+			else:
+				self.states[k].toggle(u, v)
+				self._theta[k].reject()
+				self._bridges[k].reject()
+
+		rows = np.flatnonzero(accept)
+		self.edges[rows, choice[rows]] = add[rows]
+		self.edge_count[rows] += np.where(add[rows], 1, -1)
+		self.sum_of_weights[rows] += delta[rows]
+		self.sum_of_paths[rows] = proposed_paths[rows]
+		self.bridge_count[rows] = proposed_bridges[rows]
+		self.accepted += accept
+
+		self._record(accept)
+
+		return accept
+
+	def _record(self, changed):
+		for k in np.flatnonzero(changed):
+			self.keys[k] = self._key(k)
+
+		for k in range(self.chains):
+			self.visits[k].record(self.keys[k])
+
+		self.steps += 1
+		if self.steps <= self.visits[0].burn_in:
+			return
+
+		values = np.empty((self.chains, 3))
+		values[:, 0] = [state.degree(self._anchor) for state in self.states]
+		values[:, 1] = self.edge_count
+		values[:, 2] = [engine.longest for engine in self._theta]
+
+		#Welford's algorithm for every chain at once
+		self.count += 1
+		delta = values - self.means
+		self.means += delta / self.count
+		self._m2 += delta * (values - self.means)
+
+	def summary(self):
+		'''Statistics of the tracked values over the whole batch
+
+		Return
+		-----
+			dictionary from each name to its mean over every chain, the spread of the chain
+			means, and the Gelman-Rubin R-hat across the chains
+		'''
+
+		variances = self._m2 / (self.count - 1) if self.count > 1 else np.full(self.means.shape, np.nan)
+
+		summary = {}
+		for i, name in enumerate(self.names):
+			chains = [dict(mean = self.means[k, i], variance = variances[k, i], count = self.count) for k in range(self.chains)]
+			spread = self.means[:, i].std(ddof = 1) / sqrt(self.chains) if self.chains > 1 else np.nan
+			summary[name] = dict(mean = self.means[:, i].mean(), mcse = spread, rhat = gelman_rubin(chains), count = self.count * self.chains)
+
+		return summary
+
+	def run(self, iterations):
+		'''Advances every chain by the given number of iterations
+
+		Return
+		-----
+			The same statistics as mcmc_graph.run, with the expected values averaged over every chain
+			and the top 1% of graphs taken from the visits of all chains together
+		'''
+
+		for i in range(iterations):
+			self.step()
+
+		counts = {}
+		total = 0
+		for visits in self.visits:
+			total += visits.recorded
+			for key, count in visits.counts.items():
+				counts[key] = counts.get(key, 0) + count
+
+		means = self.means.mean(0)
+		state = self.states[0]
+		top = [state.to_networkx(key) for key in top_states(counts, total)]
+
+		return [means[0], means[1], means[2], top]
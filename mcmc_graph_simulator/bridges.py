@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+
+def two_edge_components(graph, nodes = None, allowed = None):
+	'''Finds the bridges and the 2-edge-connected components of a graph in O(N + E).
+
+	Uses an iterative version of Tarjan's low-link depth first search, so the graph is
+	only read, never modified.
+
+	Parameters
+	-----
+		graph: networkx Graph, or any mapping from a node to its neighbours
+
+		nodes: iterable, optional
+			nodes to start the search from, defaults to every node in graph
+
+		allowed: set, optional
+			if given, the search stays inside this set of nodes
+
+	Return
+	-----
+		bridges: list
+			List of edges that are bridges
+
+		components: list
+			List of sets of nodes, one for each 2-edge-connected component
+	'''
+
+	if nodes is None:
+		nodes = graph
+
+	index = {}
+	low = {}
+	stack = []
+	bridges = []
+	components = []
+	counter = 0
+
+	for root in nodes:
+		if root in index:
+			continue
+
+		index[root] = low[root] = counter
+		counter += 1
+		stack.append(root)
+		work = [(root, None, iter(graph[root]))]
+
+		while work:
+			node, parent, neighbors = work[-1]
+
+			descended = False
+			for neighbor in neighbors:
+				if neighbor == parent or (allowed is not None and neighbor not in allowed):
+					continue
+
+				if neighbor in index:
+					if index[neighbor] < low[node]:
+						low[node] = index[neighbor]
+				else:
+					index[neighbor] = low[neighbor] = counter
+					counter += 1
+					stack.append(neighbor)
+					work.append((neighbor, node, iter(graph[neighbor])))
+					descended = True
+					break
+
+			if descended:
+				continue
+
+			work.pop()
+
+			if low[node] == index[node]:
+				#node is the first vertex of its component that the search reached
+				component = set()
+				while True:
+					member = stack.pop()
+					component.add(member)
+					if member == node:
+						break
+
+				components.append(component)
+
+				if parent is not None:
+					bridges.append((parent, node))
+
+			if parent is not None and low[node] < low[parent]:
+				low[parent] = low[node]
+
+	return bridges, components
+
+
+def _edge(u, v):
+	return (u, v) if u <= v else (v, u)
+
+
+class bridge_index:
+	'''Bridges of a connected graph that changes one edge at a time.
+
+	The graph is summarised by its bridge tree: every 2-edge-connected component is a vertex,
+	and every bridge joins two of them. This makes the changes local:
+
+		* adding an edge merges the components along the tree path between its endpoints,
+		  and those path edges stop being bridges
+
+		* removing a non-bridge can only create new bridges inside its own component, so
+		  only that component is searched again
+
+	Like theta_engine, a change is previewed first, and then accepted or rejected.
+	'''
+
+	def __init__(self, graph):
+		'''
+		Params
+		------
+		graph : networkx Graph, or any mapping from a node to its neighbours
+			connected graph to index
+		'''
+
+		self.rebuild(graph)
+
+	def rebuild(self, graph):
+		'''Recomputes the index from scratch, discarding any pending preview.'''
+
+		bridges, components = two_edge_components(graph)
+
+		self.graph = graph
+		self.bridges = set()
+		self.component = {}
+		self.members = {}
+		self.tree = {}
+		self._pending = None
+		self._next_id = 0
+
+		for members in components:
+			self._add_component(members)
+
+		for u, v in bridges:
+			self._add_bridge(u, v)
+
+	def __len__(self):
+		return len(self.bridges)
+
+	def is_bridge(self, u, v):
+		return _edge(u, v) in self.bridges
+
+	def preview(self, graph, u, v, add):
+		'''Counts the bridges of a graph that differs from the indexed one by a single edge.
+
+		Parameters
+		-----
+			graph: networkx Graph
+				the proposed graph, with the edge (u, v) already added or removed
+
+			u, v: tuple
+				endpoints of the changed edge
+
+			add: boolean
+				True if the edge was added, False if it was removed
+
+		Return
+		-----
+			Number of bridges in the proposed graph
+		'''
+
+		cu = self.component[u]
+		cv = self.component[v]
+
+		if add:
+			if cu == cv:
+				self._pending = (graph, None)
+				return len(self.bridges)
+
+			path = self._tree_path(cu, cv)
+			self._pending = (graph, self._merge, path)
+
+			return len(self.bridges) - (len(path) - 1)
+
+		if cu != cv:
+			#the removed edge was a bridge, so the graph is no longer connected
+			self._pending = (graph, self._cut, u, v)
+			return len(self.bridges) - 1
+
+		new_bridges, components = two_edge_components(graph, [u], self.members[cu])
+		self._pending = (graph, self._split, cu, new_bridges, components)
+
+		return len(self.bridges) + len(new_bridges)
+
+	def accept(self):
+		'''Applies the last previewed change to the index
+
+		Return
+		-----
+			became: list
+				edges that are now bridges
+
+			stopped: list
+				edges that are no longer bridges, including a removed bridge
+		'''
+
+		if self._pending is None:
+			return [], []
+
+		pending = self._pending
+		self._pending = None
+		self.graph = pending[0]
+
+		if pending[1] is None:
+			return [], []
+
+		return pending[1](*pending[2:])
+
+	def reject(self):
+		'''Discards the last previewed change'''
+
+		self._pending = None
+
+	def _tree_path(self, start, end):
+		#breadth first search through the bridge tree
+		previous = {start: None}
+		queue = [start]
+		for c in queue:
+			if c == end:
+				break
+			for neighbor in self.tree[c]:
+				if neighbor not in previous:
+					previous[neighbor] = c
+					queue.append(neighbor)
+
+		path = [end]
+		while previous[path[-1]] is not None:
+			path.append(previous[path[-1]])
+
+		return path
+
+	def _merge(self, path):
+		target = max(path, key = lambda c: len(self.members[c]))
+
+		#the bridges along the path are now part of a cycle
+		stopped = []
+		for a, b in zip(path, path[1:]):
+			bridge = self.tree[a].pop(b)
+			del self.tree[b][a]
+			self.bridges.discard(bridge)
+			stopped.append(bridge)
+
+		#fold the other components into the largest one, along with their tree edges
+		for c in path:
+			if c == target:
+				continue
+
+			members = self.members.pop(c)
+			for member in members:
+				self.component[member] = target
+			self.members[target].update(members)
+
+			for neighbor, bridge in self.tree.pop(c).items():
+				del self.tree[neighbor][c]
+				self.tree[neighbor][target] = bridge
+				self.tree[target][neighbor] = bridge
+
+		return [], stopped
+
+	def _split(self, c, new_bridges, components):
+		del self.members[c]
+		old_tree = self.tree.pop(c)
+
+		for members in components:
+			self._add_component(members)
+
+		for u, v in new_bridges:
+			self._add_bridge(u, v)
+
+		#reattach the bridges that used to end at the old component
+		for neighbor, bridge in old_tree.items():
+			del self.tree[neighbor][c]
+			self._add_bridge(*bridge)
+
+		return [_edge(u, v) for u, v in new_bridges], []
+
+	def _cut(self, u, v):
+		cu = self.component[u]
+		cv = self.component[v]
+
+		self.bridges.discard(_edge(u, v))
+		del self.tree[cu][cv]
+		del self.tree[cv][cu]
+
+		return [], [_edge(u, v)]
+
+	def _add_component(self, members):
+		c = self._next_id
+		self._next_id += 1
+
+		self.members[c] = members
+		self.tree[c] = {}
+		for member in members:
+			self.component[member] = c
+
+		return c
+
+	def _add_bridge(self, u, v):
+		bridge = _edge(u, v)
+		cu = self.component[u]
+		cv = self.component[v]
+
+		self.bridges.add(bridge)
+		self.tree[cu][cv] = bridge
+		self.tree[cv][cu] = bridge
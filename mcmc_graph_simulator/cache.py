@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from functools import reduce
+
+MASK = 2**64 - 1
+
+
+def edge_hash(edge):
+	'''64 bit hash of an edge number i * n + j, the splitmix64 finaliser.
+
+	The hash of a graph is the xor of the hashes of its edges, so it does not depend on the order
+	of the edges, and adding or removing an edge changes it in constant time.
+	'''
+
+	z = (edge + 0x9E3779B97F4A7C15) & MASK
+	z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+	z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+
+	return z ^ (z >> 31)
+
+
+def state_hash(edges):
+	'''Hash of a graph from the numbers of its edges, see edge_hash'''
+
+	return reduce(lambda h, edge: h ^ edge_hash(edge), edges, 0)
+
+
+class state_cache:
+	'''Bounded cache of the values of graphs a chain has proposed, keyed by the hash of the graph.
+
+	Near equilibrium, and at low temperatures especially, a chain keeps proposing the same few
+	graphs from the same current graph and rejecting them. Each entry holds the theta, the number
+	of bridges and the longest shortest path of a graph, the longest shortest path being None
+	until the graph has been the current one. When the cache is full, the least recently used
+	entry is dropped. Keys are 64 bit hashes rather than whole edge lists, so two graphs share an
+	entry with a probability of about one in 2**64 per pair.
+	'''
+
+	def __init__(self, max_size = 65536):
+		'''
+		Params
+		------
+		max_size : int
+			largest number of graphs kept
+		'''
+
+		self.max_size = max_size
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self, key):
+		return key in self.entries
+
+	def get(self, key):
+		'''The entry of a graph, counted as a hit or a miss
+
+		Return
+		-----
+			list of theta, bridges and longest shortest path, or None if the graph is not cached
+		'''
+
+		entry = self.entries.get(key)
+
+		if entry is None:
+			self.misses += 1
+			return None
+
+		self.hits += 1
+		self.entries.move_to_end(key)
+
+		return entry
+
+	def put(self, key, theta, bridges, longest = None):
+		'''Stores the values of a graph, dropping the least recently used graph if the cache is full'''
+
+		self.entries[key] = [theta, bridges, longest]
+		self.entries.move_to_end(key)
+
+		if len(self.entries) > self.max_size:
+			self.entries.popitem(last = False)
+
+	@property
+	def hit_rate(self):
+		'''Fraction of the lookups that found their graph'''
+
+		lookups = self.hits + self.misses
+		return self.hits / float(lookups) if lookups else float('nan')
+
+	def clear(self):
+		'''Drops every entry and sets the counters back to zero'''
+
+		self.entries.clear()
+		self.hits = 0
+		self.misses = 0
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import numpy as np
+
+VERSION = 1
+
+
+def write_checkpoint(path, meta, arrays):
+	'''Writes a checkpoint atomically, as an uncompressed numpy .npz file
+
+	The file is first written next to path and then renamed over it, so an interrupted write
+	never leaves a damaged checkpoint behind, the previous one stays in place.
+
+	Parameters
+	-----
+		path: str
+
+		meta: dict
+			small values that can be written as JSON
+
+		arrays: dict
+			numpy arrays, by name
+	'''
+
+	directory = os.path.dirname(os.path.abspath(path))
+	temporary = os.path.join(directory, '.' + os.path.basename(path) + '.tmp')
+
+	meta = dict(meta, version = VERSION)
+
+	try:
+		with open(temporary, 'wb') as f:
+			np.savez(f, meta = np.array(json.dumps(meta)), **arrays)
+			f.flush()
+			os.fsync(f.fileno())
+
+		os.replace(temporary, path)
+	except BaseException:
+		if os.path.exists(temporary):
+			os.remove(temporary)
+		raise
+
+
+def read_checkpoint(path):
+	'''Reads a checkpoint written by write_checkpoint
+
+	Return
+	-----
+		meta: dict
+
+		arrays: dict
+	'''
+
+	with np.load(path, allow_pickle = False) as data:
+		arrays = dict((name, data[name]) for name in data.files)
+
+	meta = json.loads(str(arrays.pop('meta')))
+	if meta.get('version') != VERSION:
+		raise ValueError("Unsupported checkpoint version")
+
+	return meta, arrays
+
+
+def pack_keys(keys, dtype):
+	'''Packs state keys of different lengths into two arrays
+
+	Return
+	-----
+		edges: numpy array
+			the edge numbers of every key, one after another
+
+		offsets: numpy array
+			edges[offsets[i]:offsets[i+1]] are the edge numbers of key i
+	'''
+
+	dtype = np.dtype(dtype)
+	lengths = [len(key) // dtype.itemsize for key in keys]
+	offsets = np.zeros(len(keys) + 1, dtype = np.int64)
+	np.cumsum(lengths, out = offsets[1:])
+
+	edges = np.frombuffer(b''.join(keys), dtype = dtype) if keys else np.zeros(0, dtype = dtype)
+
+	return edges, offsets
+
+
+def unpack_keys(edges, offsets):
+	'''Keys packed by pack_keys'''
+
+	data = edges.tobytes()
+	size = edges.dtype.itemsize
+
+	return [data[offsets[i] * size:offsets[i+1] * size] for i in range(len(offsets) - 1)]
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import math
+
+import click
+
+#the simulator itself, and numpy and networkx with it, are only imported once a run starts,
+#so that --help and argument errors return straight away
+
+
+def load_nodes(path, add_origin = False):
+	'''Reads node coordinates, one node per row, from a .npy file or a CSV file with an optional header
+
+	Parameters
+	-----
+		path: str
+
+		add_origin: boolean
+			True to add the origin as the first node if it is not one of the nodes
+
+	Return
+	-----
+		list of tuples, of ints if every coordinate is a whole number
+	'''
+
+	import numpy as np
+
+	if path.endswith('.npy'):
+		coordinates = np.load(path, allow_pickle = False)
+	else:
+		with open(path) as f:
+			first = f.readline()
+
+		try:
+			[float(x) for x in first.split(',')]
+			header = 0
+		except ValueError:
+			header = 1
+
+		coordinates = np.loadtxt(path, delimiter = ',', skiprows = header, ndmin = 2)
+
+	if coordinates.ndim != 2:
+		raise click.BadParameter("expected one row of coordinates per node", param_hint = 'NODES')
+
+	if np.all(coordinates == np.round(coordinates)):
+		coordinates = coordinates.astype(np.int64)
+
+	nodes = [tuple(row) for row in coordinates.tolist()]
+	origin = (0,) * coordinates.shape[1]
+
+	if add_origin and origin not in nodes:
+		nodes.insert(0, origin)
+
+	return nodes
+
+
+def _edges(graph):
+	return [[list(u), list(v)] for u, v in graph.edges()]
+
+
+def _finite(value):
+	#JSON has no NaN or infinity, statistics that are not defined yet are written as null
+	if isinstance(value, dict):
+		return dict((key, _finite(item)) for key, item in value.items())
+	if isinstance(value, (list, tuple)):
+		return [_finite(item) for item in value]
+	if isinstance(value, float) and not math.isfinite(value):
+		return None
+
+	return value
+
+
+def _parameters(mcmc):
+	#the options a chain loaded from a checkpoint actually runs with, which replace those given
+	local = mcmc._local
+	return dict(r = mcmc.r, T = mcmc.T, seed = None, burn_in = mcmc.visits.burn_in, max_states = mcmc.visits.max_states,
+		neighbors = local.neighbors if local is not None else None, locality = local.locality if local is not None else None,
+		block_moves = mcmc.block_moves, block_size = mcmc.block_size, target_acceptance = mcmc.target_acceptance,
+		cache_size = mcmc.cache.max_size if mcmc.cache is not None else None, backend = mcmc.backend)
+
+
+@click.command()
+@click.argument('nodes', type = click.Path(exists = True, dir_okay = False))
+@click.option('-r', default = 1.0, show_default = True, help = 'weight of the sum of the edge weights in theta')
+@click.option('-T', 'T', default = 1.0, show_default = True, help = 'temperature')
+@click.option('-n', '--iterations', default = 10000, show_default = True, help = 'iterations of each chain')
+@click.option('--chains', default = 1, show_default = True, help = 'number of chains, more than one runs them in worker processes')
+@click.option('--processes', type = int, help = 'number of worker processes, defaults to the number of CPUs')
+@click.option('--seed', type = int, help = 'seed of the run')
+@click.option('--burn-in', default = 0, show_default = True, help = 'states to discard at the start of each chain')
+@click.option('--max-states', type = int, help = 'bound on the number of distinct states counted')
+@click.option('--neighbors', type = int, help = 'propose the edges to add mostly between each node and this many nearest neighbors')
+@click.option('--locality', default = 0.9, show_default = True, help = 'with --neighbors, probability of proposing an edge between neighbors')
+@click.option('--block-moves', default = 0.0, show_default = True, help = 'probability that a step changes several edges at once')
+@click.option('--block-size', default = 2, show_default = True, help = 'number of edges a block move toggles')
+@click.option('--target-acceptance', type = float, help = 'adapt --block-size during the burn in to accept about this fraction of block moves')
+@click.option('--cache-size', type = int, help = 'remember the theta and bridges of up to this many proposed graphs')
+@click.option('--backend', type = click.Choice(['compact', 'sparse']), default = 'compact', show_default = True,
+	help = 'how theta is computed, sparse uses scipy and suits thousands of nodes')
+@click.option('--add-origin', is_flag = True, help = 'add the origin to the nodes if it is missing')
+@click.option('--checkpoint', type = click.Path(dir_okay = False), help = 'file to save checkpoints to, single chain only')
+@click.option('--checkpoint-every', default = 100000, show_default = True, help = 'iterations between checkpoints')
+@click.option('--resume', is_flag = True, help = 'continue from --checkpoint if it exists')
+@click.option('--trace', type = click.Path(dir_okay = False), help = 'file to write the whole chain to, single chain only')
+@click.option('--rel-mcse', type = float, help = 'stop once the relative standard error of every statistic is below this')
+@click.option('--min-ess', type = float, help = 'stop once the effective sample size of every statistic is above this')
+@click.option('--rhat', type = float, help = 'stop once R-hat across the chains is below this')
+@click.option('--check-every', default = 10000, show_default = True, help = 'iterations between convergence checks')
+@click.option('-o', '--output', type = click.Path(dir_okay = False), help = 'JSON file to write the results to, standard output by default')
+def main(nodes, r, T, iterations, chains, processes, seed, burn_in, max_states, neighbors, locality, block_moves, block_size, target_acceptance,
+		cache_size, backend, add_origin, checkpoint, checkpoint_every, resume, trace, rel_mcse, min_ess, rhat, check_every, output):
+	'''Runs the MCMC graph simulation over the nodes in NODES, a .csv or .npy file with one row of coordinates per node'''
+
+	if chains > 1 and (checkpoint or trace):
+		raise click.UsageError("--checkpoint and --trace need a single chain")
+
+	if trace and block_moves:
+		raise click.UsageError("--trace cannot record block moves")
+
+	if resume and not checkpoint:
+		raise click.UsageError("--resume needs --checkpoint")
+
+	if resume and trace and os.path.exists(checkpoint) and os.path.exists(trace):
+		raise click.UsageError("--trace would replace the trace of the run being resumed, trace the resumed run to a new file")
+
+	if rhat is not None and chains < 2:
+		raise click.UsageError("--rhat needs several chains")
+
+	from .mcmc_graph_simulator import mcmc_graph, parallel_mcmc
+	from .observables import convergence
+
+	points = load_nodes(nodes, add_origin)
+	stop = None
+	if rel_mcse is not None or min_ess is not None or rhat is not None:
+		stop = convergence(rel_mcse = rel_mcse, min_ess = min_ess, rhat = rhat, check_every = check_every)
+
+	result = dict(parameters = dict(nodes = os.path.abspath(nodes), r = r, T = T, iterations = iterations, chains = chains,
+		seed = seed, burn_in = burn_in, max_states = max_states, neighbors = neighbors, locality = locality if neighbors else None,
+		block_moves = block_moves, block_size = block_size, target_acceptance = target_acceptance, cache_size = cache_size,
+		backend = backend))
+
+	try:
+		if chains > 1:
+			simulation = parallel_mcmc(points, r, T, seed = seed, chains = chains, processes = processes, burn_in = burn_in, max_states = max_states,
+				neighbors = neighbors, locality = locality, block_moves = block_moves, block_size = block_size, target_acceptance = target_acceptance,
+				cache_size = cache_size, backend = backend)
+			stats = simulation.run(iterations, stop = stop)
+			result['iterations_run'] = simulation.iterations_run if stop is not None else [iterations] * chains
+
+		else:
+			if resume and os.path.exists(checkpoint):
+				mcmc = mcmc_graph.load_checkpoint(checkpoint)
+				result['parameters'].update(_parameters(mcmc))
+				result['parameters']['resumed_from'] = os.path.abspath(checkpoint)
+				result['parameters']['resumed_at'] = mcmc.iterations
+			else:
+				mcmc = mcmc_graph(points, r, T, keep_chain = False, burn_in = burn_in, max_states = max_states, seed = seed,
+					neighbors = neighbors, locality = locality, block_moves = block_moves, block_size = block_size, target_acceptance = target_acceptance,
+					cache_size = cache_size, backend = backend)
+
+			if trace:
+				mcmc.start_trace(trace)
+
+			stats = mcmc.run(max(iterations - mcmc.iterations, 0), stop = stop, checkpoint = checkpoint, checkpoint_every = checkpoint_every)
+			mcmc.stop_trace()
+
+			result['iterations_run'] = [mcmc.iterations]
+			result['summary'] = mcmc.summary()
+
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	result['node0_connections'] = float(stats[0])
+	result['total_edges'] = float(stats[1])
+	result['longest_shortest_path'] = float(stats[2])
+	result['top_states'] = [_edges(graph) for graph in stats[3]]
+
+	text = json.dumps(_finite(result), indent = 2, allow_nan = False)
+	if output:
+		with open(output, 'w') as f:
+			f.write(text + '\n')
+	else:
+		click.echo(text)
+
+
+if __name__ == '__main__':
+	main()
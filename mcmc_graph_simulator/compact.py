@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+from heapq import heappush, heappop
+import numpy as np
+
+from .lazy import lazy_module
+from .distance import distance_matrix
+
+nx = lazy_module('networkx')
+
+
+class compact_graph:
+	'''Graph over a fixed set of points, stored as arrays indexed by node number.
+
+	Nodes are the integers 0 to n - 1, in the order the points were given. The adjacency is a
+	symmetric uint8 matrix, with a set of neighbours kept next to it for each node so that
+	traversals do not have to scan whole rows. Edge weights are read from a precomputed
+	distance_matrix, so changing an edge never allocates a new graph.
+	'''
+
+	def __init__(self, nodes, distances = None, dense = True):
+		'''
+		Params
+		------
+		nodes : list of touples
+			coordinates of every node
+
+		distances : distance_matrix, optional
+			distances between the nodes, computed from the coordinates if not given
+
+		dense : boolean
+			False to only keep the neighbour sets, without the n x n adjacency matrix, which
+			takes n**2 bytes
+		'''
+
+		self.nodes = [tuple(node) for node in nodes]
+		self.index = dict((node, i) for i, node in enumerate(self.nodes))
+		self.n = len(self.nodes)
+
+		if distances is None:
+			distances = distance_matrix(self.nodes)
+		elif len(distances) != self.n:
+			raise ValueError("Distance matrix does not match the number of nodes")
+
+		self.distances = distances
+		self.adjacency = np.zeros((self.n, self.n), dtype = np.uint8) if dense else None
+		self.neighbors = [set() for i in range(self.n)]
+		self.edge_count = 0
+
+		#sorted edge numbers i * n + j (i < j) are stored with the smallest integer type that fits
+		self.key_dtype = np.int32 if self.n * self.n < 2**31 else np.int64
+
+	def __len__(self):
+		return self.n
+
+	def __iter__(self):
+		return iter(range(self.n))
+
+	def __getitem__(self, node):
+		return self.neighbors[node]
+
+	def has_edge(self, u, v):
+		return v in self.neighbors[u]
+
+	def degree(self, node):
+		return len(self.neighbors[node])
+
+	def weight(self, u, v):
+		return self.distances.get(u, v)
+
+	def edges(self):
+		'''List of (u, v) pairs, with u < v, of the edges in the graph'''
+
+		return [(u, v) for u in range(self.n) for v in self.neighbors[u] if u < v]
+
+	def toggle(self, u, v):
+		'''Adds the edge (u, v) if it is missing, or removes it if it is present.
+		Toggling the same edge again undoes the change.
+
+		Return
+		-----
+			True if the edge was added, False if it was removed
+		'''
+
+		if v in self.neighbors[u]:
+			self.neighbors[u].discard(v)
+			self.neighbors[v].discard(u)
+			if self.adjacency is not None:
+				self.adjacency[u, v] = self.adjacency[v, u] = 0
+			self.edge_count -= 1
+			return False
+
+		self.neighbors[u].add(v)
+		self.neighbors[v].add(u)
+		if self.adjacency is not None:
+			self.adjacency[u, v] = self.adjacency[v, u] = 1
+		self.edge_count += 1
+		return True
+
+	def key(self):
+		'''Hashable encoding of the current edges, equal for equal graphs
+
+		Return
+		-----
+			bytes of the sorted edge numbers i * n + j, with i < j
+		'''
+
+		if self.adjacency is None:
+			edges = np.array([u * self.n + v for u, v in self.edges()], dtype = self.key_dtype)
+			edges.sort()
+			return edges.tobytes()
+
+		return np.flatnonzero(np.triu(self.adjacency, 1)).astype(self.key_dtype).tobytes()
+
+	def to_networkx(self, key = None):
+		'''Exports a graph to networkx, using the original points as nodes
+
+		Parameters
+		-----
+			key: bytes, optional
+				a value returned by key(), defaults to the current edges
+
+		Return
+		-----
+			networkx Graph with a 'weight' attribute on every edge
+		'''
+
+		if key is None:
+			edges = self.edges()
+		else:
+			edges = [divmod(int(k), self.n) for k in np.frombuffer(key, dtype = self.key_dtype)]
+
+		graph = nx.Graph()
+		for u, v in edges:
+			graph.add_edge(self.nodes[u], self.nodes[v], weight = self.weight(u, v))
+
+		return graph
+
+
+def shortest_distances(graph, source):
+	'''Dijkstra distances from a source node to every node it can reach
+
+	Parameters
+	-----
+		graph: compact_graph
+
+		source: int
+
+	Return
+	-----
+		dictionary of node to distance
+	'''
+
+	dist = {}
+	heap = [(0, source)]
+	while heap:
+		d, node = heappop(heap)
+		if node in dist:
+			continue
+
+		dist[node] = d
+		for neighbor in graph.neighbors[node]:
+			if neighbor not in dist:
+				heappush(heap, (d + graph.weight(node, neighbor), neighbor))
+
+	return dist
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+#largest number of nodes stored in each form when the form is chosen automatically
+MAX_DENSE_NODES = 2048
+MAX_CONDENSED_NODES = 8192
+
+#memory the lazy form keeps distances in, whatever the number of points
+LAZY_CACHE_BYTES = 2**23
+
+#multiplier of Fibonacci hashing, which spreads edge numbers over the slots of the lazy cache
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+class distance_matrix:
+	'''Euclidean distances between every pair of a fixed set of points.
+
+	The distances are computed once with NumPy broadcasting, and stored in one of four forms:
+
+		* 'dense': an n x n float64 matrix
+
+		* 'condensed': the upper triangle as a flat float32 array, about a quarter of the memory
+
+		* 'lazy': nothing is stored up front, each distance is computed from the coordinates the
+		  first time it is read and kept in a cache of a fixed number of bytes
+
+		* 'direct': nothing is stored, every distance is computed from the coordinates when it
+		  is read, for chains that only read a few distances per step on very many points
+
+	By default the form is picked from the number of points.
+	'''
+
+	def __init__(self, coordinates, form = None, block_size = 256, cache_bytes = LAZY_CACHE_BYTES):
+		'''
+		Params
+		------
+		coordinates : array like
+			n x d array of points
+
+		form : str, optional
+			'dense', 'condensed', 'lazy' or 'direct'
+
+		block_size : int
+			number of rows computed at a time when the condensed form is built
+
+		cache_bytes : int
+			memory the lazy form keeps distances in, 16 bytes for each distance
+		'''
+
+		self.coordinates = np.ascontiguousarray(coordinates, dtype = float)
+
+		if self.coordinates.ndim != 2:
+			raise ValueError("Points are not of the same dimension")
+
+		self.n = len(self.coordinates)
+
+		if form is None:
+			if self.n <= MAX_DENSE_NODES:
+				form = 'dense'
+			elif self.n <= MAX_CONDENSED_NODES:
+				form = 'condensed'
+			else:
+				form = 'lazy'
+
+		self.form = form
+		self.block_size = block_size
+		self.cache_bytes = cache_bytes
+		self.matrix = None
+
+		if form == 'dense':
+			self.matrix = self.rows(0, self.n)
+			self.get = self.matrix.item
+
+		elif form == 'condensed':
+			self.matrix = np.empty(self.n * (self.n - 1) // 2, dtype = np.float32)
+			for start in range(0, self.n, block_size):
+				stop = min(start + block_size, self.n)
+				block = self.rows(start, stop)
+				for i in range(start, stop):
+					offset = self._offset(i)
+					self.matrix[offset:offset + self.n - i - 1] = block[i - start, i + 1:]
+			self.get = self._get_condensed
+
+		elif form == 'lazy':
+			self._lazy_cache()
+
+		elif form == 'direct':
+			self.get = self._get_direct
+
+		else:
+			raise ValueError("Unknown distance matrix form: %s" % form)
+
+	@classmethod
+	def from_arrays(cls, coordinates, matrix, form, block_size = 256, cache_bytes = LAZY_CACHE_BYTES):
+		'''Rebuilds a distance matrix around arrays computed by another one, for example arrays
+		in shared memory, without copying or recomputing them
+
+		Parameters
+		-----
+			coordinates: numpy array
+				the coordinates attribute of the original distance matrix
+
+			matrix: numpy array or None
+				the matrix attribute of the original distance matrix
+
+			form: str
+				the form of the original distance matrix
+		'''
+
+		self = cls.__new__(cls)
+		self.coordinates = coordinates
+		self.n = len(coordinates)
+		self.form = form
+		self.block_size = block_size
+		self.cache_bytes = cache_bytes
+		self.matrix = matrix
+
+		if form == 'dense':
+			self.get = matrix.item
+		elif form == 'condensed':
+			self.get = self._get_condensed
+		elif form == 'direct':
+			self.get = self._get_direct
+		else:
+			self._lazy_cache()
+
+		return self
+
+	def __len__(self):
+		return self.n
+
+	def rows(self, start, stop):
+		'''Distances from the points start to stop - 1 to every point, as a float64 array'''
+
+		if self.form == 'dense' and self.matrix is not None:
+			return self.matrix[start:stop]
+
+		block = self.coordinates[start:stop]
+		squared = np.zeros((len(block), self.n))
+		for k in range(self.coordinates.shape[1]):
+			squared += (block[:, k, None] - self.coordinates[None, :, k]) ** 2
+
+		return np.sqrt(squared)
+
+	def _offset(self, i):
+		#position of the pair (i, i + 1) in the condensed upper triangle
+		return i * self.n - i * (i + 1) // 2
+
+	def _get_condensed(self, i, j):
+		if i == j:
+			return 0.0
+		if i > j:
+			i, j = j, i
+
+		return float(self.matrix[self._offset(i) + j - i - 1])
+
+	def _get_direct(self, i, j):
+		difference = self.coordinates[i] - self.coordinates[j]
+		return float(np.sqrt(difference.dot(difference)))
+
+	def _lazy_cache(self):
+		#direct mapped: every pair has one slot, a power of two of them, and a miss overwrites it
+		bits = max(int(self.cache_bytes // 16).bit_length() - 1, 0)
+		self._shift = 64 - bits
+		self._keys = np.full(1 << bits, -1, dtype = np.int64)
+		self._values = np.zeros(1 << bits)
+		self.get = self._get_lazy
+
+	def _get_lazy(self, i, j):
+		if i > j:
+			i, j = j, i
+
+		key = i * self.n + j
+		slot = ((key * _GOLDEN) & 0xFFFFFFFFFFFFFFFF) >> self._shift if self._shift < 64 else 0
+
+		if self._keys.item(slot) == key:
+			return self._values.item(slot)
+
+		value = self._get_direct(i, j)
+		self._keys[slot] = key
+		self._values[slot] = value
+
+		return value
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from itertools import chain
+import numpy as np
+
+
+class indexed_set:
+	'''Set that can also pick a uniformly random element in O(1).
+
+	Elements are kept in a list, with a dictionary from each element to its position. An
+	element is removed by moving the last element of the list into its place.
+	'''
+
+	def __init__(self, items = ()):
+		self.items = list(items)
+		self.position = dict((item, i) for i, item in enumerate(self.items))
+
+	def __len__(self):
+		return len(self.items)
+
+	def __contains__(self, item):
+		return item in self.position
+
+	def __iter__(self):
+		return iter(self.items)
+
+	def add(self, item):
+		if item not in self.position:
+			self.position[item] = len(self.items)
+			self.items.append(item)
+
+	def discard(self, item):
+		i = self.position.pop(item, None)
+		if i is None:
+			return
+
+		last = self.items.pop()
+		if i < len(self.items):
+			self.items[i] = last
+			self.position[last] = i
+
+	def sample(self, rng):
+		'''Uniformly random element, using rng.integer'''
+
+		return self.items[rng.integer(len(self.items))]
+
+
+class edge_sets:
+	'''The edges of a compact_graph, split into indexed sets so that proposals take constant time.
+
+	Edges are numbered i * n + j, with i < j, the same numbers compact_graph.key uses. Present
+	edges are either removable or bridges, so a removable edge is sampled directly. Absent
+	edges are sampled by drawing random node pairs while at most half of all pairs are edges,
+	which takes fewer than two draws on average. Beyond that an indexed set of the absent
+	edges is built, and kept until the graph thins out to a quarter of all pairs again, so its
+	memory is only spent on dense graphs.
+	'''
+
+	def __init__(self, graph, bridges):
+		'''
+		Params
+		------
+		graph : compact_graph
+
+		bridges : bridge_index
+			index of the bridges of graph
+		'''
+
+		self.graph = graph
+		self.n = graph.n
+		self.pairs = self.n * (self.n - 1) // 2
+
+		self.bridges = indexed_set(self.edge_id(u, v) for u, v in bridges.bridges)
+		self.removable = indexed_set(self.edge_id(u, v) for u, v in graph.edges() if self.edge_id(u, v) not in self.bridges)
+		self.absent = None
+		self.retries = 0
+
+		self._check_density()
+
+	def edge_id(self, u, v):
+		if u > v:
+			u, v = v, u
+
+		return u * self.n + v
+
+	def pair(self, edge):
+		return divmod(edge, self.n)
+
+	def sample_absent(self, rng):
+		'''Uniformly random pair of nodes that is not an edge
+
+		Return
+		-----
+			(u, v) endpoints of the pair
+		'''
+
+		if self.absent is not None:
+			return self.pair(self.absent.sample(rng))
+
+		#at most half of the pairs are edges here, so this takes fewer than two tries on average
+		n = self.n
+		has_edge = self.graph.has_edge
+		while True:
+			u = rng.integer(n)
+			v = rng.integer(n)
+			if u != v and not has_edge(u, v):
+				return u, v
+
+			self.retries += 1
+
+	def sample_removable(self, rng):
+		'''Uniformly random edge that is not a bridge
+
+		Return
+		-----
+			(u, v) endpoints of the edge
+		'''
+
+		return self.pair(self.removable.sample(rng))
+
+	def update(self, u, v, added, became, stopped):
+		'''Records an accepted change of the graph
+
+		Parameters
+		-----
+			u, v: int
+				endpoints of the edge that was added or removed
+
+			added: boolean
+				True if the edge was added
+
+			became, stopped: list
+				the edges that became and stopped being bridges, as returned by bridge_index.accept
+		'''
+
+		edge = self.edge_id(u, v)
+
+		if added:
+			#adding an edge to a connected graph closes a cycle, so it is never a bridge
+			self.removable.add(edge)
+			if self.absent is not None:
+				self.absent.discard(edge)
+		else:
+			self.removable.discard(edge)
+			self.bridges.discard(edge)
+			if self.absent is not None:
+				self.absent.add(edge)
+
+		for a, b in stopped:
+			other = self.edge_id(a, b)
+			self.bridges.discard(other)
+			if other != edge:
+				self.removable.add(other)
+
+		for a, b in became:
+			other = self.edge_id(a, b)
+			self.removable.discard(other)
+			self.bridges.add(other)
+
+		self._check_density()
+
+	def key(self):
+		'''Same value as compact_graph.key, built from the edge sets in O(E log E) instead of scanning the adjacency matrix'''
+
+		edges = np.fromiter(chain(self.removable.items, self.bridges.items), self.graph.key_dtype, len(self.removable) + len(self.bridges))
+		edges.sort()
+
+		return edges.tobytes()
+
+	def _check_density(self):
+		edges = len(self.removable) + len(self.bridges)
+
+		if self.absent is None and edges > self.pairs // 2:
+			graph = self.graph
+			if graph.adjacency is not None:
+				missing = np.flatnonzero(np.triu(1 - graph.adjacency, 1)).tolist()
+			else:
+				missing = [u * self.n + v for u in range(self.n) for v in range(u + 1, self.n) if v not in graph.neighbors[u]]
+			self.absent = indexed_set(missing)
+
+		elif self.absent is not None and edges < self.pairs // 4:
+			self.absent = None
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+from heapq import heappush, heappop
+
+INF = float('inf')
+
+
+def _edge_weight(graph, u, v):
+	return graph[u][v]['weight']
+
+
+class theta_engine:
+	'''Keeps theta up to date for a graph that changes one edge at a time.
+
+	Rather than recomputing every shortest path after each mutation, the engine stores the
+	sum of the edge weights and the shortest path tree rooted at the anchor node, and only
+	repairs the part of the tree that an edge change can affect:
+
+		* adding an edge can only shorten paths, so a decrease-only Dijkstra is run from
+		  the endpoint that got closer to the anchor
+
+		* removing an edge that is not in the shortest path tree changes nothing, otherwise
+		  only the subtree hanging below that edge is invalidated and recomputed
+
+	A change is first proposed, possibly extended by more edges, and then either accepted or
+	rejected as a whole. Rejecting restores the previous distances from an undo log.
+
+	The same distances also give the longest shortest path from the anchor, which is cached
+	until the graph changes, so a rejected proposal keeps the value of the current graph.
+	'''
+
+	def __init__(self, graph, anchor, r = 1, weight = None):
+		'''
+		Params
+		------
+		graph : networkx Graph or compact_graph
+			connected graph, iterating over graph[node] gives the neighbours of node
+
+		anchor : tuple or int
+			node that all of the shortest paths are measured from
+
+		r : float
+			weight given to the sum of the edge weights
+
+		weight : function, optional
+			weight(graph, u, v) returns the weight of an edge, defaults to the 'weight' attribute
+		'''
+
+		self.graph = graph
+		self.anchor = anchor
+		self.r = r
+		self._weight = weight or _edge_weight
+		self._undo = None
+
+		self.refresh()
+
+	def refresh(self):
+		'''Recomputes all of the state from scratch, discarding any pending proposal.'''
+
+		graph = self.graph
+
+		self.sum_of_weights = 0
+		for u in graph:
+			for v in graph[u]:
+				if u < v:
+					self.sum_of_weights += self._weight(graph, u, v)
+
+		self.dist = dict.fromkeys(graph, INF)
+		self.parent = dict.fromkeys(graph)
+		self.children = dict((n, set()) for n in graph)
+		self.sum_of_paths = 0
+		self.unreachable = len(self.dist)
+		self._longest = None
+		self._undo = None
+
+		self._relax([(0, self.anchor, None)], None)
+
+	@property
+	def theta(self):
+		'''Theta value of the graph the engine currently describes'''
+
+		if self.unreachable:
+			return INF
+
+		return self.r * self.sum_of_weights + self.sum_of_paths
+
+	@property
+	def longest(self):
+		'''Length of the longest shortest path from the anchor in the graph the engine currently describes'''
+
+		if self._longest is None:
+			self._longest = max(self.dist.values())
+
+		return self._longest
+
+	@longest.setter
+	def longest(self, value):
+		#a value already known for the current graph, for example from a state_cache
+		self._longest = value
+
+	def propose(self, graph, u, v, weight, add):
+		'''Updates the state for a graph that differs from the current one by a single edge.
+
+		Parameters
+		-----
+			graph: networkx Graph or compact_graph
+				the proposed graph, with the edge (u, v) already added or removed
+
+			u, v: tuple or int
+				endpoints of the changed edge
+
+			weight: float
+				weight of the changed edge
+
+			add: boolean
+				True if the edge was added, False if it was removed
+
+		Return
+		-----
+			Theta value of the proposed graph
+		'''
+
+		self._undo = (self.graph, self.sum_of_weights, self.sum_of_paths, self.unreachable, self._longest, [])
+
+		return self.extend(graph, u, v, weight, add)
+
+	def extend(self, graph, u, v, weight, add):
+		'''Changes one more edge of the graph of the pending proposal, so that several edges are
+		accepted or rejected together. The parameters are the same as those of propose, the graph
+		differing from the last one proposed by the single edge (u, v). The graph may be
+		disconnected along the way, theta is then infinite until it is connected again.
+
+		Return
+		-----
+			Theta value of the proposed graph
+		'''
+
+		self.graph = graph
+		self._longest = None
+
+		if add:
+			self.sum_of_weights += weight
+			self._edge_added(u, v, weight)
+		else:
+			self.sum_of_weights -= weight
+			self._edge_removed(u, v)
+
+		return self.theta
+
+	def accept(self):
+		'''Keeps the proposed graph as the current one'''
+
+		self._undo = None
+
+	def reject(self):
+		'''Restores the state to the graph before the last proposal'''
+
+		if self._undo is None:
+			return
+
+		graph, sum_of_weights, sum_of_paths, unreachable, longest, log = self._undo
+
+		for node, d, p in reversed(log):
+			self.dist[node] = d
+			self._set_parent(node, p)
+
+		self.graph = graph
+		self.sum_of_weights = sum_of_weights
+		self.sum_of_paths = sum_of_paths
+		self.unreachable = unreachable
+		self._longest = longest
+		self._undo = None
+
+	def _edge_added(self, u, v, weight):
+		dist = self.dist
+
+		if dist[u] + weight < dist[v]:
+			self._relax([(dist[u] + weight, v, u)], None)
+		elif dist[v] + weight < dist[u]:
+			self._relax([(dist[v] + weight, u, v)], None)
+
+	def _edge_removed(self, u, v):
+		if self.parent[v] == u:
+			root = v
+		elif self.parent[u] == v:
+			root = u
+		else:
+			#edge was not part of any shortest path, so no distance changes
+			return
+
+		#collect the subtree that reached the anchor through the removed edge
+		subtree = set([root])
+		stack = [root]
+		while stack:
+			for child in self.children[stack.pop()]:
+				subtree.add(child)
+				stack.append(child)
+
+		for node in subtree:
+			self._update(node, INF, None)
+
+		#seed the subtree from its neighbours, whose distances are unaffected
+		graph = self.graph
+		weight = self._weight
+		dist = self.dist
+		heap = []
+		for node in subtree:
+			for neighbor in graph[node]:
+				if neighbor not in subtree:
+					heappush(heap, (dist[neighbor] + weight(graph, neighbor, node), node, neighbor))
+
+		self._relax(heap, subtree)
+
+	def _relax(self, heap, region):
+		'''Decrease-only Dijkstra, optionally restricted to a region of nodes'''
+
+		graph = self.graph
+		weight = self._weight
+		dist = self.dist
+
+		while heap:
+			d, node, p = heappop(heap)
+			if d >= dist[node]:
+				continue
+
+			self._update(node, d, p)
+
+			for neighbor in graph[node]:
+				if region is not None and neighbor not in region:
+					continue
+
+				nd = d + weight(graph, node, neighbor)
+				if nd < dist[neighbor]:
+					heappush(heap, (nd, neighbor, node))
+
+	def _update(self, node, d, p):
+		old = self.dist[node]
+
+		if self._undo is not None:
+			self._undo[5].append((node, old, self.parent[node]))
+
+		if old == INF:
+			self.unreachable -= 1
+		else:
+			self.sum_of_paths -= old
+
+		if d == INF:
+			self.unreachable += 1
+		else:
+			self.sum_of_paths += d
+
+		self.dist[node] = d
+		self._set_parent(node, p)
+
+	def _set_parent(self, node, p):
+		old = self.parent[node]
+		if old is not None:
+			self.children[old].discard(node)
+		if p is not None:
+			self.children[p].add(node)
+		self.parent[node] = p
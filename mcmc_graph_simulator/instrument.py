@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from time import perf_counter
+
+PHASES = ('mutate', 'theta', 'bridges', 'acceptance', 'statistics')
+
+
+class step_profiler:
+	'''Timers and counters for the steps of a chain, filled in by mcmc_graph.enable_profiling.
+
+	Every step is split into phases, and the time spent in each is summed:
+
+		* mutate: choosing whether to add or remove an edge, picking it and changing the graph
+
+		* theta: repairing the shortest paths and computing the theta of the proposed graph
+
+		* bridges: counting the bridges of the proposed graph
+
+		* acceptance: the Metropolis-Hastings test, and applying or undoing the change
+
+		* statistics: counting the state and updating the observables
+
+	Proposals and acceptances are counted separately for added and removed edges and for the two
+	kinds of block moves, together with the number of extra draws needed to find a missing edge.
+	Hooks are functions called as hook(mcmc, profiler) every so many steps, for example to log
+	progress or stop a slow run.
+	'''
+
+	def __init__(self, clock = perf_counter):
+		'''
+		Params
+		------
+		clock : function
+			returns the current time in seconds
+		'''
+
+		self.clock = clock
+		self.hooks = []
+		self.reset()
+
+	def reset(self):
+		'''Sets every timer and counter back to zero, keeping the hooks'''
+
+		self.times = dict.fromkeys(PHASES, 0.0)
+		self.steps = 0
+		self.proposed = dict(add = 0, remove = 0, block = 0, rewire = 0)
+		self.accepted = dict(add = 0, remove = 0, block = 0, rewire = 0)
+		self.retries = 0
+
+	def add_hook(self, function, every = 1):
+		'''Calls function(mcmc, profiler) after every every-th step'''
+
+		self.hooks.append((function, every))
+
+	def remove_hook(self, function):
+		self.hooks = [(hook, every) for hook, every in self.hooks if hook is not function]
+
+	def call_hooks(self, mcmc):
+		'''Calls the hooks that are due after the step just counted'''
+
+		for hook, every in self.hooks:
+			if self.steps % every == 0:
+				hook(mcmc, self)
+
+	def acceptance_rate(self, kind = None):
+		'''Fraction of the proposals accepted, of kind 'add', 'remove', 'block' or 'rewire', or of all of them if kind is None'''
+
+		kinds = list(self.proposed) if kind is None else [kind]
+		proposed = sum(self.proposed[k] for k in kinds)
+		accepted = sum(self.accepted[k] for k in kinds)
+
+		return accepted / float(proposed) if proposed else float('nan')
+
+	def summary(self):
+		'''Dictionary with the totals, and the time of each phase per step and as a fraction of the total'''
+
+		total = sum(self.times.values())
+		steps = max(self.steps, 1)
+
+		phases = dict((phase, dict(seconds = seconds, per_step = seconds / steps, fraction = seconds / total if total else 0.0))
+			for phase, seconds in self.times.items())
+
+		return dict(steps = self.steps, seconds = total, steps_per_second = self.steps / total if total else 0.0,
+			phases = phases, proposed = dict(self.proposed), accepted = dict(self.accepted),
+			acceptance_rate = dict([(kind, self.acceptance_rate(kind)) for kind in self.proposed] + [('total', self.acceptance_rate())]),
+			retries = self.retries)
+
+	def report(self):
+		'''The summary as readable text'''
+
+		summary = self.summary()
+		lines = ['%d steps in %.3f s, %.1f steps/s' % (summary['steps'], summary['seconds'], summary['steps_per_second'])]
+
+		for phase in PHASES:
+			p = summary['phases'][phase]
+			lines.append('  %-12s %10.2f us/step %6.1f%%' % (phase, p['per_step'] * 1e6, 100 * p['fraction']))
+
+		for kind in ['add', 'remove'] + [kind for kind in ['block', 'rewire'] if summary['proposed'][kind]]:
+			lines.append('  %-12s %d proposed, %d accepted (%.1f%%)' % (kind, summary['proposed'][kind], summary['accepted'][kind], 100 * summary['acceptance_rate'][kind]))
+
+		lines.append('  %-12s %d' % ('retries', summary['retries']))
+
+		return '\n'.join(lines)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import importlib
+
+
+class lazy_module:
+	'''Stands in for a module, and only imports it the first time one of its attributes is used.
+
+	networkx takes far longer to import than the rest of the package, and most runs never touch
+	it, so modules refer to it through a lazy_module instead of importing it directly:
+
+		nx = lazy_module('networkx')
+
+		nx.Graph()	#networkx is imported here
+	'''
+
+	def __init__(self, name):
+		self._name = name
+		self._module = None
+
+	def __getattr__(self, attribute):
+		#only called for attributes that are not found normally, so never for _name or _module
+		if self._module is None:
+			self._module = importlib.import_module(self._name)
+
+		return getattr(self._module, attribute)
+
+	def __repr__(self):
+		return '<lazy module %r%s>' % (self._name, '' if self._module is not None else ', not imported yet')
@@ -1,19 +1,48 @@
 # -*- coding: utf-8 -*-
 from math import sqrt, e
-import networkx as nx
 import numpy as np
-from random import choice, random
-import multiprocessing as mp
+from queue import Empty
+
+from .lazy import lazy_module
+from .incremental import theta_engine
+from .bridges import bridge_index, two_edge_components
+from .compact import compact_graph
+from .storage import chain_store, graph_key, top_states
+from .distance import distance_matrix
+from .shared import share_array, attach_array, release
+from .rng import uniform_stream
+from .edge_sets import edge_sets, indexed_set
+from .observables import observables
+from .checkpoint import write_checkpoint, read_checkpoint, pack_keys, unpack_keys
+from .trace import trace_writer
+from .instrument import step_profiler
+from .proposals import local_proposals
+from .cache import state_cache, edge_hash, state_hash
+from .sparse import sparse_theta_engine, networkx_distances
+
+nx = lazy_module('networkx')
+mp = lazy_module('multiprocessing')
+
+#engines that keep theta up to date, by the name of the backend
+BACKENDS = {'compact': theta_engine, 'sparse': sparse_theta_engine}
+
+
+def distance_form(options):
+	'''Form of the distance matrix for chains created with the keyword arguments options.
+	The sparse backend only reads a few distances each step, so they are computed when they are
+	read rather than stored, otherwise the form is chosen from the number of nodes.'''
+
+	return 'direct' if options.get('backend') == 'sparse' else None
+
 
 class mcmc_graph:
 
 	markov_chain = []
-	avg_node0_connections = None
-	avg_total_edges = None
-	avg_longest_shortest_path = None
 
 
-	def __init__(self, nodes, r = 1, T = 1):
+	def __init__(self, nodes, r = 1, T = 1, distances = None, keep_chain = True, burn_in = 0, thin = 1, max_states = None, seed = None,
+			neighbors = None, locality = 0.9, block_moves = 0, block_size = 2, rewire = 0.5, target_acceptance = None,
+			cache_size = None, backend = 'compact'):
 		'''
 		Creates a new connected networkx Graph with the specified nodes 
 	
@@ -24,26 +53,149 @@ class mcmc_graph:
 		r : float
 		T : float
 			-both constants in the MCMC equations
+
+		distances : distance_matrix, optional
+			precomputed distances between the nodes, so that chains over the same nodes can share them
+
+		keep_chain : boolean
+			False to only count the visited states, instead of also keeping the whole chain
+
+		burn_in : int
+			number of states to discard at the start of the chain
+
+		thin : int
+			keep only every thin-th state after the burn in
+
+		max_states : int, optional
+			bound on the number of distinct states that are counted
+
+		seed : int, SeedSequence or numpy Generator, optional
+			seed for the random numbers of this chain, so that runs can be reproduced
+
+		neighbors : int, optional
+			propose the edges to add mostly between each node and its nearest neighbors, see
+			local_proposals. By default they are drawn uniformly from every missing edge
+
+		locality : float
+			with neighbors, the probability of drawing an edge to add from the nearest neighbors
+
+		block_moves : float
+			probability that a step is a block move, which changes several edges at once instead
+			of one, see predict_next
+
+		block_size : int
+			number of edges a block move toggles, the starting value when it is adapted
+
+		rewire : float
+			probability that a block move is a rewire, which removes an edge and adds another
+
+		target_acceptance : float, optional
+			adapt block_size during the burn in so that about this fraction of the block moves
+			that toggle block_size edges are accepted
+
+		cache_size : int, optional
+			keep the theta and bridges of up to this many proposed graphs in a state_cache, so that
+			proposing a graph again does not evaluate it again. No cache by default
+
+		backend : str
+			'compact' to repair only the shortest paths each change affects, or 'sparse' for
+			thousands of nodes, which recomputes them with scipy over a sparse matrix of the graph
+			and keeps no n x n arrays, see sparse_theta_engine. 'sparse' needs scipy
 	
 		'''
 
+		if backend not in BACKENDS:
+			raise ValueError("Unknown backend: %s" % backend)
+
 		self.r = r
 		self.T = T
-		self.markov_chain = []
+		self.rng = uniform_stream(seed)
 		self.node0 = (0,)*len(nodes[0])
-		graph = nx.Graph()
+		self.backend = backend
 
-		#graph.add_path(nodes)
+		#the chain itself runs on a compact graph, with the nodes numbered in the order given
+		if distances is None:
+			distances = distance_matrix([tuple(node) for node in nodes], distance_form(dict(backend = backend)))
+		self.state = compact_graph(nodes, distances, dense = backend == 'compact')
+
+		if self.node0 not in self.state.index:
+			raise ValueError("The origin must be one of the nodes")
 
 		for i in range(len(nodes) - 1):
-			graph.add_edge(nodes[i], nodes[i+1], weight = self.get_distance(nodes[i], nodes[i+1]))
+			self.state.toggle(i, i+1)
+
+		self._anchor = self.state.index[self.node0]
+		self._theta = BACKENDS[backend](self.state, self._anchor, self.r, compact_graph.weight)
+		self._bridges = bridge_index(self.state)
+		self._edges = edge_sets(self.state, self._bridges)
+		self._key = self._edges.key()
+		self._graph = None
+		self._local = local_proposals(self.state, neighbors, locality) if neighbors else None
+
+		self.block_moves = block_moves
+		self.block_size = block_size
+		self.rewire = rewire
+		self.target_acceptance = target_acceptance
+		self._block_window = [0, 0]
+
+		self.cache = state_cache(cache_size) if cache_size else None
+		self._hash = state_hash(np.frombuffer(self._key, dtype = self.state.key_dtype).tolist()) if self.cache is not None else None
+
+		self.visits = chain_store(keep_chain, burn_in, thin, max_states)
+		self.markov_chain = self.visits.chain
+
+		self.observables = chain_observables()
+		self.trace = None
+		self.profiler = None
+		self._profiling = None
+
+		self._record()
+
+	def add_observable(self, name, function):
+		'''Tracks the mean, variance, standard error and effective sample size of another value
+
+		Parameters
+		-----
+			name: str
+
+			function: function
+				called as function(mcmc) after every step, returning a number for the current
+				state, for example lambda mcmc: mcmc.theta
+		'''
+
+		self.observables.add(name, function)
+
+	def summary(self):
+		'''Dictionary from the name of each observable to the mean, variance, mcse, ess and count of its values'''
 
-		self.markov_chain.append(graph)
-		self.current_graph = graph
+		return self.observables.summary()
 
-		self.avg_node0_connections = len(graph[self.node0])
-		self.avg_total_edges = len(graph.edges())
-		self.avg_longest_shortest_path = self.get_longest_shortest_path(graph, self.node0)
+	@property
+	def avg_node0_connections(self):
+		return self.observables['node0_connections'].mean
+
+	@property
+	def avg_total_edges(self):
+		return self.observables['total_edges'].mean
+
+	@property
+	def avg_longest_shortest_path(self):
+		return self.observables['longest_shortest_path'].mean
+
+	@property
+	def theta(self):
+		'''Theta value of the current graph'''
+
+		return self._theta.theta
+
+	@property
+	def current_graph(self):
+		'''The current graph of the chain, exported to a networkx Graph'''
+
+		if self._graph is None:
+			self._graph = self.state.to_networkx()
+
+		return self._graph
 
 	def get_longest_shortest_path(self, graph, anchor = None):
 		'''Calculates the longest dijkstra path in a graph with respect to the anchor node.
@@ -63,13 +215,10 @@ class mcmc_graph:
 			length: float
 				Length of the longest shortest path in the graph
 		'''
-		if(not nx.is_connected(graph)):
-			raise ValueError("Graph is not connected")
-
 		if anchor is None:
 			anchor = self.node0
-		
-		d = nx.single_source_dijkstra_path_length(graph, source = anchor, weight = 'weight')
+
+		d = self._anchor_distances(graph, anchor)
 
 		value = 0
 		for item in d:
@@ -77,11 +226,29 @@ class mcmc_graph:
 
 		return value
 
+	def _anchor_distances(self, graph, anchor):
+		'''Single Dijkstra pass from the anchor, shared by calculate_theta and get_longest_shortest_path
+
+		Return
+		-----
+			dictionary of node to the length of its shortest path from anchor
+		'''
+
+		if self.backend == 'sparse':
+			return networkx_distances(graph, anchor)
+
+		d = nx.single_source_dijkstra_path_length(graph, source = anchor, weight = 'weight')
+
+		if(len(d) != len(graph)):
+			raise ValueError("Graph is not connected")
+
+		return d
+
 
 
 
 	def get_bridges(self, graph):
-		'''Calculates number of bridges in a graph by removing an edge, and seeing if the graph is still connected.
+		'''Finds the bridges in a graph with a single depth first search (Tarjan's algorithm).
 		
 		Parameter
 		-----
@@ -95,24 +262,11 @@ class mcmc_graph:
 				List of edges that are bridges
 		'''
 
-		if(not nx.is_connected(graph)):
-			raise ValueError("Graph is not connected")
-
-		bridges = []
-
-		for u, v, d in graph.edges(data = True):
-			#remove edge
-			graph.remove_edge(u, v)
-
-			#check if graph is connected
-			if(not nx.is_connected(graph)):
-				bridges.append((u,v))
+		bridges, components = two_edge_components(graph)
 
-			#add edge back into graph
-			if d != {}:
-				graph.add_edge(u,v, weight = d['weight'])
-			else:
-				graph.add_edge(u,v)
+		#the bridge tree of a connected graph has one more component than it has bridges
+		if(len(components) - len(bridges) != 1):
+			raise ValueError("Graph is not connected")
 
 		return bridges
 
@@ -162,13 +316,10 @@ class mcmc_graph:
 		for u, v, d in graph.edges(data = True):
 			sum_of_weights += d['weight']
 
+		#the length of every shortest path comes from a single Dijkstra pass
 		sum_of_paths = 0
-		for n in graph.nodes():
-			shortest_path = nx.shortest_path(graph, anchor, n, weight = 'weight') #returns a list of the shortest path
-			
-			#now add up the weights of that path
-			for i in range(len(shortest_path) - 1):
-				sum_of_paths += graph[shortest_path[i]][shortest_path[i+1]]['weight']
+		for length in self._anchor_distances(graph, anchor).values():
+			sum_of_paths += length
 
 		return r * sum_of_weights + sum_of_paths
 
@@ -187,10 +338,48 @@ class mcmc_graph:
 			Mutated graph
 		'''
 
+		u, v = self._select_edge(graph, add)
+
+		if(add):
+			graph.add_edge(u, v, weight = self._distance(u, v))
+		else:
+			graph.remove_edge(u, v)
+
+		return graph
+
+	def _distance(self, point1, point2):
+		'''Looks up the distance between two points in the distance matrix, only calculating it if either point is not a node'''
+
+		i = self.state.index.get(point1)
+		j = self.state.index.get(point2)
+
+		if i is None or j is None:
+			return self.get_distance(point1, point2)
+
+		return self.state.distances.get(i, j)
+
+	def _select_edge(self, graph, add = True, bridges = None):
+		'''Picks the edge that mutate would add or remove, without changing the graph
+
+		Parameters
+		-----
+			graph: a networkx graph
+
+			add: boolean
+				True to pick an edge to add, false to pick one to remove
+
+			bridges: bridge_index, optional
+				index of the bridges of graph, found from scratch if not given
+
+		Return
+		-----
+			(u, v) endpoints of the selected edge
+		'''
+
 		if(add):
 			#select random nodes
-			node1 = choice(graph.nodes())
-			node2 = choice(graph.nodes())
+			node1 = self.rng.choice(graph.nodes())
+			node2 = self.rng.choice(graph.nodes())
 
 			#throw error if graph cannot have any more edges
 			number_of_nodes = len(graph.nodes())
@@ -201,27 +390,24 @@ class mcmc_graph:
 				#loop until edge is selected that is not yet in graph
 				if(len(graph[node1]) + 1 == len(graph.nodes())):
 					#select a different node for node1 if it is connected to every other node
-					node1 = choice(graph.nodes())
+					node1 = self.rng.choice(graph.nodes())
 				else:
-					node2 = choice(graph.nodes())
+					node2 = self.rng.choice(graph.nodes())
 
-			graph.add_edge(node1, node2, weight = self.get_distance(node1, node2))
-
-			return graph
+			return node1, node2
 
 		else:
-			bridges = self.get_bridges(graph)
+			if bridges is None:
+				bridges = bridge_index(graph)
 
 			if(len(bridges) == len(graph.edges())):
 				raise ValueError('Cannot remove edge and keep graph connected')
 
-			u, v = choice(graph.edges())
-			while((u,v) in bridges):
-				u, v = choice(graph.edges())
-
-			graph.remove_edge(u,v)
+			u, v = self.rng.choice(graph.edges())
+			while(bridges.is_bridge(u, v)):
+				u, v = self.rng.choice(graph.edges())
 
-			return graph
+			return u, v
 
 	def determine_mutation(self, graph):
 		'''This function changes the graph, either adding or removing an edge
@@ -236,18 +422,50 @@ class mcmc_graph:
 			1 if adding edge
 		'''
 
-		n = len(graph.nodes())
-		e = len(graph.edges())
+		if self.rng.random() < self._add_probability(len(graph.nodes()), len(graph.edges())):
+			return 1
+
+		else:
+			return 0
+
+	def _add_probability(self, n, e):
+		'''Probability of proposing to add an edge to a connected graph with n nodes and e edges'''
+
 		max_edges = n * (n - 1) / 2
 		min_edges = n - 1
 
-		p = (max_edges - e)/(max_edges - min_edges)
+		return (max_edges - e)/(max_edges - min_edges)
 
-		if random() < p:
-			return 1
+	def _select_pair(self, add = True):
+		'''Same as _select_edge, but picks the edge from the compact state of the chain.
+		An edge to add is chosen uniformly from the missing edges, or mostly from the missing edges
+		between nearest neighbors with local proposals, and an edge to remove uniformly from the
+		edges that are not bridges, all in constant time using the chain's edge sets.
+
+		Parameters
+		-----
+			add: boolean
+				True to pick an edge to add, false to pick one to remove
+
+		Return
+		-----
+			(u, v) indices of the endpoints of the selected edge
+		'''
+
+		if(add):
+			if(self.state.edge_count == self._edges.pairs):
+				raise ValueError('Cannot add unique edge to complete graph')
+
+			if self._local is not None:
+				return self._local.sample_absent(self.rng, self._edges)
+
+			return self._edges.sample_absent(self.rng)
 
 		else:
-			return 0
+			if(len(self._edges.removable) == 0):
+				raise ValueError('Cannot remove edge and keep graph connected')
+
+			return self._edges.sample_removable(self.rng)
 
 	def update_mean(self, mean, count, new_value):
 		'''This is an online algorithm to calculate the mean of a set of values.
@@ -273,13 +491,25 @@ class mcmc_graph:
 		mean = (mean * count + new_value) / (count + 1)
 		return mean
 
-	def run(self, iterations):
+	def run(self, iterations, stop = None, checkpoint = None, checkpoint_every = 10000):
 		'''This is the 'main' function to run the MCMC program. It returns all relevant statistics.
 		
 		Parameters
 		-----
 			iterations: int
-				the number of iterations to preform the MCMC simulation
+				the number of iterations to preform the MCMC simulation, the most that are run
+				when stop is given
+
+			stop: convergence, optional
+				stops the simulation early once its targets hold, checked every stop.check_every
+				iterations. The number of iterations that were run is kept in self.iterations_run
+
+			checkpoint: str, optional
+				path to save a checkpoint to every checkpoint_every iterations and at the end,
+				see save_checkpoint
+
+			checkpoint_every: int
+				number of iterations between checkpoints
 			
 		Return
 		-----
@@ -297,25 +527,200 @@ class mcmc_graph:
 
 		'''
 
-		for i in range(iterations):
-			self.predict_next()
+		if stop is not None and stop.rhat is not None:
+			raise ValueError("R-hat needs several chains, use parallel_mcmc")
+
+		done = 0
+		saved = 0
+		while done < iterations:
+			#run up to the next convergence check or checkpoint
+			steps = iterations - done
+			if stop is not None:
+				steps = min(steps, stop.check_every - done % stop.check_every)
+			if checkpoint is not None:
+				steps = min(steps, checkpoint_every - done % checkpoint_every)
+
+			for i in range(steps):
+				self.predict_next()
+
+			done += steps
+			if checkpoint is not None and done % checkpoint_every == 0:
+				self.save_checkpoint(checkpoint)
+				saved = done
+
+			if stop is not None and stop.due(done) and stop.satisfied([self.summary()]):
+				break
+
+		if checkpoint is not None and saved != done:
+			self.save_checkpoint(checkpoint)
+
+		self.iterations_run = done
 
 		stats = []
 
 		stats.append(self.avg_node0_connections)
 		stats.append(self.avg_total_edges)
 		stats.append(self.avg_longest_shortest_path)
-		stats.append(self.quantile(self.markov_chain))
+		top = top_states(self.visits.counts, self.visits.recorded)
+		stats.append([self.state.to_networkx(key) for key in top])
 
 		return stats
 
+	@property
+	def iterations(self):
+		'''Number of iterations the chain has run, including those before a checkpoint it was loaded from'''
+
+		return self.visits.steps - 1
+
+	def save_checkpoint(self, path):
+		'''Saves the whole state of the chain, so that it can be continued later with load_checkpoint.
+
+		The checkpoint holds the current graph, the random number stream, the statistics of every
+		observable and the counted states, as well as the kept chain if there is one. A chain loaded
+		from it makes exactly the same moves as this one would have. It is written atomically, so
+		the previous checkpoint at path stays intact if saving is interrupted.
+
+		Parameters
+		-----
+			path: str
+				file to write, in the numpy .npz format
+		'''
+
+		visits = self.visits
+		dtype = self.state.key_dtype
+
+		#every distinct state is stored once, the chain refers to them by position
+		states = list(visits.counts)
+		position = dict((key, i) for i, key in enumerate(states))
+		if visits.chain is not None:
+			for key in visits.chain:
+				if key not in position:
+					position[key] = len(states)
+					states.append(key)
+
+		state_edges, state_offsets = pack_keys(states, dtype)
+		rng = self.rng.get_state()
+
+		stats = []
+		arrays = dict(
+			nodes = np.array(self.state.nodes),
+			edges = np.frombuffer(self._key, dtype = dtype),
+			removable = np.array(self._edges.removable.items, dtype = np.int64),
+			bridges = np.array(self._edges.bridges.items, dtype = np.int64),
+			rng_buffer = np.array(rng['buffer'], dtype = np.float64),
+			state_edges = state_edges,
+			state_offsets = state_offsets,
+			counts = np.array([visits.counts[key] for key in states[:len(visits.counts)]], dtype = np.int64))
+
+		if self._edges.absent is not None:
+			arrays['absent'] = np.array(self._edges.absent.items, dtype = np.int64)
+
+		if self._local is not None:
+			arrays['local_absent'] = np.array(self._local.absent.items, dtype = np.int64)
+
+		if visits.chain is not None:
+			arrays['chain'] = np.array([position[key] for key in visits.chain], dtype = np.int64)
+
+		for i, (name, stat) in enumerate(self.observables.stats.items()):
+			state = stat.get_state()
+			arrays['batch_means_%d' % i] = np.array(state.pop('batch_means'), dtype = np.float64)
+			stats.append([name, state])
+
+		meta = dict(r = self.r, T = self.T, keep_chain = visits.chain is not None, burn_in = visits.burn_in, thin = visits.thin,
+			max_states = visits.max_states, steps = visits.steps, recorded = visits.recorded, dropped = visits.dropped,
+			rng_generator = rng['generator'], rng_block_size = rng['block_size'], retries = self._edges.retries,
+			sum_of_weights = self._theta.sum_of_weights, sum_of_paths = self._theta.sum_of_paths, stats = stats,
+			neighbors = self._local.neighbors if self._local is not None else None, locality = self._local.locality if self._local is not None else None,
+			block_moves = self.block_moves, block_size = self.block_size, rewire = self.rewire, target_acceptance = self.target_acceptance,
+			block_window = self._block_window, cache_size = self.cache.max_size if self.cache is not None else None, backend = self.backend)
+
+		write_checkpoint(path, meta, arrays)
+
+	@classmethod
+	def load_checkpoint(cls, path, distances = None, functions = None):
+		'''Continues a chain saved by save_checkpoint
+
+		Parameters
+		-----
+			path: str
+
+			distances: distance_matrix, optional
+				precomputed distances between the nodes
+
+			functions: dict, optional
+				functions of the observables added with add_observable, by name. Functions cannot be
+				saved, so the statistics of an added observable are only restored if its function is given
+
+		Return
+		-----
+			mcmc_graph in the saved state
+		'''
+
+		meta, arrays = read_checkpoint(path)
+		functions = functions or {}
+
+		nodes = [tuple(node) for node in arrays['nodes'].tolist()]
+		mcmc = cls(nodes, meta['r'], meta['T'], distances, meta['keep_chain'], meta['burn_in'], meta['thin'], meta['max_states'],
+			neighbors = meta.get('neighbors'), locality = meta.get('locality') or 0.9, block_moves = meta.get('block_moves', 0),
+			block_size = meta.get('block_size', 2), rewire = meta.get('rewire', 0.5), target_acceptance = meta.get('target_acceptance'),
+			cache_size = meta.get('cache_size'), backend = meta.get('backend', 'compact'))
+		mcmc._block_window = meta.get('block_window', [0, 0])
+
+		#rebuild the graph and its indexes, keeping the order of the edge sets that proposals are drawn from
+		state = mcmc.state
+		for u, v in state.edges():
+			state.toggle(u, v)
+		for edge in arrays['edges'].tolist():
+			state.toggle(*divmod(edge, state.n))
+
+		mcmc._rebuild()
+		mcmc._theta.sum_of_weights = meta['sum_of_weights']
+		mcmc._theta.sum_of_paths = meta['sum_of_paths']
+		mcmc._edges.removable = indexed_set(arrays['removable'].tolist())
+		mcmc._edges.bridges = indexed_set(arrays['bridges'].tolist())
+		mcmc._edges.absent = indexed_set(arrays['absent'].tolist()) if 'absent' in arrays else None
+		mcmc._edges.retries = meta['retries']
+		if mcmc._local is not None:
+			mcmc._local.absent = indexed_set(arrays['local_absent'].tolist())
+		mcmc._key = mcmc._edges.key()
+
+		mcmc.rng.set_state(dict(generator = meta['rng_generator'], buffer = arrays['rng_buffer'].tolist(), block_size = meta['rng_block_size']))
+
+		visits = chain_store(meta['keep_chain'], meta['burn_in'], meta['thin'], meta['max_states'])
+		visits.steps = meta['steps']
+		visits.recorded = meta['recorded']
+		visits.dropped = meta['dropped']
+
+		states = unpack_keys(arrays['state_edges'], arrays['state_offsets'])
+		counts = arrays['counts'].tolist()
+		visits.counts = dict(zip(states[:len(counts)], counts))
+		if visits.chain is not None:
+			visits.chain.extend(states[i] for i in arrays['chain'].tolist())
+
+		mcmc.visits = visits
+		mcmc.markov_chain = visits.chain
+
+		for i, (name, stat) in enumerate(meta['stats']):
+			if name not in mcmc.observables:
+				if name not in functions:
+					continue
+				mcmc.observables.add(name, functions[name])
+
+			mcmc.observables[name].set_state(dict(stat, batch_means = arrays['batch_means_%d' % i].tolist()))
+
+		return mcmc
+
 	def quantile(self, graphs, percentile = 99):
 		'''Calculates the top 1% most commonly occuring graphs
+
+		Graphs are counted by their edges rather than by object identity, so a graph that is
+		revisited is counted as the same state. States are then ranked by how often they occur,
+		and the most frequent ones are taken until they cover the top (100 - percentile)% of the chain.
 		
 		Parameters
 		-----
 			graphs: list
-				the graphs from MCMC to quantile
+				the graphs from MCMC to quantile, either networkx Graphs or hashable state keys
 
 			percentile: int, optional
 				the percentile above which the most occuring graphs are desired
@@ -327,136 +732,669 @@ class mcmc_graph:
 		'''
 
 		uniques = {}
-		#create dictionary where keys are the graphs, and values are the count
+		#create dictionary where keys are the canonical states, and values are the count
+		#the first graph seen for each state is kept to be returned
+
+		examples = {}
 
 		for graph in graphs:
+			key = graph_key(graph) if isinstance(graph, nx.Graph) else graph
 
-			if graph not in uniques:
-				uniques[graph] = 1
+			if key not in uniques:
+				uniques[key] = 1
+				examples[key] = graph
 
 			else:
-				uniques[graph] += 1
-
-		#Obtain the graphs in the top desired percentile
-		counts = [uniques[k] for k in uniques]
-		p = .01 * percentile * len(graphs)
-		
-		total = len(graphs)
-		sorted(counts)
-
-		top_1_counts = []
-
-		while(sum(counts) >= p):
-			top_1_counts.append(counts.pop(0))
-
-		top_1_percent = []
-
-		for k, v in uniques.items():
-			if v in top_1_counts:
-				top_1_percent.append(k)
-
-		return top_1_percent
+				uniques[key] += 1
 
+		return [examples[key] for key in top_states(uniques, len(graphs), percentile)]
 
 
 	def predict_next(self):
 		'''This function ties together all other functions, and using the Metropolis-Hastings algorithm, predicts the next graph.
 
 		It performs the following steps:
-			1. Creates a new proposed graph by changing the state of one of the edges of the current graph
+			1. Proposes a new graph by changing the state of one of the edges of the current graph in place
 			2. Calculates the Metropolis-Hastings acceptance probability
 			3. Generates a random number from 0 to 1
-			4. Determines whether or not to accept proposed graph
+			4. Determines whether or not to accept proposed graph, changing the edge back if it is rejected
+
+		With probability block_moves the step is a block move instead, see _block_step. While
+		profiling is enabled the clock is read between the steps, see enable_profiling.
 			
 		Return
 		-----
-			Mutated graph
+			The compact_graph of the accepted state
 		'''
 
-		graph = self.current_graph
+		profiler = self._profiling
+
+		if self.block_moves and self.rng.random() < self.block_moves:
+			return self._block_step(profiler)
+
+		if profiler is not None:
+			clock = profiler.clock
+			start = clock()
+			retries = self._edges.retries
+
+		state = self.state
+		n = state.n
+
+		#mutate the state, keeping track of the edge that changed
+		add = self.rng.random() < self._add_probability(n, state.edge_count)
+		u, v = self._select_pair(add)
+		state.toggle(u, v)
+		weight = state.weight(u, v)
+		if profiler is not None:
+			mutated = clock()
+
+		#calculate f(X_i, X_j), only repairing the shortest paths affected by the changed edge,
+		#or looking the proposed graph up if it is cached
+		theta_i = self._theta.theta
+		bridges_i = len(self._bridges)
+		entry = None
+		if self.cache is not None:
+			proposal = self._hash ^ edge_hash(min(u, v) * n + max(u, v))
+			entry = self.cache.get(proposal)
+
+		if entry is None:
+			theta_j = self._theta.propose(state, u, v, weight, add)
+			if profiler is not None:
+				proposed = clock()
+			bridges_j = self._bridges.preview(state, u, v, add)
+		else:
+			theta_j, bridges_j = entry[0], entry[1]
+			if profiler is not None:
+				proposed = clock()
+		if profiler is not None:
+			bridged = clock()
 
-		#create a new object for the proposed graph, and copy current graph
-		proposed_graph = nx.Graph()
-		proposed_graph.add_edges_from(graph.edges(data = True))
+		#a move that raises theta by more than about 709 * T is always accepted, and e**x would overflow
+		exponent = -(theta_i - theta_j)/self.T
+		f_xi_xj = e**exponent if exponent < 700 else float('inf')
 
-		#mutate proposed graph
-		self.mutate(proposed_graph, self.determine_mutation(proposed_graph) == 1)
+		#Calculated Metropolis-Hastings acceptance probability
+		a_ij = min(f_xi_xj * self._hastings_ratio(u, v, add, bridges_i, bridges_j), 1)
 
-		#calculate f(X_i, X_j)
-		anchor = graph.nodes()[0]
-		theta_i = self.calculate_theta(graph, anchor, self.r)
-		theta_j = self.calculate_theta(proposed_graph, anchor, self.r)
+		U = self.rng.random()
+		accepted = U <= a_ij
 
-		f_xi_xj = e**(-(theta_i - theta_j)/self.T)
+		if accepted:
+			#accept proposed graph, the indexes of a cached graph are only updated now
+			if entry is not None:
+				self._theta.propose(state, u, v, weight, add)
+				self._bridges.preview(state, u, v, add)
 
-		n = len(graph.nodes())
-		q_i_j = 1 / (n * (n - 1) / 2 - len(self.get_bridges(graph)))
-		q_j_i = 1 / (n * (n - 1) / 2 - len(self.get_bridges(proposed_graph)))
+			self._theta.accept()
+			became, stopped = self._bridges.accept()
+			self._edges.update(u, v, add, became, stopped)
+			if self._local is not None:
+				self._local.update(u, v, add)
+			self._key = self._edges.key()
+			self._graph = None
 
-		#Calculated Metropolis-Hastings acceptance probability
-		a_ij = min(f_xi_xj * q_i_j / q_j_i, 1)
+			if self.cache is not None:
+				self._cache_current(proposal, entry)
 
-		U = random()
+		else:
+			#reject proposed graph
+			state.toggle(u, v)
+			if entry is None:
+				self._theta.reject()
+				self._bridges.reject()
+
+				if self.cache is not None:
+					self.cache.put(proposal, theta_j, bridges_j)
+		if profiler is not None:
+			decided = clock()
+
+		self._record(u, v, accepted)
+
+		if profiler is not None:
+			recorded = clock()
+			times = profiler.times
+			times['mutate'] += mutated - start
+			times['theta'] += proposed - mutated
+			times['bridges'] += bridged - proposed
+			times['acceptance'] += decided - bridged
+			times['statistics'] += recorded - decided
+
+			kind = 'add' if add else 'remove'
+			profiler.steps += 1
+			profiler.proposed[kind] += 1
+			profiler.accepted[kind] += accepted
+			profiler.retries += self._edges.retries - retries
+			profiler.call_hooks(self)
+
+		return state
+
+	def _hastings_ratio(self, u, v, add, bridges_i, bridges_j):
+		'''q(X_j, X_i) / q(X_i, X_j) for the change of the edge (u, v) just made to the state.
+
+		Moving from X_i, an edge is added with probability _add_probability and then drawn
+		uniformly from the missing edges, or by local_proposals.sample_absent, or an edge is
+		removed and drawn uniformly from the edges that are not bridges. The reverse move undoes
+		the change from X_j. With the exact ratio every kernel samples graphs in proportion to
+		e**(theta / T), so the uniform and local proposals and block moves share one target.
 
-		accepted_graph = None
+		Parameters
+		-----
+			u, v: int
+				endpoints of the edge
+
+			add: boolean
+				True if the edge was added
+
+			bridges_i, bridges_j: int
+				number of bridges of the current and of the proposed graph
+
+		Return
+		-----
+			probability of proposing X_i from X_j over that of proposing X_j from X_i
+		'''
 
-		if (U <= a_ij):
-			#accept proposed graph
-			self.markov_chain.append(proposed_graph)
-			self.current_graph = proposed_graph
-			accepted_graph = self.current_graph
+		n = self.state.n
+		pairs = self._edges.pairs
+		local = self._local
 
+		edges_j = self.state.edge_count
+		edge = min(u, v) * n + max(u, v)
+
+		if add:
+			edges_i = edges_j - 1
+			draw = local.probability(edge, len(local.absent), pairs - edges_i) if local is not None else 1.0 / (pairs - edges_i)
+			q_i_j = self._add_probability(n, edges_i) * draw
+			q_j_i = (1 - self._add_probability(n, edges_j)) / (edges_j - bridges_j)
 		else:
-			#reject proposed graph
-			self.markov_chain.append(graph)
-			accepted_graph = graph
+			edges_i = edges_j + 1
+			if local is not None:
+				draw = local.probability(edge, len(local.absent) + (edge in local.candidates), pairs - edges_j)
+			else:
+				draw = 1.0 / (pairs - edges_j)
+			q_i_j = (1 - self._add_probability(n, edges_i)) / (edges_i - bridges_i)
+			q_j_i = self._add_probability(n, edges_j) * draw
 
-		#update statistics
+		return q_j_i / q_i_j
 
-		count = len(self.markov_chain) - 1
+	def _select_block(self, rewire):
+		'''Picks the edges a block move changes, every pair of nodes being drawn uniformly
 
-		self.update_mean(self.avg_node0_connections, count, len(accepted_graph[self.node0]))
+		Parameters
+		-----
+			rewire: boolean
+				True to pick an edge to remove and a missing edge to add, False to pick block_size
+				distinct pairs of nodes to toggle
 
-		self.update_mean(self.avg_total_edges, count, len(accepted_graph.edges()))
-		
-		ls_path = self.get_longest_shortest_path(accepted_graph, self.node0)
-		self.update_mean(self.avg_longest_shortest_path, count, ls_path)
+		Return
+		-----
+			list of (u, v, add) for every edge to change, those to add first
+		'''
+
+		state = self.state
+		edges = self._edges
+
+		if rewire:
+			if state.edge_count == edges.pairs:
+				return []
+
+			#uniformly random edge, from the removable edges and the bridges together
+			i = self.rng.integer(state.edge_count)
+			removable = edges.removable.items
+			edge = removable[i] if i < len(removable) else edges.bridges.items[i - len(removable)]
+
+			u, v = edges.sample_absent(self.rng)
+			a, b = edges.pair(edge)
+
+			return [(u, v, True), (a, b, False)]
+
+		n = state.n
+		size = min(self.block_size, edges.pairs)
+		chosen = []
+		while len(chosen) < size:
+			u = self.rng.integer(n)
+			v = self.rng.integer(n)
+			if u != v and edges.edge_id(u, v) not in chosen:
+				chosen.append(edges.edge_id(u, v))
+
+		changes = [(u, v, not state.has_edge(u, v)) for u, v in map(edges.pair, chosen)]
+
+		return [change for change in changes if change[2]] + [change for change in changes if not change[2]]
+
+	def _block_step(self, profiler = None):
+		'''A step that changes several edges at once, either toggling block_size pairs of nodes or rewiring an edge.
+
+		The pairs are drawn uniformly, so a move and the move undoing it are proposed with the same
+		probability, and only f(X_i, X_j) enters the acceptance test. They target e**(theta / T),
+		like the single edge steps they are mixed with, see _hastings_ratio. The edges are changed one at a
+		time, the additions first, with theta_engine.extend keeping a single undo log, so theta is
+		evaluated once for the whole move. A move that disconnects the graph is rejected.
+
+		Parameters
+		-----
+			profiler: step_profiler, optional
+				where to time the phases of the step, see enable_profiling
+
+		Return
+		-----
+			The compact_graph of the accepted state
+		'''
+
+		if profiler is not None:
+			clock = profiler.clock
+			start = clock()
+			retries = self._edges.retries
+
+		state = self.state
+		theta = self._theta
+		rewire = self.rng.random() < self.rewire
+		changes = self._select_block(rewire)
+		if profiler is not None:
+			mutated = clock()
+
+		theta_i = theta.theta
+		for i, (u, v, add) in enumerate(changes):
+			state.toggle(u, v)
+			if i == 0:
+				theta.propose(state, u, v, state.weight(u, v), add)
+			else:
+				theta.extend(state, u, v, state.weight(u, v), add)
+		if profiler is not None:
+			proposed = clock()
+
+		U = self.rng.random()
+		accepted = False
+		if changes and not theta.unreachable:
+			exponent = -(theta_i - theta.theta)/self.T
+			accepted = exponent >= 0 or U <= e**exponent
+
+		#the bridges are only updated for an accepted move, replaying its changes one at a time
+		for u, v, add in reversed(changes):
+			state.toggle(u, v)
+
+		if accepted:
+			theta.accept()
+			for u, v, add in changes:
+				state.toggle(u, v)
+				self._bridges.preview(state, u, v, add)
+				became, stopped = self._bridges.accept()
+				self._edges.update(u, v, add, became, stopped)
+				if self._local is not None:
+					self._local.update(u, v, add)
+				if self.cache is not None:
+					self._hash ^= edge_hash(u * state.n + v if u < v else v * state.n + u)
+
+			self._key = self._edges.key()
+			self._graph = None
+
+		else:
+			theta.reject()
+		if profiler is not None:
+			decided = clock()
+
+		if not rewire and self.target_acceptance is not None and self.visits.steps < self.visits.burn_in:
+			self._adapt_block_size(accepted)
+
+		self._record()
+
+		if profiler is not None:
+			recorded = clock()
+			times = profiler.times
+			times['mutate'] += mutated - start
+			times['theta'] += proposed - mutated
+			times['acceptance'] += decided - proposed
+			times['statistics'] += recorded - decided
+
+			kind = 'rewire' if rewire else 'block'
+			profiler.steps += 1
+			profiler.proposed[kind] += 1
+			profiler.accepted[kind] += accepted
+			profiler.retries += self._edges.retries - retries
+			profiler.call_hooks(self)
+
+		return state
+
+	def _adapt_block_size(self, accepted):
+		#every 50 block moves, block_size grows by one if more of them than the target were
+		#accepted and shrinks by one if fewer were. Only done during the burn in, so that the
+		#chain that is measured keeps a fixed proposal
+		window = self._block_window
+		window[0] += 1
+		window[1] += accepted
+
+		if window[0] == 50:
+			rate = window[1] / 50.0
+			if rate > self.target_acceptance and self.block_size < max(self._edges.pairs // 2, 1):
+				self.block_size += 1
+			elif rate < self.target_acceptance and self.block_size > 1:
+				self.block_size -= 1
+
+			self._block_window = [0, 0]
+
+	def enable_profiling(self, profiler = None):
+		'''Times the phases of every following step and counts proposals, see step_profiler.
+
+		predict_next reads the clock between the phases while a profiler is set, and otherwise only
+		checks that none is, so profiling never changes the moves the chain makes.
+
+		Parameters
+		-----
+			profiler: step_profiler, optional
+				where to collect the results, a new one by default
+
+		Return
+		-----
+			the step_profiler
+		'''
+
+		self.profiler = profiler if profiler is not None else step_profiler()
+		self._profiling = self.profiler
+
+		return self.profiler
+
+	def disable_profiling(self):
+		'''Stops profiling, the results stay in self.profiler'''
+
+		self._profiling = None
+
+	def _cache_current(self, key, entry):
+		#the accepted graph is now the current one, and its longest shortest path is known or computed once
+		self._hash = key
+
+		if entry is not None and entry[2] is not None:
+			self._theta.longest = entry[2]
+		else:
+			self.cache.put(key, self._theta.theta, len(self._bridges), self._theta.longest)
+
+	def _rebuild(self):
+		#recomputes theta, the bridges and the edge sets after the state was changed directly
+		self._theta.refresh()
+		if self._theta.unreachable:
+			raise ValueError("The graph must be connected")
 
-		return accepted_graph
+		self._bridges.rebuild(self.state)
+		self._edges = edge_sets(self.state, self._bridges)
+		self._key = self._edges.key()
+		self._graph = None
+
+		if self._local is not None:
+			self._local.rebuild()
+
+		if self.cache is not None:
+			self._hash = state_hash(np.frombuffer(self._key, dtype = self.state.key_dtype).tolist())
+
+	def _record(self, u = None, v = None, accepted = False):
+		#store the current state and update statistics, which only start after the burn in
+		self.visits.record(self._key)
+
+		values = None
+		if self.visits.steps > self.visits.burn_in:
+			values = self.observables.update(self)
+
+		if self.trace is not None:
+			edge = -1 if u is None else min(u, v) * self.state.n + max(u, v)
+			self.trace.append(edge, accepted, values if values is not None else self.observables.measure(self))
+
+	def start_trace(self, path, **options):
+		'''Writes every following state of the chain to a trace file on disk, see trace_writer.
+
+		Each step only stores the proposed edge, whether it was accepted and the value of every
+		observable added so far, the states are replayed from the current one by trace_reader.
+		The trace keeps the whole chain without holding it in memory.
+
+		Parameters
+		-----
+			path: str
+
+			options:
+				keyword arguments of trace_writer, such as capacity
+		'''
+
+		if self.block_moves:
+			raise ValueError("Traces store a single edge for every step, so they cannot record block moves")
+
+		self.stop_trace()
+
+		edges = np.frombuffer(self._key, dtype = self.state.key_dtype).tolist()
+		self.trace = trace_writer(path, self.state.nodes, list(self.observables.functions), edges, **options)
+		self.trace.append(-1, False, self.observables.measure(self))
+
+	def stop_trace(self):
+		'''Finishes writing the trace started by start_trace'''
+
+		if self.trace is not None:
+			self.trace.close()
+			self.trace = None
+
+
+def _node0_connections(mcmc):
+	return mcmc.state.degree(mcmc._anchor)
+
+def _total_edges(mcmc):
+	return mcmc.state.edge_count
+
+def _longest_shortest_path(mcmc):
+	#the distances theta was calculated from also give the longest shortest path
+	return mcmc._theta.longest
+
+def chain_observables():
+	'''New observables registry with the three values every chain tracks'''
+
+	registry = observables()
+	registry.add('node0_connections', _node0_connections)
+	registry.add('total_edges', _total_edges)
+	registry.add('longest_shortest_path', _longest_shortest_path)
+
+	return registry
+
+
+def chain_seeds(seed, chains):
+	'''Derives independent, reproducible seeds for several chains from a single seed.
+	Chain i of parallel_mcmc(nodes, seed = s, chains = k) makes exactly the same moves as
+	mcmc_graph(nodes, seed = chain_seeds(s, k)[i]) run on its own.
+
+	Parameters
+	-----
+		seed: int or None
+			seed of the whole run, None to draw one from the operating system
+
+		chains: int
+
+	Return
+	-----
+		list of int seeds, one for each chain
+	'''
+
+	return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(chains)]
+
+
+#read-only data shared by every chain in a worker process, set up by _init_worker
+_worker = {}
+
+def _init_worker(nodes, coordinates, matrix, form, options, queue, stop):
+	blocks = []
+	arrays = []
+	for descriptor in [coordinates, matrix]:
+		block, array = attach_array(descriptor)
+		blocks.append(block)
+		arrays.append(array)
+
+	_worker['blocks'] = blocks
+	_worker['nodes'] = nodes
+	_worker['distances'] = distance_matrix.from_arrays(arrays[0], arrays[1], form)
+	_worker['options'] = options
+	_worker['queue'] = queue
+	_worker['stop'] = stop
+
+
+def _run_chain(task):
+	index, seed, iterations, chunk_size, summarize = task
+
+	mcmc = mcmc_graph(_worker['nodes'], distances = _worker['distances'], keep_chain = False, seed = seed, **_worker['options'])
+	queue = _worker['queue']
+	stop = _worker['stop']
+
+	done = 0
+	while done < iterations:
+		steps = min(chunk_size, iterations - done)
+		for i in range(steps):
+			mcmc.predict_next()
+
+		done += steps
+		stats = [mcmc.avg_node0_connections, mcmc.avg_total_edges, mcmc.avg_longest_shortest_path]
+
+		if queue is not None:
+			queue.put((index, done, stats, mcmc.summary() if summarize else None))
+
+		if stop is not None and stop.is_set():
+			break
+
+	return stats, mcmc.visits.counts, mcmc.visits.recorded, done
 
 
 class parallel_mcmc:
-	'''Runs multiple mcmc simulations in parallel'''
+	'''Runs multiple mcmc simulations in parallel
+
+	Every chain gets its own seed, derived from the seed of the run. The node coordinates and the
+	distance matrix are computed once and placed in shared memory, which every worker reads instead
+	of receiving its own pickled copy.
+	'''
+
+	def __init__(self, nodes, r = 1, T = 1, seed = None, chains = None, processes = None, **options):
+		'''
+		Params
+		------
+		nodes : list of touples
+
+		r : float
+		T : float
+			-both constants in the MCMC equations
+
+		seed : int, optional
+			seed of the whole run, the seed of each chain is derived from it with chain_seeds
+
+		chains : int, optional
+			number of chains to run, defaults to the number of CPUs
+
+		processes : int, optional
+			number of worker processes, defaults to the number of CPUs
+
+		options :
+			any other keyword arguments of mcmc_graph, such as burn_in or max_states
+		'''
 
-	def __init__(self, nodes, r = 1, T = 1):
 		self.nodes = nodes
 		self.r = r
 		self.T = T
+		self.seed = seed
+		self.chains = chains or mp.cpu_count()
+		self.processes = processes
+		self.options = options
+		self.distances = distance_matrix([tuple(node) for node in nodes], distance_form(options))
 
-	def run(self, iterations):
-		#Run n simulations each with the number of iterations specified in parallel, and average the result statistics
-		#Returns the same statistics as mcmc_graph class, just averaged out over all parallel processes
-		iterations = 10
-		count = mp.cpu_count()
+	def run(self, iterations, chunk_size = 1000, progress = None, stop = None):
+		'''Runs every chain for the given number of iterations, and combines their statistics
+
+		Parameters
+		-----
+			iterations: int
+				the number of iterations of each chain, the most that are run when stop is given
+
+			chunk_size: int
+				number of iterations between progress reports from each chain
+
+			progress: function, optional
+				called as progress(chain, iterations_done, stats) in this process whenever a chain
+				finishes a chunk, where stats holds the first three statistics of run so far
+
+			stop: convergence, optional
+				stops every chain once the targets hold across all chains. The chains then report
+				every stop.check_every iterations instead of every chunk_size, and the targets are
+				checked whenever every chain has reported again. Every chain must have a process of
+				its own, so that the chains compared are at the same iteration. The number of
+				iterations each chain ran is kept in self.iterations_run
+
+		Return
+		-----
+			The same statistics as mcmc_graph.run, with the expected values averaged over every chain
+			and the top 1% of graphs taken from the visits of all chains together
+		'''
+
+		if stop is not None and self.chains > (self.processes or mp.cpu_count()):
+			#chains waiting for a free process would only start once the first ones had finished
+			raise ValueError("Stopping at convergence needs as many processes as chains")
+
+		distances = self.distances
+		coordinates_block, coordinates = share_array(distances.coordinates)
+		matrix_block, matrix = share_array(distances.matrix) if distances.matrix is not None else (None, (None, None))
+
+		if stop is not None:
+			chunk_size = stop.check_every
+
+		queue = mp.Queue() if progress is not None or stop is not None else None
+		event = mp.Event() if stop is not None else None
+		options = dict(self.options, r = self.r, T = self.T)
+		tasks = [(i, seed, iterations, chunk_size, stop is not None) for i, seed in enumerate(chain_seeds(self.seed, self.chains))]
+
+		p = mp.Pool(self.processes, _init_worker, (self.nodes, coordinates, matrix, distances.form, options, queue, event))
+
+		try:
+			pending = p.map_async(_run_chain, tasks)
+
+			#the last report of every chain is read before returning, stop waiting early if a worker failed
+			reported = {}
+			summaries = {}
+			checked = 0
+			while queue is not None:
+				try:
+					index, done, stats, summary = queue.get(True, 0.1)
+				except Empty:
+					if pending.ready():
+						if not pending.successful():
+							break
+						if all(reported.get(i, 0) == chain[3] for i, chain in enumerate(pending.get())):
+							break
+					continue
+
+				reported[index] = done
+				if progress is not None:
+					progress(index, done, stats)
+
+				if stop is not None:
+					summaries[index] = summary
+					least = min(reported.values())
+					if len(summaries) == len(tasks) and least > checked and least >= stop.min_iterations:
+						checked = least
+						if stop.satisfied([summaries[i] for i in range(len(tasks))]):
+							event.set()
+
+			result = pending.get()
+		finally:
+			p.terminate()
+			p.join()
+			release([coordinates_block, matrix_block])
 
-		params = [iterations]*count
-		p = mp.Pool()
-		result = p.map(self._run, params)
-		p.close()
-		
 		avg_node0_connections = []
 		avg_total_edges = []
 		avg_longest_shortest_path = []
+		counts = {}
+		total = 0
+		self.iterations_run = []
 		
-		for r in result:
-			avg_node0_connections.append(r[0])
-			avg_total_edges.append(r[1])
-			avg_longest_shortest_path.append(r[2])
+		for stats, chain_counts, recorded, done in result:
+			avg_node0_connections.append(stats[0])
+			avg_total_edges.append(stats[1])
+			avg_longest_shortest_path.append(stats[2])
+			total += recorded
+			self.iterations_run.append(done)
 
-		return np.mean(avg_node0_connections), np.mean(avg_total_edges), np.mean(avg_longest_shortest_path)
+			for key, count in chain_counts.items():
+				counts[key] = counts.get(key, 0) + count
 
+		state = compact_graph(self.nodes, distances, dense = False)
+		top = [state.to_networkx(key) for key in top_states(counts, total)]
+
+		return [np.mean(avg_node0_connections), np.mean(avg_total_edges), np.mean(avg_longest_shortest_path), top]
 
 	def _run(self, iterations):
-		mcmc = mcmc_graph(self.nodes, self.r, self.T)
+		mcmc = mcmc_graph(self.nodes, self.r, self.T, self.distances, seed = self.seed, **self.options)
 		return mcmc.run(iterations)
-
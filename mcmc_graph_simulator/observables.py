@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from math import sqrt
+
+NAN = float('nan')
+
+
+class running_stat:
+	'''Online mean, variance, Monte Carlo standard error and effective sample size of one value.
+
+	The mean and variance use Welford's algorithm. The standard error uses batch means: the
+	values are averaged in consecutive batches, and the spread of the batch means reflects the
+	correlation between successive states of the chain. When there are twice as many batches
+	as wanted, neighbouring batches are merged and the batch size doubles, so every update is
+	O(1) and the memory is bounded no matter how long the chain runs.
+	'''
+
+	def __init__(self, batches = 32):
+		'''
+		Params
+		------
+		batches : int
+			number of batches the standard error is estimated from, between batches and 2 * batches
+		'''
+
+		self.batches = batches
+		self.count = 0
+		self.mean = 0.0
+		self._m2 = 0.0
+
+		self.batch_size = 1
+		self.batch_means = []
+		self._batch_sum = 0.0
+		self._batch_count = 0
+
+	def push(self, value):
+		'''Adds the next value of the chain'''
+
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta / self.count
+		self._m2 += delta * (value - self.mean)
+
+		self._batch_sum += value
+		self._batch_count += 1
+
+		if self._batch_count == self.batch_size:
+			self.batch_means.append(self._batch_sum / self.batch_size)
+			self._batch_sum = 0.0
+			self._batch_count = 0
+
+			if len(self.batch_means) == 2 * self.batches:
+				means = self.batch_means
+				self.batch_means = [(means[i] + means[i+1]) / 2 for i in range(0, len(means), 2)]
+				self.batch_size *= 2
+
+	@property
+	def variance(self):
+		'''Sample variance of the values'''
+
+		if self.count < 2:
+			return NAN
+
+		return self._m2 / (self.count - 1)
+
+	@property
+	def mcse(self):
+		'''Monte Carlo standard error of the mean, from the batch means'''
+
+		k = len(self.batch_means)
+		if k < 2:
+			return NAN
+
+		mean = sum(self.batch_means) / k
+		spread = sum((m - mean) ** 2 for m in self.batch_means) / (k - 1)
+
+		return sqrt(spread / k)
+
+	@property
+	def ess(self):
+		'''Effective sample size, the number of independent values the chain is worth'''
+
+		mcse = self.mcse
+		if mcse != mcse:
+			return NAN
+
+		if mcse == 0:
+			return float(self.count)
+
+		return min(self.variance / mcse ** 2, float(self.count))
+
+	def summary(self):
+		return dict(mean = self.mean, variance = self.variance, mcse = self.mcse, ess = self.ess, count = self.count)
+
+	def get_state(self):
+		'''Dictionary with everything needed to continue accumulating, see set_state'''
+
+		return dict(batches = self.batches, count = self.count, mean = self.mean, m2 = self._m2, batch_size = self.batch_size,
+			batch_means = list(self.batch_means), batch_sum = self._batch_sum, batch_count = self._batch_count)
+
+	def set_state(self, state):
+		'''Continues from a state returned by get_state'''
+
+		self.batches = state['batches']
+		self.count = state['count']
+		self.mean = state['mean']
+		self._m2 = state['m2']
+		self.batch_size = state['batch_size']
+		self.batch_means = list(state['batch_means'])
+		self._batch_sum = state['batch_sum']
+		self._batch_count = state['batch_count']
+
+
+class observables:
+	'''Named values measured on every state of a chain, each with its own running_stat.
+
+	An observable is a function called with the chain, mcmc_graph, after every step, that returns
+	a number. New observables can be registered at any time, they are only measured from then on.
+	'''
+
+	def __init__(self, batches = 32):
+		self.batches = batches
+		self.functions = OrderedDict()
+		self.stats = OrderedDict()
+
+	def __contains__(self, name):
+		return name in self.stats
+
+	def __getitem__(self, name):
+		return self.stats[name]
+
+	def add(self, name, function):
+		'''Registers an observable
+
+		Parameters
+		-----
+			name: str
+
+			function: function
+				called as function(chain) on every state, returning a number
+		'''
+
+		self.functions[name] = function
+		self.stats[name] = running_stat(self.batches)
+
+	def measure(self, chain):
+		'''List of the value of every observable on the current state of a chain'''
+
+		return [function(chain) for function in self.functions.values()]
+
+	def update(self, chain):
+		'''Measures every observable on the current state of a chain, and adds the values to the statistics
+
+		Return
+		-----
+			list of the values, in the order the observables were added
+		'''
+
+		values = self.measure(chain)
+		for stat, value in zip(self.stats.values(), values):
+			stat.push(value)
+
+		return values
+
+	def summary(self):
+		'''Dictionary from each name to the mean, variance, mcse, ess and count of its values'''
+
+		return OrderedDict((name, stat.summary()) for name, stat in self.stats.items())
+
+
+def gelman_rubin(summaries):
+	'''Gelman-Rubin potential scale reduction factor (R-hat) of one value across several chains
+
+	Parameters
+	-----
+		summaries: list
+			one running_stat summary per chain, with its mean, variance and count
+
+	Return
+	-----
+		R-hat, close to 1 when the chains agree, nan for fewer than two chains
+	'''
+
+	k = len(summaries)
+	if k < 2:
+		return NAN
+
+	n = sum(s['count'] for s in summaries) / float(k)
+	means = [s['mean'] for s in summaries]
+	grand_mean = sum(means) / k
+
+	within = sum(s['variance'] for s in summaries) / k
+	between = sum((m - grand_mean) ** 2 for m in means) / (k - 1)
+
+	if within == 0:
+		return 1.0 if between == 0 else float('inf')
+
+	pooled = (n - 1) / n * within + between
+
+	return sqrt(pooled / within)
+
+
+class convergence:
+	'''Rule for stopping a run once its statistics are precise enough.
+
+	Each target that is set must hold for every tracked value:
+
+		* rel_mcse: the Monte Carlo standard error of the mean, relative to the mean
+
+		* min_ess: the effective sample size, summed over the chains
+
+		* rhat: the Gelman-Rubin R-hat across chains, so it needs at least two chains
+
+	The targets are only checked every check_every iterations, so checking stays cheap.
+	'''
+
+	def __init__(self, rel_mcse = None, min_ess = None, rhat = None, check_every = 1000, min_iterations = 0, names = None):
+		'''
+		Params
+		------
+		rel_mcse : float, optional
+			largest relative standard error
+
+		min_ess : float, optional
+			smallest effective sample size
+
+		rhat : float, optional
+			largest R-hat, for example 1.01
+
+		check_every : int
+			number of iterations between checks
+
+		min_iterations : int
+			number of iterations to run before the first check
+
+		names : list, optional
+			the values the targets apply to, defaults to every tracked value
+		'''
+
+		if rel_mcse is None and min_ess is None and rhat is None:
+			raise ValueError("No convergence target was given")
+
+		self.rel_mcse = rel_mcse
+		self.min_ess = min_ess
+		self.rhat = rhat
+		self.check_every = check_every
+		self.min_iterations = min_iterations
+		self.names = names
+
+	def due(self, iterations):
+		'''True if the targets should be checked after this many iterations'''
+
+		return iterations >= self.min_iterations and iterations % self.check_every == 0
+
+	def satisfied(self, summaries):
+		'''Checks the targets
+
+		Parameters
+		-----
+			summaries: list
+				one dictionary per chain, from each name to its running_stat summary,
+				as returned by mcmc_graph.summary
+
+		Return
+		-----
+			True if every target holds
+		'''
+
+		names = self.names if self.names is not None else list(summaries[0])
+		k = len(summaries)
+
+		for name in names:
+			stats = [s[name] for s in summaries]
+
+			if self.rel_mcse is not None:
+				mean = sum(s['mean'] for s in stats) / k
+				mcse = sqrt(sum(s['mcse'] ** 2 for s in stats)) / k
+
+				if not mcse <= self.rel_mcse * abs(mean):
+					return False
+
+			if self.min_ess is not None:
+				if not sum(s['ess'] for s in stats) >= self.min_ess:
+					return False
+
+			if self.rhat is not None:
+				if not gelman_rubin(stats) <= self.rhat:
+					return False
+
+		return True
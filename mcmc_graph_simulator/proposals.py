@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .edge_sets import indexed_set
+
+
+def _kd_tree():
+	#scipy is optional, without it the neighbours are found from the distance matrix
+	try:
+		from scipy.spatial import cKDTree
+	except ImportError:
+		cKDTree = None
+
+	return cKDTree
+
+
+def nearest_neighbors(distances, k):
+	'''The k nearest other nodes of every node
+
+	A KD-tree over the coordinates is used when scipy is installed, otherwise the rows of the
+	distance matrix are searched a block at a time.
+
+	Parameters
+	-----
+		distances: distance_matrix
+			distances between the nodes, and their coordinates
+
+		k: int
+			number of neighbours of each node, at most the number of other nodes
+
+	Return
+	-----
+		n x k int array, row i holding the numbers of the nodes closest to node i, nearest first
+	'''
+
+	n = len(distances)
+	k = min(k, n - 1)
+
+	cKDTree = _kd_tree()
+	if cKDTree is not None:
+		#every point is its own nearest neighbour, so one more is asked for and the first dropped
+		indices = cKDTree(distances.coordinates).query(distances.coordinates, k + 1)[1]
+		return np.asarray(indices, dtype = np.int64).reshape(n, k + 1)[:, 1:]
+
+	neighbors = np.empty((n, k), dtype = np.int64)
+	for start in range(0, n, distances.block_size):
+		stop = min(start + distances.block_size, n)
+		block = np.array(distances.rows(start, stop))
+		block[np.arange(stop - start), np.arange(start, stop)] = np.inf
+
+		nearest = np.argpartition(block, k - 1, axis = 1)[:, :k]
+		order = np.argsort(np.take_along_axis(block, nearest, 1), axis = 1)
+		neighbors[start:stop] = np.take_along_axis(nearest, order, 1)
+
+	return neighbors
+
+
+class local_proposals:
+	'''Proposes the edges to add mostly between nearby nodes.
+
+	The candidate pairs are every node with each of its k nearest neighbours. With probability
+	locality an edge to add is drawn uniformly from the candidate pairs that are not edges, and
+	otherwise uniformly from every pair that is not an edge, as before, so that any edge can
+	still be added. On large point sets almost every uniformly drawn pair is far apart, so this
+	spends the proposals on the short edges instead, which pays off when the graphs the chain
+	favours are made of them. With the usual e**(theta / T) target long edges raise theta, and
+	uniform proposals are accepted more often, see the README.
+
+	The probability of drawing each pair only depends on the number of missing candidate pairs
+	and of missing pairs, so the chain computes the exact proposal probabilities of every move and
+	its reverse for the Metropolis-Hastings test, see mcmc_graph.
+	'''
+
+	def __init__(self, graph, neighbors = 8, locality = 0.9):
+		'''
+		Params
+		------
+		graph : compact_graph
+
+		neighbors : int
+			number of nearest neighbours of each node that are candidates
+
+		locality : float
+			probability of drawing an edge to add from the candidates
+		'''
+
+		if not 0 <= locality <= 1:
+			raise ValueError("locality must be between 0 and 1")
+
+		self.graph = graph
+		self.n = graph.n
+		self.neighbors = neighbors
+		self.locality = locality
+
+		nearest = nearest_neighbors(graph.distances, neighbors)
+		u = np.repeat(np.arange(self.n), nearest.shape[1])
+		v = nearest.ravel()
+
+		self.candidates = set(np.unique(np.minimum(u, v) * self.n + np.maximum(u, v)).tolist())
+		self.rebuild()
+
+	def rebuild(self):
+		'''Finds the missing candidate pairs again after the graph was changed directly'''
+
+		has_edge = self.graph.has_edge
+		self.absent = indexed_set(edge for edge in sorted(self.candidates) if not has_edge(*divmod(edge, self.n)))
+
+	def sample_absent(self, rng, edges):
+		'''Random pair of nodes that is not an edge, a nearby one with probability locality
+
+		Parameters
+		-----
+			rng: uniform_stream
+
+			edges: edge_sets
+				edge sets of the graph, which draw the pairs that are not candidates
+
+		Return
+		-----
+			(u, v) endpoints of the pair
+		'''
+
+		if len(self.absent) and rng.random() < self.locality:
+			return divmod(self.absent.sample(rng), self.n)
+
+		return edges.sample_absent(rng)
+
+	def probability(self, edge, absent, missing):
+		'''Probability that sample_absent draws a pair
+
+		Parameters
+		-----
+			edge: int
+				the pair, numbered i * n + j with i < j
+
+			absent: int
+				number of candidate pairs that are not edges
+
+			missing: int
+				number of pairs that are not edges
+
+		Return
+		-----
+			float
+		'''
+
+		if absent == 0:
+			return 1.0 / missing
+
+		p = (1 - self.locality) / missing
+		if edge in self.candidates:
+			p += self.locality / absent
+
+		return p
+
+	def update(self, u, v, added):
+		'''Records an accepted change of the edge (u, v)'''
+
+		edge = min(u, v) * self.n + max(u, v)
+		if edge in self.candidates:
+			if added:
+				self.absent.discard(edge)
+			else:
+				self.absent.add(edge)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+class uniform_stream:
+	'''Uniform random numbers for a single chain, drawn from a numpy Generator in blocks.
+
+	Drawing one number at a time from numpy is slow, so a whole block is drawn with one
+	vectorised call and handed out one number at a time. Every random decision of a chain,
+	the acceptance test as well as picking nodes and edges, is made from this one stream, so a
+	chain started from the same seed always makes the same decisions, in any process.
+	'''
+
+	def __init__(self, seed = None, block_size = 65536):
+		'''
+		Params
+		------
+		seed : int, SeedSequence or Generator, optional
+			seed of the stream, or a Generator to draw from directly
+
+		block_size : int
+			number of values drawn at a time
+		'''
+
+		if isinstance(seed, np.random.Generator):
+			self.generator = seed
+		else:
+			self.generator = np.random.default_rng(seed)
+
+		self.block_size = block_size
+		self._buffer = []
+		self._position = 0
+
+	def random(self):
+		'''Next uniform random number in [0, 1)'''
+
+		if self._position == len(self._buffer):
+			#tolist hands back python floats, which are much faster to work with than numpy scalars
+			self._buffer = self.generator.random(self.block_size).tolist()
+			self._position = 0
+
+		value = self._buffer[self._position]
+		self._position += 1
+
+		return value
+
+	def integer(self, n):
+		'''Uniform random integer in [0, n)'''
+
+		return int(self.random() * n)
+
+	def choice(self, sequence):
+		'''Uniformly chosen element of a non-empty sequence'''
+
+		return sequence[int(self.random() * len(sequence))]
+
+	def get_state(self):
+		'''Everything needed to continue the stream exactly where it is, see set_state
+
+		Return
+		-----
+			dictionary with the state of the numpy bit generator, and the values drawn but not used yet
+		'''
+
+		return dict(generator = self.generator.bit_generator.state, buffer = self._buffer[self._position:], block_size = self.block_size)
+
+	def set_state(self, state):
+		'''Continues the stream from a state returned by get_state'''
+
+		self.generator.bit_generator.state = state['generator']
+		self.block_size = state['block_size']
+		self._buffer = list(state['buffer'])
+		self._position = 0
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+def _shared_memory():
+	#imported on first use, so that single chains never load multiprocessing
+	try:
+		from multiprocessing import shared_memory
+	except ImportError:
+		#python < 3.8, arrays are copied to each worker instead
+		shared_memory = None
+
+	return shared_memory
+
+
+def share_array(array):
+	'''Copies an array into shared memory, so worker processes can read it without pickling it
+
+	Parameters
+	-----
+		array: numpy array
+
+	Return
+	-----
+		block: SharedMemory
+			the shared memory block, which the owner must close and unlink when done,
+			None if shared memory is not available
+
+		descriptor: tuple
+			small picklable value that attach_array turns back into the array
+	'''
+
+	array = np.ascontiguousarray(array)
+	shared_memory = _shared_memory()
+
+	if shared_memory is None or array.nbytes == 0:
+		return None, (None, array)
+
+	block = shared_memory.SharedMemory(create = True, size = array.nbytes)
+	np.ndarray(array.shape, array.dtype, buffer = block.buf)[...] = array
+
+	return block, (block.name, (array.shape, array.dtype.str))
+
+
+def attach_array(descriptor):
+	'''Opens an array shared by share_array, as a read-only view
+
+	Return
+	-----
+		block: SharedMemory
+			must be kept alive for as long as the array is used, None if the array was copied
+
+		array: numpy array
+	'''
+
+	name, layout = descriptor
+
+	if name is None:
+		return None, layout
+
+	shape, dtype = layout
+	block = _shared_memory().SharedMemory(name = name)
+	array = np.ndarray(shape, np.dtype(dtype), buffer = block.buf)
+	array.flags.writeable = False
+
+	return block, array
+
+
+def release(blocks):
+	'''Closes and unlinks shared memory blocks created by share_array'''
+
+	for block in blocks:
+		if block is not None:
+			block.close()
+			block.unlink()
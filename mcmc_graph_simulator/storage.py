@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+
+class chain_store:
+	'''Collects the states visited by a chain as it runs.
+
+	Every state is passed through the same pipeline: the first burn_in states are discarded,
+	then only every thin-th state is kept. Kept states are counted by their compact key, and are
+	only appended to a full list of the chain if keep_chain is set, so memory grows with the
+	number of distinct states rather than the number of iterations.
+
+	If max_states is given, the counter is bounded as well, as a Misra-Gries heavy hitters
+	counter pruned in batches. Once it holds twice that many states, every count is lowered by
+	the (max_states + 1)-th largest count and the states left at zero are dropped. After N kept
+	states, every count is then at most N / (max_states + 1) below the true number of visits,
+	so a state visited more often than that is never dropped, however late it becomes frequent.
+	'''
+
+	def __init__(self, keep_chain = True, burn_in = 0, thin = 1, max_states = None):
+		'''
+		Params
+		------
+		keep_chain : boolean
+			True to keep every kept state in order, as well as the counts
+
+		burn_in : int
+			number of states to discard at the start of the chain
+
+		thin : int
+			keep only every thin-th state after the burn in
+
+		max_states : int, optional
+			largest number of distinct states to count
+		'''
+
+		if thin < 1:
+			raise ValueError("thin must be at least 1")
+
+		self.burn_in = burn_in
+		self.thin = thin
+		self.max_states = max_states
+
+		self.chain = [] if keep_chain else None
+		self.counts = {}
+		self.steps = 0
+		self.recorded = 0
+		self.dropped = 0
+
+	def record(self, key):
+		'''Passes the next state of the chain through the pipeline
+
+		Parameters
+		-----
+			key: hashable
+				compact key of the state
+
+		Return
+		-----
+			True if the state was kept
+		'''
+
+		step = self.steps
+		self.steps += 1
+
+		if step < self.burn_in or (step - self.burn_in) % self.thin:
+			return False
+
+		self.recorded += 1
+
+		if self.chain is not None:
+			self.chain.append(key)
+
+		counts = self.counts
+		counts[key] = counts.get(key, 0) + 1
+
+		if self.max_states is not None and len(counts) >= 2 * self.max_states:
+			self._prune()
+
+		return True
+
+	def _prune(self):
+		counts = self.counts
+		threshold = rank_states(counts)[self.max_states][1]
+
+		#the states are lowered in place, so those that are kept stay in the order they were first counted
+		for key, count in list(counts.items()):
+			if count > threshold:
+				counts[key] = count - threshold
+				self.dropped += threshold
+			else:
+				del counts[key]
+				self.dropped += count
+
+
+def graph_key(graph):
+	'''Hashable encoding of a networkx graph, equal for graphs with the same nodes and edges
+
+	Parameters
+	-----
+		graph: networkx Graph
+
+	Return
+	-----
+		tuple of the sorted nodes and the sorted edges, with each edge sorted as well
+	'''
+
+	edges = [(u, v) if u <= v else (v, u) for u, v in graph.edges()]
+
+	return tuple(sorted(graph.nodes())), tuple(sorted(edges))
+
+
+def rank_states(counts):
+	'''Sorts states from the most to the least visited in O(U log U), for U distinct states.
+	States that were visited equally often stay in the order they were first counted.
+
+	Parameters
+	-----
+		counts: dictionary
+			the number of times each state was visited
+
+	Return
+	-----
+		list of (state, count) pairs
+	'''
+
+	return sorted(counts.items(), key = lambda item: item[1], reverse = True)
+
+
+def top_states(counts, total, percentile = 99):
+	'''Finds the most visited states, which together make up the top (100 - percentile)% of a chain
+
+	Parameters
+	-----
+		counts: dictionary
+			the number of times each state was visited
+
+		total: int
+			the number of states in the chain
+
+		percentile: float
+			the percentile above which the most occuring states are desired
+
+	Return
+	-----
+		list of the fewest, most visited states whose visits add up to at least
+		(100 - percentile)% of the chain
+	'''
+
+	needed = .01 * (100 - percentile) * total
+
+	top = []
+	covered = 0
+	for state, count in rank_states(counts):
+		if covered >= needed:
+			break
+
+		top.append(state)
+		covered += count
+
+	return top
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import numpy as np
+
+from .lazy import lazy_module
+from .mcmc_graph_simulator import mcmc_graph, chain_seeds, distance_form
+from .distance import distance_matrix
+from .storage import top_states
+from .shared import share_array, attach_array, release
+
+mp = lazy_module('multiprocessing')
+
+
+def parameter_grid(r_values, T_values, repeats = 1, seed = None):
+	'''Every combination of r and T, each repeated with different seeds
+
+	Parameters
+	-----
+		r_values, T_values: list of float
+
+		repeats: int
+			number of chains run for every combination
+
+		seed: int, optional
+			seed the seeds of the jobs are derived from
+
+	Return
+	-----
+		list of jobs, dictionaries with the index, r, T and seed of each chain
+	'''
+
+	combinations = [(r, T) for r in r_values for T in T_values for i in range(repeats)]
+	seeds = chain_seeds(seed, len(combinations))
+
+	return [dict(index = i, r = r, T = T, seed = seeds[i]) for i, (r, T) in enumerate(combinations)]
+
+
+#read-only data shared by every job in a worker process, set up by _init_sweep_worker
+_sweep_worker = {}
+
+def _init_sweep_worker(nodes, coordinates, matrix, form, options):
+	blocks = []
+	arrays = []
+	for descriptor in [coordinates, matrix]:
+		block, array = attach_array(descriptor)
+		blocks.append(block)
+		arrays.append(array)
+
+	_sweep_worker['blocks'] = blocks
+	_sweep_worker['nodes'] = nodes
+	_sweep_worker['distances'] = distance_matrix.from_arrays(arrays[0], arrays[1], form)
+	_sweep_worker['options'] = options
+
+
+def _run_job(task):
+	job, iterations = task
+	start = time.time()
+
+	mcmc = mcmc_graph(_sweep_worker['nodes'], job['r'], job['T'], _sweep_worker['distances'], keep_chain = False, seed = job['seed'], **_sweep_worker['options'])
+	for i in range(iterations):
+		mcmc.predict_next()
+
+	#the most frequent graphs are kept as lists of edge numbers i * n + j, which are much smaller than networkx graphs
+	dtype = mcmc.state.key_dtype
+	top = [np.frombuffer(key, dtype = dtype).tolist() for key in top_states(mcmc.visits.counts, mcmc.visits.recorded)]
+
+	result = dict(job)
+	result.update(iterations = iterations, node0_connections = mcmc.avg_node0_connections, total_edges = mcmc.avg_total_edges,
+		longest_shortest_path = mcmc.avg_longest_shortest_path, top_states = top, summary = mcmc.summary(), seconds = time.time() - start)
+
+	return result
+
+
+class parameter_sweep:
+	'''Runs mcmc_graph over a grid of r and T values for the same nodes, in a pool of worker processes.
+
+	The distance matrix is computed once and shared with every worker, which builds its view of
+	it once and reuses it for every job it runs. Jobs are handed out one at a time as workers
+	become free, so fast and slow jobs balance out, and each result is appended to a JSON lines
+	file as soon as its job finishes. Jobs already in the file are skipped, so a sweep that was
+	interrupted can be started again with the same arguments and only runs what is missing. A
+	file holding a job with other values of r, T, seed or iterations raises a ValueError.
+	'''
+
+	def __init__(self, nodes, r_values, T_values, repeats = 1, seed = None, processes = None, **options):
+		'''
+		Params
+		------
+		nodes : list of touples
+
+		r_values, T_values : list of float
+			the grid, every combination is run
+
+		repeats : int
+			number of chains for every combination, each with its own seed
+
+		seed : int, optional
+			seed of the whole sweep
+
+		processes : int, optional
+			number of worker processes, defaults to the number of CPUs
+
+		options :
+			any other keyword arguments of mcmc_graph, such as burn_in or max_states
+		'''
+
+		self.nodes = nodes
+		self.jobs = parameter_grid(r_values, T_values, repeats, seed)
+		self.processes = processes
+		self.options = options
+		self.distances = distance_matrix([tuple(node) for node in nodes], distance_form(options))
+
+	def run(self, iterations, results = None, progress = None):
+		'''Runs every job of the grid
+
+		Parameters
+		-----
+			iterations: int
+				the number of iterations of each chain
+
+			results: str, optional
+				JSON lines file every result is appended to as soon as it is ready
+
+			progress: function, optional
+				called as progress(result, finished, total) in this process after every job
+
+		Return
+		-----
+			list of the result of every job, in the order of the grid, each a dictionary with the
+			index, r, T and seed of the job, the statistics of mcmc_graph.run and mcmc_graph.summary,
+			the most frequent graphs as lists of edge numbers i * n + j, and the seconds the job took
+		'''
+
+		finished = {}
+		complete = True
+		if results is not None and os.path.exists(results):
+			with open(results) as f:
+				for line in f:
+					complete = line.endswith('\n')
+
+					#a line cut short by an interrupted run is skipped, and its job run again
+					try:
+						result = json.loads(line)
+					except ValueError:
+						continue
+
+					#a file from another sweep would otherwise hand back results of other chains as these
+					index = result['index']
+					job = self.jobs[index] if 0 <= index < len(self.jobs) else None
+					if job is None or any(result[key] != job[key] for key in ['r', 'T', 'seed']) or result['iterations'] != iterations:
+						raise ValueError("%s holds job %d with r = %s, T = %s, seed = %s and %d iterations, which is not in this sweep"
+							% (results, index, result['r'], result['T'], result['seed'], result['iterations']))
+					finished[index] = result
+
+		tasks = [(job, iterations) for job in self.jobs if job['index'] not in finished]
+
+		distances = self.distances
+		coordinates_block, coordinates = share_array(distances.coordinates)
+		matrix_block, matrix = share_array(distances.matrix) if distances.matrix is not None else (None, (None, None))
+
+		output = open(results, 'a') if results is not None else None
+		if not complete:
+			output.write('\n')
+		p = mp.Pool(self.processes, _init_sweep_worker, (self.nodes, coordinates, matrix, distances.form, self.options))
+
+		try:
+			for result in p.imap_unordered(_run_job, tasks):
+				finished[result['index']] = result
+
+				if output is not None:
+					output.write(json.dumps(result) + '\n')
+					output.flush()
+
+				if progress is not None:
+					progress(result, len(finished), len(self.jobs))
+		finally:
+			p.terminate()
+			p.join()
+			release([coordinates_block, matrix_block])
+			if output is not None:
+				output.close()
+
+		return [finished[job['index']] for job in self.jobs]
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+from math import log
+import numpy as np
+
+from .lazy import lazy_module
+from .mcmc_graph_simulator import mcmc_graph, chain_seeds, chain_observables, distance_form
+from .compact import compact_graph
+from .distance import distance_matrix
+from .storage import chain_store, top_states
+from .shared import share_array, attach_array, release
+
+mp = lazy_module('multiprocessing')
+
+
+def geometric_ladder(T_min, T_max, replicas):
+	'''Temperatures from T_min to T_max with a constant ratio between neighbours'''
+
+	if replicas == 1:
+		return [float(T_min)]
+
+	return list(np.geomspace(T_min, T_max, replicas))
+
+
+class _replica:
+	'''A chain of the ladder, with separate statistics for every rung it has been on.
+
+	Swaps exchange the temperatures of two chains rather than their graphs, which is the same
+	move and avoids sending graphs between processes. What the chain measures is then added to
+	the statistics of the rung it is currently on.
+	'''
+
+	def __init__(self, mcmc, rung, max_states):
+		self.mcmc = mcmc
+		self.rung = rung
+		self.max_states = max_states
+		self.rungs = {rung: (mcmc.observables, mcmc.visits)}
+
+	def move(self, rung, T):
+		self.mcmc.T = T
+		if rung == self.rung:
+			return
+
+		if rung not in self.rungs:
+			self.rungs[rung] = (chain_observables(), chain_store(False, 0, 1, self.max_states))
+
+		self.rung = rung
+		self.mcmc.observables, self.mcmc.visits = self.rungs[rung]
+
+	def reset(self):
+		self.rungs = {}
+		self.rung = None
+
+	def statistics(self):
+		result = {}
+		for rung, (registry, visits) in self.rungs.items():
+			moments = dict((name, (stat.count, stat.mean, stat._m2)) for name, stat in registry.stats.items())
+			result[rung] = (moments, visits.counts, visits.recorded)
+
+		return result
+
+
+def _tempering_worker(connection, nodes, coordinates, matrix, form, options, replicas):
+	blocks = []
+	arrays = []
+	for descriptor in [coordinates, matrix]:
+		block, array = attach_array(descriptor)
+		blocks.append(block)
+		arrays.append(array)
+
+	distances = distance_matrix.from_arrays(arrays[0], arrays[1], form)
+	max_states = options.get('max_states')
+
+	chains = {}
+	for index, seed, rung, T in replicas:
+		mcmc = mcmc_graph(nodes, T = T, distances = distances, keep_chain = False, seed = seed, **options)
+		chains[index] = _replica(mcmc, rung, max_states)
+
+	try:
+		while True:
+			command, argument = connection.recv()
+
+			if command == 'run':
+				for chain in chains.values():
+					for i in range(argument):
+						chain.mcmc.predict_next()
+
+				connection.send(dict((index, chain.mcmc.theta) for index, chain in chains.items()))
+
+			elif command == 'move':
+				for index, (rung, T) in argument.items():
+					if index in chains:
+						chains[index].move(rung, T)
+
+			elif command == 'reset':
+				for chain in chains.values():
+					chain.reset()
+
+			elif command == 'statistics':
+				connection.send(dict((index, chain.statistics()) for index, chain in chains.items()))
+
+			else:
+				break
+	finally:
+		connection.close()
+		for block in blocks:
+			if block is not None:
+				block.close()
+
+
+class parallel_tempering:
+	'''Replica exchange over a ladder of temperatures, with the replicas run in worker processes.
+
+	One mcmc_graph chain is run at every temperature of the ladder. Every swap_every iterations,
+	neighbouring temperatures propose to exchange their states, alternating between the even and
+	the odd pairs of the ladder. Each chain samples in proportion to e**(theta / T), whatever its
+	proposals, since mcmc_graph corrects for them with the exact proposal probabilities, see
+	mcmc_graph._hastings_ratio. A swap between the states x and y at the temperatures T and T' is
+	therefore accepted with probability
+
+		min(1, e**((theta(y) - theta(x)) * (1/T - 1/T')))
+
+	The first temperature is the one of interest, the hotter ones help it move between states
+	that are far apart. During the burn in, the spacing of the temperatures between the first and
+	the last is adapted so that every pair swaps equally often, then the ladder is frozen and the
+	statistics start.
+	'''
+
+	def __init__(self, nodes, temperatures, r = 1, seed = None, processes = None, adapt = True, **options):
+		'''
+		Params
+		------
+		nodes : list of touples
+
+		temperatures : list of float
+			the ladder, in increasing order, for example geometric_ladder(1, 20, 8)
+
+		r : float
+			constant in the MCMC equations
+
+		seed : int, optional
+			seed of the whole run
+
+		processes : int, optional
+			number of worker processes, defaults to the number of CPUs or of temperatures if fewer
+
+		adapt : boolean
+			False to keep the temperatures as given
+
+		options :
+			any other keyword arguments of mcmc_graph, such as max_states
+		'''
+
+		if list(temperatures) != sorted(temperatures):
+			raise ValueError("Temperatures must be in increasing order")
+
+		self.nodes = nodes
+		self.temperatures = [float(T) for T in temperatures]
+		self.r = r
+		self.seed = seed
+		self.processes = processes or min(mp.cpu_count(), len(self.temperatures))
+		self.adapt = adapt
+		#number of swap rounds between changes of the ladder
+		self.window = 20
+		self.options = options
+		self.distances = distance_matrix([tuple(node) for node in nodes], distance_form(options))
+
+		rungs = len(self.temperatures)
+		self.attempted = np.zeros(max(rungs - 1, 0), dtype = np.int64)
+		self.accepted = np.zeros(max(rungs - 1, 0), dtype = np.int64)
+		self.replicas = None
+
+	@property
+	def swap_acceptance(self):
+		'''Fraction of the swaps accepted between each pair of neighbouring temperatures'''
+
+		return self.accepted / np.maximum(self.attempted, 1).astype(float)
+
+	def run(self, iterations, swap_every = 100, burn_in = None):
+		'''Runs every replica for the given number of iterations
+
+		Parameters
+		-----
+			iterations: int
+				the number of iterations of each replica
+
+			swap_every: int
+				number of iterations between swap attempts
+
+			burn_in: int, optional
+				number of iterations to adapt the ladder for and leave out of the statistics,
+				defaults to a tenth of the iterations. The burn in ends at the first swap after it,
+				so there has to be a swap after the burn in and before the last iteration
+
+		Return
+		-----
+			The same statistics as mcmc_graph.run for the first temperature. The statistics of every
+			temperature are kept in self.replicas, see summary
+		'''
+
+		#the last swap before the end, the statistics are reset at a swap so the burn in has to end by then
+		last = (iterations - 1) // swap_every * swap_every
+		if burn_in is None:
+			burn_in = min(iterations // 10, max(last, 0))
+		if burn_in > 0 and burn_in > last:
+			raise ValueError("The burn in of %d iterations does not end before the last swap, after %d of the %d iterations" % (burn_in, last, iterations))
+
+		rungs = len(self.temperatures)
+		seeds = chain_seeds(self.seed, rungs + 1)
+		swaps = np.random.default_rng(seeds[-1])
+
+		#order[t] is the replica currently at temperature t
+		order = list(range(rungs))
+		tried = np.zeros(max(rungs - 1, 0))
+		took = np.zeros(max(rungs - 1, 0))
+		updates = 0
+		self.attempted[:] = 0
+		self.accepted[:] = 0
+
+		distances = self.distances
+		coordinates_block, coordinates = share_array(distances.coordinates)
+		matrix_block, matrix = share_array(distances.matrix) if distances.matrix is not None else (None, (None, None))
+		options = dict(self.options, r = self.r)
+
+		connections = []
+		workers = []
+		try:
+			for w in range(self.processes):
+				replicas = [(i, seeds[i], i, self.temperatures[i]) for i in range(w, rungs, self.processes)]
+				parent, child = mp.Pipe()
+				worker = mp.Process(target = _tempering_worker, args = (child, self.nodes, coordinates, matrix, distances.form, options, replicas))
+				worker.daemon = True
+				worker.start()
+				child.close()
+				connections.append(parent)
+				workers.append(worker)
+
+			done = 0
+			rounds = 0
+			reset = burn_in == 0
+			while done < iterations:
+				steps = min(swap_every, iterations - done)
+				for connection in connections:
+					connection.send(('run', steps))
+
+				theta = {}
+				for connection in connections:
+					theta.update(connection.recv())
+
+				done += steps
+				if done == iterations:
+					break
+
+				for t in range(rounds % 2, rungs - 1, 2):
+					a = order[t]
+					b = order[t+1]
+					log_ratio = (theta[b] - theta[a]) * (1 / self.temperatures[t] - 1 / self.temperatures[t+1])
+
+					swapped = log_ratio >= 0 or log(1 - swaps.random()) < log_ratio
+					if swapped:
+						order[t], order[t+1] = b, a
+
+					if reset:
+						self.attempted[t] += 1
+						self.accepted[t] += swapped
+					tried[t] += 1
+					took[t] += swapped
+
+				#the ladder is adapted from the swaps of a window of rounds, which is less noisy than single swaps
+				rounds += 1
+				if self.adapt and not reset and rounds % self.window == 0:
+					updates += 1
+					self._adapt(took / np.maximum(tried, 1), updates)
+					tried[:] = 0
+					took[:] = 0
+
+				moves = dict((order[t], (t, self.temperatures[t])) for t in range(rungs))
+				for connection in connections:
+					connection.send(('move', moves))
+
+				#the round that reaches the burn in is the last one of it, for the statistics, the
+				#swaps counted and the adapted ladder alike
+				if not reset and done >= burn_in:
+					reset = True
+					for connection in connections:
+						connection.send(('reset', None))
+						connection.send(('move', moves))
+
+			statistics = {}
+			for connection in connections:
+				connection.send(('statistics', None))
+				statistics.update(connection.recv())
+
+			for connection in connections:
+				connection.send(('close', None))
+		finally:
+			for worker in workers:
+				worker.join(1)
+				if worker.is_alive():
+					worker.terminate()
+					worker.join()
+
+			for connection in connections:
+				connection.close()
+
+			release([coordinates_block, matrix_block])
+
+		self.replicas = self._combine(statistics, rungs)
+		first = self.replicas[0]
+
+		state = compact_graph(self.nodes, distances, dense = False)
+		top = [state.to_networkx(key) for key in top_states(first['counts'], first['recorded'])]
+
+		return [first['stats']['node0_connections']['mean'], first['stats']['total_edges']['mean'], first['stats']['longest_shortest_path']['mean'], top]
+
+	def _adapt(self, rates, updates):
+		#the log of every gap grows when its pair swaps more often than average, and shrinks otherwise,
+		#with steps that get smaller as the ladder settles, the first and last temperature stay fixed
+		temperatures = np.array(self.temperatures)
+		if len(temperatures) < 3:
+			return
+
+		gaps = np.log(np.diff(temperatures))
+		gaps += 1.0 / (1 + updates / 50.0) * (rates - rates.mean())
+
+		gaps = np.exp(gaps)
+		gaps *= (temperatures[-1] - temperatures[0]) / gaps.sum()
+
+		self.temperatures = [float(T) for T in temperatures[0] + np.concatenate([[0], np.cumsum(gaps)])]
+		self.temperatures[-1] = float(temperatures[-1])
+
+	def _combine(self, statistics, rungs):
+		#merge what each replica measured at every temperature, with the parallel variant of Welford's algorithm
+		replicas = []
+		for t in range(rungs):
+			moments = {}
+			counts = {}
+			recorded = 0
+
+			for chain in statistics.values():
+				if t not in chain:
+					continue
+
+				chain_moments, chain_counts, chain_recorded = chain[t]
+				recorded += chain_recorded
+				for key, count in chain_counts.items():
+					counts[key] = counts.get(key, 0) + count
+
+				for name, (count, mean, m2) in chain_moments.items():
+					total, total_mean, total_m2 = moments.get(name, (0, 0.0, 0.0))
+					if count == 0:
+						continue
+
+					combined = total + count
+					delta = mean - total_mean
+					moments[name] = (combined, total_mean + delta * count / combined, total_m2 + m2 + delta ** 2 * total * count / combined)
+
+			stats = {}
+			for name, (count, mean, m2) in moments.items():
+				stats[name] = dict(mean = mean, variance = m2 / (count - 1) if count > 1 else float('nan'), count = count)
+
+			replicas.append(dict(T = self.temperatures[t], stats = stats, counts = counts, recorded = recorded, swap_acceptance = self.swap_acceptance[t] if t < rungs - 1 else None))
+
+		return replicas
+
+	def summary(self):
+		'''Statistics of every temperature of the last run
+
+		Return
+		-----
+			list with a dictionary for every temperature, holding the temperature T, the mean, variance
+			and count of every tracked value, and the fraction of swaps accepted with the next temperature
+		'''
+
+		return [dict(T = replica['T'], stats = replica['stats'], swap_acceptance = replica['swap_acceptance']) for replica in self.replicas]
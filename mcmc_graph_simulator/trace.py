@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+from bisect import bisect_left
+import numpy as np
+
+from .compact import compact_graph
+
+
+def _record_type(names):
+	return np.dtype([('edge', np.int64), ('accepted', np.bool_), ('values', np.float64, (len(names),))])
+
+
+class trace_writer:
+	'''Appends every state of a chain to a memory-mapped file on disk.
+
+	States are not stored whole. Each step is a record of the edge that was proposed, whether it
+	was accepted, and the value of every observable, so a step takes 9 + 8 * observables bytes
+	whatever the size of the graph. The states themselves are replayed from the first one by
+	trace_reader. The file is preallocated and doubles in size when it fills up, and a small JSON
+	file next to it, path + '.json', describes the layout and the number of records written.
+	'''
+
+	def __init__(self, path, nodes, names, edges, capacity = 65536, buffer_size = 4096):
+		'''
+		Params
+		------
+		path : str
+			file to write, replaced if it exists
+
+		nodes : list of touples
+			the nodes of the chain, in the order of its compact_graph
+
+		names : list of str
+			names of the observables stored with every step
+
+		edges : list of int
+			edge numbers i * n + j of the first state
+
+		capacity : int
+			number of records the file has room for at first
+
+		buffer_size : int
+			number of records collected in memory before they are copied to the file
+		'''
+
+		self.path = path
+		self.names = list(names)
+		self.dtype = _record_type(self.names)
+		self.count = 0
+		self.capacity = max(capacity, 1)
+		self.buffer_size = buffer_size
+		self._edges = []
+		self._accepted = []
+		self._values = []
+
+		self.header = dict(nodes = [list(node) for node in nodes], names = self.names, initial = sorted(int(edge) for edge in edges), count = 0)
+
+		with open(path, 'wb') as f:
+			f.truncate(self.capacity * self.dtype.itemsize)
+
+		self._map = np.memmap(path, dtype = self.dtype, mode = 'r+', shape = (self.capacity,))
+		self._write_header()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def __len__(self):
+		return self.count + len(self._edges)
+
+	def append(self, edge, accepted, values):
+		'''Adds a step
+
+		Parameters
+		-----
+			edge: int
+				number i * n + j of the proposed edge, -1 for none
+
+			accepted: boolean
+
+			values: list
+				the value of every observable in the new state
+		'''
+
+		self._edges.append(edge)
+		self._accepted.append(accepted)
+		self._values.append(values)
+
+		if len(self._edges) >= self.buffer_size:
+			self.flush()
+
+	def flush(self):
+		'''Copies the buffered records to the file and updates the record count on disk'''
+
+		size = len(self._edges)
+		if size:
+			if self.count + size > self.capacity:
+				self._grow(self.count + size)
+
+			records = self._map[self.count:self.count + size]
+			records['edge'] = self._edges
+			records['accepted'] = self._accepted
+			#observables added after the trace was started are left out
+			width = len(self.names)
+			records['values'] = [values[:width] for values in self._values]
+			self.count += size
+
+			self._edges = []
+			self._accepted = []
+			self._values = []
+
+		self._map.flush()
+		self._write_header()
+
+	def close(self):
+		'''Flushes the last records and trims the file to them'''
+
+		if self._map is None:
+			return
+
+		self.flush()
+		self._map = None
+
+		with open(self.path, 'r+b') as f:
+			f.truncate(self.count * self.dtype.itemsize)
+
+	def _grow(self, needed):
+		while self.capacity < needed:
+			self.capacity *= 2
+
+		self._map.flush()
+		self._map = None
+
+		with open(self.path, 'r+b') as f:
+			f.truncate(self.capacity * self.dtype.itemsize)
+
+		self._map = np.memmap(self.path, dtype = self.dtype, mode = 'r+', shape = (self.capacity,))
+
+	def _write_header(self):
+		self.header['count'] = self.count
+
+		temporary = self.path + '.json.tmp'
+		with open(temporary, 'w') as f:
+			json.dump(self.header, f)
+		os.replace(temporary, self.path + '.json')
+
+
+class trace_reader:
+	'''Reads a trace written by trace_writer without loading it into memory.
+
+	The columns are numpy views of the memory-mapped file, so slicing them reads only the part
+	that is used. States are rebuilt lazily by replaying the accepted edge changes on a sorted
+	list of the edges, so replaying takes memory and time in the number of edges, not n**2.
+	'''
+
+	def __init__(self, path):
+		with open(path + '.json') as f:
+			header = json.load(f)
+
+		self.path = path
+		self.nodes = [tuple(node) for node in header['nodes']]
+		self.names = header['names']
+		self.initial = np.array(header['initial'], dtype = np.int64)
+		self.n = len(self.nodes)
+		self.key_dtype = np.int32 if self.n * self.n < 2**31 else np.int64
+		self.dtype = _record_type(self.names)
+		self._graph = None
+
+		count = header['count']
+		if count:
+			self.records = np.memmap(path, dtype = self.dtype, mode = 'r', shape = (count,))
+		else:
+			self.records = np.zeros(0, dtype = self.dtype)
+
+	def __len__(self):
+		return len(self.records)
+
+	def __getitem__(self, name):
+		'''Values of one observable at every step'''
+
+		return self.values[:, self.names.index(name)]
+
+	@property
+	def edges(self):
+		return self.records['edge']
+
+	@property
+	def accepted(self):
+		return self.records['accepted']
+
+	@property
+	def values(self):
+		return self.records['values']
+
+	def states(self, start = 0, stop = None, step = 1, chunk_size = 1 << 20):
+		'''Replays the states of the chain
+
+		Parameters
+		-----
+			start, stop, step: int
+				the steps to return, as in a slice
+
+			chunk_size: int
+				number of records read at a time while skipping to start
+
+		Return
+		-----
+			iterator over the keys of the states, the same values compact_graph.key gives
+		'''
+
+		start, stop, step = slice(start, stop, step).indices(len(self))
+		present = set(self.initial.tolist())
+
+		#jump to start with the parity of the accepted changes of every edge
+		for first in range(0, start, chunk_size):
+			last = min(first + chunk_size, start)
+			changed, counts = np.unique(self.edges[first:last][self.accepted[first:last]], return_counts = True)
+			present.symmetric_difference_update(changed[counts % 2 == 1].tolist())
+
+		#the edges are kept sorted, so a change costs O(E) and the key is only rebuilt when it is needed
+		edges = sorted(present)
+		key = None
+		for first in range(start, stop, chunk_size):
+			last = min(first + chunk_size, stop)
+			changes = zip(range(first, last), self.edges[first:last].tolist(), self.accepted[first:last].tolist())
+
+			for i, edge, accepted in changes:
+				if accepted:
+					position = bisect_left(edges, edge)
+					if position < len(edges) and edges[position] == edge:
+						del edges[position]
+					else:
+						edges.insert(position, edge)
+					key = None
+
+				if (i - start) % step == 0:
+					if key is None:
+						key = np.array(edges, dtype = self.key_dtype).tobytes()
+					yield key
+
+	def state(self, i):
+		'''Key of the state at step i'''
+
+		if i < 0:
+			i += len(self)
+
+		return next(self.states(i, i + 1))
+
+	def graph(self, i):
+		'''State at step i, exported to a networkx Graph'''
+
+		if self._graph is None:
+			self._graph = compact_graph(self.nodes, dense = False)
+
+		return self._graph.to_networkx(self.state(i))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+helpers
+----------------------------------
+
+Shared helpers of the tests, which check that chains sample e**(theta / T).
+"""
+
+
+import math
+import itertools
+import numpy as np
+import networkx as nx
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+
+
+
+def stationary_target(nodes, r, T):
+    '''Probability of every connected graph over the nodes under e**(theta / T), by the key of the graph'''
+
+    mcmc = mcmc_graph(nodes, r, T)
+    n = len(nodes)
+    pairs = list(itertools.combinations(range(n), 2))
+    target = {}
+    for k in range(1, len(pairs) + 1):
+        for edges in itertools.combinations(pairs, k):
+            graph = nx.Graph()
+            graph.add_nodes_from(nodes)
+            graph.add_weighted_edges_from((nodes[i], nodes[j], mcmc.state.weight(i, j)) for i, j in edges)
+            if nx.is_connected(graph):
+                key = np.array([i * n + j for i, j in edges], dtype = mcmc.state.key_dtype).tobytes()
+                target[key] = math.exp(mcmc.calculate_theta(graph, (0,0), r) / T)
+
+    total = sum(target.values())
+    return dict((key, p / total) for key, p in target.items())
+
+
+def total_variation(counts, target):
+    '''Total variation distance between the visits counted for every graph and the target probabilities'''
+
+    visits = float(sum(counts.values()))
+    return 0.5 * sum(abs(counts.get(key, 0) / visits - p) for key, p in target.items())
+
+
+def stationary_distance(mcmc, nodes, iterations):
+    '''Runs the chain and returns the total variation distance between its visits and e**(theta / T) over every connected graph'''
+
+    target = stationary_target(nodes, mcmc.r, mcmc.T)
+    mcmc.run(iterations)
+
+    return total_variation(mcmc.visits.counts, target)
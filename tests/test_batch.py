@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_batch
+----------------------------------
+
+Tests for `batch` module.
+"""
+
+
+import unittest
+import networkx as nx
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.batch import batch_mcmc
+
+from .helpers import stationary_target, total_variation
+
+
+
+class TestBatch_mcmc(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.batch = batch_mcmc(self.nodes, 16, seed = 5)
+        self.mcmc = mcmc_graph(self.nodes)
+        pass
+
+    def test_weights(self):
+        for p in [0, 7, 20, 35]:
+            u, v = self.batch._pairs(p)
+            self.assertEqual(self.batch._pair_index(int(u), int(v)), p)
+            self.assertAlmostEqual(self.batch.distances.get(int(u), int(v)), self.mcmc.get_distance(self.nodes[u], self.nodes[v]))
+
+    def test_pairs(self):
+        #the inverse of _pair_index holds at every row boundary of a large triangle
+        batch = batch_mcmc([(0,0), (1,0)], 1)
+        batch.n = 100000
+        i = [0, 0, 1, 5000, 99997, 99998]
+        j = [1, 99999, 2, 5001, 99999, 99999]
+        first, second = batch._pairs([batch._pair_index(u, v) for u, v in zip(i, j)])
+        self.assertEqual(first.tolist(), i)
+        self.assertEqual(second.tolist(), j)
+
+    def test_chains_stay_consistent(self):
+        for i in range(300):
+            self.batch.step()
+
+        for k in range(16):
+            state = self.batch.states[k]
+            graph = state.to_networkx()
+            self.assertTrue(nx.is_connected(graph))
+            self.assertIsNone(state.adjacency)
+            self.assertEqual(state.key(), self.batch.keys[k])
+            self.assertEqual(self.batch.edge_count[k], state.edge_count)
+            self.assertAlmostEqual(self.batch.theta[k], self.mcmc.calculate_theta(graph, (0,0)))
+            self.assertEqual(self.batch.bridge_count[k], len(self.mcmc.get_bridges(graph)))
+            self.assertEqual(len(self.batch._edges[k].bridges), self.batch.bridge_count[k])
+            self.assertEqual(self.batch.edges[k].sum(), state.edge_count)
+
+        self.assertTrue(0 < self.batch.accepted.sum() < 300 * 16)
+
+    def test_run(self):
+        stats = self.batch.run(500)
+        self.assertEqual(len(stats), 4)
+        self.assertEqual(self.batch.count, 501)
+
+        summary = self.batch.summary()
+        self.assertAlmostEqual(summary['total_edges']['mean'], stats[1])
+        self.assertTrue(summary['total_edges']['rhat'] >= 0.9)
+
+    def test_matches_mcmc_graph(self):
+        #both engines sample the same distribution, so their averages agree
+        #at a temperature where a single chain mixes well
+        stats = batch_mcmc(self.nodes, 32, T = 20, seed = 1, burn_in = 500).run(1500)
+        serial = mcmc_graph(self.nodes, T = 20, seed = 1, keep_chain = False, burn_in = 1000).run(20000)
+        self.assertTrue(abs(stats[1] - serial[1]) < 1.0)
+
+    def test_stationary_distribution(self):
+        #the chains rejected early by the bound on the acceptance probability
+        #leave every connected graph in proportion to e**(theta / T)
+        nodes = [(0,0), (1,2), (3,1), (-2,1)]
+        target = stationary_target(nodes, 0.5, 3.0)
+        batch = batch_mcmc(nodes, 64, 0.5, 3.0, seed = 5)
+        for i in range(100):
+            batch.step()
+
+        counts = {}
+        for i in range(1000):
+            batch.step()
+            for key in batch.keys:
+                counts[key] = counts.get(key, 0) + 1
+
+        self.assertLess(total_variation(counts, target), 0.06)
+
+    def tearDown(self):
+        pass
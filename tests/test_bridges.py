@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_bridges
+----------------------------------
+
+Tests for `bridges` module.
+"""
+
+
+import unittest
+from random import Random
+import networkx as nx
+
+from mcmc_graph_simulator.bridges import bridge_index, two_edge_components
+
+
+
+def brute_force_bridges(graph):
+    bridges = set()
+    for u, v in graph.edges():
+        g = graph.copy()
+        g.remove_edge(u, v)
+        if not nx.is_connected(g):
+            bridges.add(frozenset((u, v)))
+    return bridges
+
+
+class TestBridges(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = nx.Graph()
+        self.graph.add_path([0, 1, 2, 3, 4, 5, 6, 7])
+        pass
+
+    def test_two_edge_components(self):
+        self.graph.add_edge(0, 3)
+        self.graph.add_edge(5, 7)
+
+        bridges, components = two_edge_components(self.graph)
+
+        self.assertEqual(set(frozenset(b) for b in bridges), brute_force_bridges(self.graph))
+        self.assertEqual(sorted(map(sorted, components)), [[0, 1, 2, 3], [4], [5, 6, 7]])
+
+    def test_does_not_modify_graph(self):
+        before = list(self.graph.edges(data = True))
+        two_edge_components(self.graph)
+        self.assertEqual(list(self.graph.edges(data = True)), before)
+
+    def test_random_walk(self):
+        #compare the incrementally maintained index with a brute force search
+        rng = Random(7)
+        index = bridge_index(self.graph)
+        graph = self.graph
+
+        for i in range(300):
+            proposed = graph.copy()
+            u, v = rng.sample(proposed.nodes(), 2)
+
+            add = not proposed.has_edge(u, v)
+            if add:
+                proposed.add_edge(u, v)
+            elif index.is_bridge(u, v):
+                continue
+            else:
+                proposed.remove_edge(u, v)
+
+            count = index.preview(proposed, u, v, add)
+            self.assertEqual(count, len(brute_force_bridges(proposed)))
+
+            if rng.random() < 0.5:
+                index.accept()
+                graph = proposed
+            else:
+                index.reject()
+
+            self.assertEqual(set(frozenset(b) for b in index.bridges), brute_force_bridges(graph))
+
+    def tearDown(self):
+        pass
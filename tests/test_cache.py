@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cache
+----------------------------------
+
+Tests for `cache` module.
+"""
+
+
+import unittest
+import numpy as np
+
+from mcmc_graph_simulator.cache import state_cache, edge_hash, state_hash
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+
+
+
+class TestState_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = state_cache(max_size = 2)
+        pass
+
+    def test_state_hash(self):
+        self.assertEqual(state_hash([3, 10, 27]), state_hash([27, 3, 10]))
+        self.assertEqual(state_hash([3, 10]) ^ edge_hash(27), state_hash([3, 10, 27]))
+        self.assertNotEqual(state_hash([3, 10]), state_hash([3, 11]))
+        self.assertEqual(state_hash([]), 0)
+
+    def test_least_recently_used(self):
+        self.cache.put(1, 10.0, 2)
+        self.cache.put(2, 20.0, 1)
+        self.assertEqual(self.cache.get(1), [10.0, 2, None])
+
+        #2 was used least recently, so it is dropped
+        self.cache.put(3, 30.0, 0, 4.5)
+        self.assertNotIn(2, self.cache)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(2))
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.hit_rate, 0.5)
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.hits, 0)
+
+    def tearDown(self):
+        pass
+
+
+
+class TestChain_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        pass
+
+    def test_same_chain(self):
+        #the cache only saves work, the chain makes the same moves
+        for options in [dict(), dict(neighbors = 3), dict(block_moves = 0.3)]:
+            cached = mcmc_graph(self.nodes, T = 0.5, seed = 6, cache_size = 1000, **options)
+            plain = mcmc_graph(self.nodes, T = 0.5, seed = 6, **options)
+            self.assertEqual(cached.run(1500)[:3], plain.run(1500)[:3])
+            self.assertEqual(cached.markov_chain, plain.markov_chain)
+            self.assertGreater(cached.cache.hit_rate, 0.5)
+
+    def test_profiled(self):
+        cached = mcmc_graph(self.nodes, T = 0.5, seed = 6, cache_size = 1000)
+        cached.enable_profiling()
+        plain = mcmc_graph(self.nodes, T = 0.5, seed = 6)
+        self.assertEqual(cached.run(500)[:3], plain.run(500)[:3])
+
+    def test_entries(self):
+        mcmc = mcmc_graph(self.nodes, T = 2, seed = 1, cache_size = 50)
+        mcmc.run(1000)
+        self.assertLessEqual(len(mcmc.cache), 50)
+
+        #the current graph is cached with its values
+        key = state_hash(np.frombuffer(mcmc._key, dtype = mcmc.state.key_dtype).tolist())
+        self.assertEqual(mcmc._hash, key)
+        theta, bridges, longest = mcmc.cache.entries[key]
+        self.assertAlmostEqual(theta, mcmc.theta)
+        self.assertEqual(bridges, len(mcmc._bridges))
+        self.assertAlmostEqual(longest, mcmc.get_longest_shortest_path(mcmc.current_graph))
+
+    def tearDown(self):
+        pass
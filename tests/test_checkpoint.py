@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_checkpoint
+----------------------------------
+
+Tests for `checkpoint` module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.checkpoint import write_checkpoint, read_checkpoint, pack_keys, unpack_keys
+
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'chain.npz')
+        pass
+
+    def test_pack_keys(self):
+        keys = [np.array([1, 5, 9], np.int32).tobytes(), b'', np.array([2], np.int32).tobytes()]
+        edges, offsets = pack_keys(keys, np.int32)
+        self.assertEqual(list(offsets), [0, 3, 3, 4])
+        self.assertEqual(unpack_keys(edges, offsets), keys)
+
+    def test_atomic_write(self):
+        write_checkpoint(self.path, dict(a = 1), dict(x = np.arange(3)))
+        meta, arrays = read_checkpoint(self.path)
+        self.assertEqual(meta['a'], 1)
+        self.assertEqual(list(arrays['x']), [0, 1, 2])
+        self.assertEqual(os.listdir(self.directory), ['chain.npz'])
+
+    def test_resume(self):
+        #a chain continued from a checkpoint makes exactly the same moves as one that was never stopped
+        mcmc = mcmc_graph(self.nodes, seed = 4, burn_in = 50, max_states = 40)
+        mcmc.add_observable('theta', lambda chain: chain.theta)
+        mcmc.run(700)
+        mcmc.save_checkpoint(self.path)
+        expected = mcmc.run(600)
+
+        loaded = mcmc_graph.load_checkpoint(self.path, functions = dict(theta = lambda chain: chain.theta))
+        self.assertEqual(loaded.iterations, 700)
+        stats = loaded.run(600)
+
+        self.assertEqual(stats[:3], expected[:3])
+        self.assertEqual(loaded.markov_chain, mcmc.markov_chain)
+        self.assertEqual(loaded.visits.counts, mcmc.visits.counts)
+        self.assertEqual(loaded.summary(), mcmc.summary())
+        self.assertEqual(loaded.state.key(), mcmc.state.key())
+
+    def test_resume_block_moves(self):
+        mcmc = mcmc_graph(self.nodes, seed = 4, burn_in = 400, block_moves = 0.5, target_acceptance = 0.2)
+        mcmc.run(300)
+        mcmc.save_checkpoint(self.path)
+        expected = mcmc.run(600)
+
+        loaded = mcmc_graph.load_checkpoint(self.path)
+        self.assertEqual(loaded.run(600)[:3], expected[:3])
+        self.assertEqual(loaded.block_size, mcmc.block_size)
+
+    def test_periodic(self):
+        mcmc = mcmc_graph(self.nodes, seed = 4, keep_chain = False)
+        mcmc.run(250, checkpoint = self.path, checkpoint_every = 100)
+        self.assertEqual(mcmc_graph.load_checkpoint(self.path).iterations, 250)
+
+    def test_custom_observable_needs_function(self):
+        mcmc = mcmc_graph(self.nodes, seed = 4)
+        mcmc.add_observable('theta', lambda chain: chain.theta)
+        mcmc.save_checkpoint(self.path)
+        self.assertNotIn('theta', mcmc_graph.load_checkpoint(self.path).observables)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass
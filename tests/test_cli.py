@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cli
+----------------------------------
+
+Tests for `cli` module.
+"""
+
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from click.testing import CliRunner
+
+from mcmc_graph_simulator.cli import main, load_nodes
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.trace import trace_reader
+
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.directory = tempfile.mkdtemp()
+        self.csv = os.path.join(self.directory, 'nodes.csv')
+        with open(self.csv, 'w') as f:
+            f.write('x,y\n')
+            for node in self.nodes:
+                f.write('%d,%d\n' % node)
+        self.runner = CliRunner()
+        pass
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_load_nodes(self):
+        self.assertEqual(load_nodes(self.csv), self.nodes)
+
+        np.save(self.path('nodes.npy'), np.array(self.nodes[1:], dtype = float) + 0.5)
+        nodes = load_nodes(self.path('nodes.npy'), add_origin = True)
+        self.assertEqual(nodes[0], (0, 0))
+        self.assertEqual(nodes[1], (1.5, 2.5))
+
+    def test_serial(self):
+        result = self.runner.invoke(main, [self.csv, '-n', '500', '--seed', '3', '-o', self.path('out.json')])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        with open(self.path('out.json')) as f:
+            output = json.load(f)
+
+        stats = mcmc_graph(self.nodes, seed = 3, keep_chain = False).run(500)
+        self.assertEqual(output['total_edges'], stats[1])
+        self.assertEqual(output['iterations_run'], [500])
+        self.assertEqual(len(output['top_states']), len(stats[3]))
+        self.assertEqual(set(output['summary']), set(['node0_connections', 'total_edges', 'longest_shortest_path']))
+
+    def test_checkpoint_and_trace(self):
+        arguments = [self.csv, '--seed', '3', '--checkpoint', self.path('chain.npz'), '--checkpoint-every', '100', '--resume']
+        self.assertEqual(self.runner.invoke(main, arguments + ['-n', '300']).exit_code, 0)
+
+        result = self.runner.invoke(main, arguments + ['-n', '500', '--trace', self.path('chain.trace')])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(json.loads(result.output)['iterations_run'], [500])
+        self.assertEqual(len(trace_reader(self.path('chain.trace'))), 201)
+
+        #resuming again would overwrite the trace of the segment above
+        result = self.runner.invoke(main, arguments + ['-n', '700', '--trace', self.path('chain.trace')])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertEqual(len(trace_reader(self.path('chain.trace'))), 201)
+
+    def test_resume_parameters(self):
+        #a resumed chain keeps the options saved in its checkpoint, and the output reports those
+        arguments = [self.csv, '--checkpoint', self.path('chain.npz'), '--checkpoint-every', '100', '--resume']
+        self.assertEqual(self.runner.invoke(main, arguments + ['-n', '300', '-T', '5', '--seed', '3']).exit_code, 0)
+
+        result = self.runner.invoke(main, arguments + ['-n', '500', '-T', '50', '-r', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        parameters = json.loads(result.output)['parameters']
+        self.assertEqual(parameters['T'], 5)
+        self.assertEqual(parameters['r'], 1)
+        self.assertEqual(parameters['resumed_at'], 300)
+        self.assertIsNone(parameters['seed'])
+
+    def test_undefined_statistics(self):
+        #a burn in as long as the run leaves no variance, which is written as null rather than NaN
+        result = self.runner.invoke(main, [self.csv, '-n', '100', '--burn-in', '100', '--seed', '3', '-o', self.path('out.json')])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        with open(self.path('out.json')) as f:
+            output = json.load(f, parse_constant = lambda constant: self.fail(constant))
+
+        self.assertIsNone(output['summary']['total_edges']['variance'])
+
+    def test_neighbors(self):
+        result = self.runner.invoke(main, [self.csv, '-n', '300', '--seed', '3', '--neighbors', '3', '--locality', '0.8'])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        stats = mcmc_graph(self.nodes, seed = 3, keep_chain = False, neighbors = 3, locality = 0.8).run(300)
+        self.assertEqual(json.loads(result.output)['total_edges'], stats[1])
+
+    def test_backend(self):
+        result = self.runner.invoke(main, [self.csv, '-n', '300', '--seed', '3', '--backend', 'sparse'])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        output = json.loads(result.output)
+        self.assertEqual(output['parameters']['backend'], 'sparse')
+        self.assertEqual(output['total_edges'], mcmc_graph(self.nodes, seed = 3, keep_chain = False).run(300)[1])
+
+    def test_parallel(self):
+        result = self.runner.invoke(main, [self.csv, '-n', '300', '--chains', '2', '--processes', '2', '--seed', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(json.loads(result.output)['iterations_run'], [300, 300])
+
+    def test_usage_errors(self):
+        result = self.runner.invoke(main, [self.csv, '--chains', '2', '--trace', self.path('chain.trace')])
+        self.assertNotEqual(result.exit_code, 0)
+
+        result = self.runner.invoke(main, [self.csv, '--chains', '3', '--processes', '2', '--rhat', '1.1', '--check-every', '200', '-n', '2000'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('processes', result.output)
+
+        np.save(self.path('far.npy'), np.array([[1, 1], [2, 2]]))
+        result = self.runner.invoke(main, [self.path('far.npy')])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('origin', result.output)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_compact
+----------------------------------
+
+Tests for `compact` module.
+"""
+
+
+import unittest
+import networkx as nx
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.compact import compact_graph, shortest_distances
+
+
+
+class TestCompact_graph(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (3,4), (6,0), (6,8)]
+        self.graph = compact_graph(self.nodes)
+        pass
+
+    def test_weights(self):
+        self.assertEqual(self.graph.weight(0, 1), 5)
+        self.assertEqual(self.graph.weight(1, 0), 5)
+        self.assertEqual(self.graph.weight(0, 2), 6)
+
+    def test_toggle(self):
+        self.assertTrue(self.graph.toggle(0, 1))
+        self.assertTrue(self.graph.has_edge(1, 0))
+        self.assertEqual(self.graph.adjacency[1, 0], 1)
+        self.assertEqual(self.graph.edge_count, 1)
+
+        self.assertFalse(self.graph.toggle(1, 0)) #toggling again undoes the change
+        self.assertFalse(self.graph.has_edge(0, 1))
+        self.assertEqual(self.graph.adjacency.sum(), 0)
+        self.assertEqual(self.graph.edge_count, 0)
+
+    def test_key(self):
+        other = compact_graph(self.nodes)
+
+        self.graph.toggle(0, 1)
+        self.graph.toggle(2, 3)
+        other.toggle(3, 2)
+        other.toggle(1, 0)
+
+        self.assertEqual(self.graph.key(), other.key())
+
+        other.toggle(0, 2)
+        self.assertNotEqual(self.graph.key(), other.key())
+
+    def test_without_adjacency(self):
+        #without the n x n matrix the graph works from its neighbour sets alone
+        graph = compact_graph(self.nodes, dense = False)
+        self.assertIsNone(graph.adjacency)
+
+        for u, v in [(0, 1), (2, 3), (1, 2)]:
+            graph.toggle(u, v)
+            self.graph.toggle(v, u)
+        graph.toggle(1, 2)
+        self.graph.toggle(1, 2)
+
+        self.assertEqual(graph.key(), self.graph.key())
+        self.assertTrue(graph.has_edge(1, 0))
+        self.assertFalse(graph.has_edge(1, 2))
+        self.assertEqual(graph.edge_count, 2)
+
+    def test_to_networkx(self):
+        self.graph.toggle(0, 1)
+        self.graph.toggle(1, 2)
+        self.graph.toggle(1, 3)
+        key = self.graph.key()
+
+        for graph in [self.graph.to_networkx(), self.graph.to_networkx(key)]:
+            self.assertEqual(len(graph.edges()), 3)
+            self.assertEqual(graph[(3,4)][(6,8)]['weight'], 5)
+
+        self.assertEqual(shortest_distances(self.graph, 0), {0: 0, 1: 5, 2: 10, 3: 10})
+
+    def test_chain_state(self):
+        #the compact state and the exported graph describe the same chain state
+        nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        mcmc = mcmc_graph(nodes)
+        for i in range(200):
+            mcmc.predict_next()
+
+        graph = mcmc.current_graph
+        self.assertEqual(len(graph.edges()), mcmc.state.edge_count)
+        self.assertTrue(nx.is_connected(graph))
+        self.assertAlmostEqual(mcmc._theta.theta, mcmc.calculate_theta(graph, (0,0)))
+
+    def tearDown(self):
+        pass
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_distance
+----------------------------------
+
+Tests for `distance` module.
+"""
+
+
+import unittest
+import numpy as np
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.distance import distance_matrix
+
+
+
+class TestDistance_matrix(unittest.TestCase):
+
+    def setUp(self):
+        self.points = np.random.RandomState(0).uniform(-10, 10, size = (50, 3))
+        self.expected = np.sqrt(((self.points[:, None, :] - self.points[None, :, :]) ** 2).sum(axis = -1))
+        pass
+
+    def test_forms(self):
+        for form in ['dense', 'condensed', 'lazy', 'direct']:
+            distances = distance_matrix(self.points, form, block_size = 8, cache_bytes = 256)
+            self.assertEqual(distances.form, form)
+
+            for i, j in [(0, 0), (0, 49), (49, 0), (17, 3), (3, 17), (25, 26)]:
+                self.assertAlmostEqual(distances.get(i, j), self.expected[i, j], places = 4)
+
+    def test_lazy_is_bounded(self):
+        #the cache has 16 slots, and is the same size whatever the number of points
+        distances = distance_matrix(self.points, 'lazy', cache_bytes = 256)
+        for i in range(50):
+            for j in range(50):
+                self.assertAlmostEqual(distances.get(i, j), self.expected[i, j], places = 4)
+        self.assertEqual(distances._keys.nbytes + distances._values.nbytes, 256)
+        self.assertTrue(all(key < 50 * 50 for key in distances._keys.tolist()))
+
+        many = distance_matrix(np.zeros((100000, 2)), 'lazy', cache_bytes = 256)
+        self.assertEqual(many._keys.nbytes + many._values.nbytes, 256)
+
+    def test_bad_points(self):
+        with self.assertRaises(ValueError):
+            distance_matrix([(0,0), (1,1,1)])
+
+        with self.assertRaises(ValueError):
+            distance_matrix(self.points, 'sparse')
+
+    def test_shared_between_chains(self):
+        nodes = [(0,0), (3,4), (6,0), (6,8)]
+        distances = distance_matrix(nodes)
+        mcmc1 = mcmc_graph(nodes, 1, 1, distances)
+        mcmc2 = mcmc_graph(nodes, 0.5, 2, distances)
+
+        self.assertIs(mcmc1.state.distances, mcmc2.state.distances)
+        self.assertEqual(mcmc1._distance((0,0), (3,4)), 5)
+        self.assertEqual(mcmc1._distance((0,0), (0,1)), 1) #not a node, so it is calculated
+
+        with self.assertRaises(ValueError):
+            mcmc_graph(nodes[:3], 1, 1, distances)
+
+    def tearDown(self):
+        pass
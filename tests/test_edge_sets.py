@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_edge_sets
+----------------------------------
+
+Tests for `edge_sets` module.
+"""
+
+
+import unittest
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.edge_sets import indexed_set
+from mcmc_graph_simulator.rng import uniform_stream
+
+
+
+class TestIndexed_set(unittest.TestCase):
+
+    def test_add_discard(self):
+        s = indexed_set([1, 2, 3])
+        s.add(3)
+        s.add(4)
+        s.discard(1)
+        s.discard(10)
+
+        self.assertEqual(len(s), 3)
+        self.assertEqual(sorted(s), [2, 3, 4])
+        self.assertNotIn(1, s)
+        for item in s.items:
+            self.assertEqual(s.items[s.position[item]], item)
+
+    def test_sample(self):
+        s = indexed_set('abc')
+        rng = uniform_stream(0)
+        self.assertEqual(set(s.sample(rng) for i in range(100)), set('abc'))
+
+
+class TestEdge_sets(unittest.TestCase):
+
+    def test_chain(self):
+        #the sets stay consistent with the graph as it gets denser and sparser again
+        nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5)]
+        mcmc = mcmc_graph(nodes, T = 20, seed = 1)
+        edges = mcmc._edges
+
+        dense = False
+        for i in range(3000):
+            mcmc.predict_next()
+
+            present = set(edges.edge_id(u, v) for u, v in mcmc.state.edges())
+            self.assertEqual(set(edges.removable) | set(edges.bridges), present)
+            self.assertEqual(set(edges.bridges), set(edges.edge_id(u, v) for u, v in mcmc._bridges.bridges))
+            self.assertEqual(edges.key(), mcmc.state.key())
+
+            if edges.absent is not None:
+                dense = True
+                self.assertEqual(len(edges.absent) + len(present), edges.pairs)
+                self.assertFalse(set(edges.absent) & present)
+
+        self.assertTrue(dense)
+
+    def tearDown(self):
+        pass
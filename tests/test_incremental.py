@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_incremental
+----------------------------------
+
+Tests for `incremental` module.
+"""
+
+
+import unittest
+from random import Random
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.incremental import theta_engine
+
+
+
+class TestTheta_engine(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.mcmc = mcmc_graph(self.nodes)
+        self.graph = self.mcmc.current_graph
+        self.engine = theta_engine(self.graph, (0,0))
+        pass
+
+    def test_initial_theta(self):
+        self.assertAlmostEqual(self.engine.theta, self.mcmc.calculate_theta(self.graph, (0,0)))
+
+    def test_add_and_remove(self):
+        graph = self.graph.copy()
+        graph.add_edge((0,0), (1,5), weight = self.mcmc.get_distance((0,0), (1,5)))
+        theta = self.engine.propose(graph, (0,0), (1,5), graph[(0,0)][(1,5)]['weight'], True)
+        self.assertAlmostEqual(theta, self.mcmc.calculate_theta(graph, (0,0)))
+        self.engine.accept()
+
+        weight = graph[(1,2)][(3,3)]['weight']
+        graph.remove_edge((1,2), (3,3))
+        theta = self.engine.propose(graph, (1,2), (3,3), weight, False)
+        self.assertAlmostEqual(theta, self.mcmc.calculate_theta(graph, (0,0)))
+
+    def test_reject(self):
+        before = self.engine.theta
+        graph = self.graph.copy()
+        weight = graph[(0,0)][(1,2)]['weight']
+        graph.remove_edge((0,0), (1,2))
+
+        self.assertEqual(self.engine.propose(graph, (0,0), (1,2), weight, False), float('inf')) #graph is disconnected
+
+        self.engine.reject()
+        self.assertAlmostEqual(self.engine.theta, before)
+        self.assertIs(self.engine.graph, self.graph)
+
+    def test_extend(self):
+        #several edges change in one proposal, even through a disconnected graph
+        before = self.engine.theta
+        graph = self.graph.copy()
+        weight = graph[(0,0)][(1,2)]['weight']
+        graph.remove_edge((0,0), (1,2))
+        self.assertEqual(self.engine.propose(graph, (0,0), (1,2), weight, False), float('inf'))
+
+        graph = graph.copy()
+        graph.add_edge((0,0), (1,5), weight = self.mcmc.get_distance((0,0), (1,5)))
+        theta = self.engine.extend(graph, (0,0), (1,5), graph[(0,0)][(1,5)]['weight'], True)
+        self.assertAlmostEqual(theta, self.mcmc.calculate_theta(graph, (0,0)))
+
+        self.engine.reject()
+        self.assertAlmostEqual(self.engine.theta, before)
+        self.assertIs(self.engine.graph, self.graph)
+
+    def test_random_walk(self):
+        #compare against a full recomputation after every accepted or rejected change
+        rng = Random(3)
+        graph = self.graph
+
+        for i in range(200):
+            proposed = graph.copy()
+            add = rng.random() < 0.5 and len(proposed.edges()) < 36
+            if not add and len(self.mcmc.get_bridges(proposed)) == len(proposed.edges()):
+                add = True
+
+            u, v = self.mcmc._select_edge(proposed, add)
+            if add:
+                weight = self.mcmc.get_distance(u, v)
+                proposed.add_edge(u, v, weight = weight)
+            else:
+                weight = proposed[u][v]['weight']
+                proposed.remove_edge(u, v)
+
+            theta = self.engine.propose(proposed, u, v, weight, add)
+            self.assertAlmostEqual(theta, self.mcmc.calculate_theta(proposed, (0,0)))
+            self.assertAlmostEqual(self.engine.longest, self.mcmc.get_longest_shortest_path(proposed, (0,0)))
+
+            if rng.random() < 0.7:
+                self.engine.accept()
+                graph = proposed
+            else:
+                self.engine.reject()
+                self.assertAlmostEqual(self.engine.theta, self.mcmc.calculate_theta(graph, (0,0)))
+                self.assertAlmostEqual(self.engine.longest, self.mcmc.get_longest_shortest_path(graph, (0,0)))
+
+    def tearDown(self):
+        pass
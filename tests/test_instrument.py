@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_instrument
+----------------------------------
+
+Tests for `instrument` module.
+"""
+
+
+import unittest
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.instrument import step_profiler, PHASES
+
+
+
+class TestStep_profiler(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.mcmc = mcmc_graph(self.nodes, seed = 8)
+        pass
+
+    def test_same_moves(self):
+        #profiling measures the chain without changing what it does
+        profiled = mcmc_graph(self.nodes, seed = 8)
+        profiled.enable_profiling()
+        self.assertEqual(profiled.run(500)[:3], self.mcmc.run(500)[:3])
+        self.assertEqual(profiled.markov_chain, self.mcmc.markov_chain)
+
+    def test_counters(self):
+        profiler = self.mcmc.enable_profiling()
+        self.mcmc.run(400)
+
+        summary = profiler.summary()
+        self.assertEqual(summary['steps'], 400)
+        self.assertEqual(sum(summary['proposed'].values()), 400)
+        self.assertEqual(set(summary['phases']), set(PHASES))
+        self.assertTrue(all(profiler.times[phase] > 0 for phase in PHASES))
+        self.assertTrue(0 <= profiler.acceptance_rate('add') <= 1)
+        self.assertIn('steps/s', profiler.report())
+
+    def test_accepted_count(self):
+        profiler = self.mcmc.enable_profiling()
+        self.mcmc.run(400)
+
+        chain = self.mcmc.markov_chain
+        changes = sum(1 for a, b in zip(chain, chain[1:]) if a != b)
+        self.assertEqual(sum(profiler.accepted.values()), changes)
+
+    def test_hooks(self):
+        calls = []
+        profiler = self.mcmc.enable_profiling()
+        profiler.add_hook(lambda mcmc, p: calls.append(p.steps), every = 100)
+        self.mcmc.run(350)
+        self.assertEqual(calls, [100, 200, 300])
+
+        profiler.reset()
+        self.assertEqual(profiler.steps, 0)
+        self.assertEqual(len(profiler.hooks), 1)
+
+    def test_given_profiler(self):
+        #a profiler handed in is the one the chain reports to
+        profiler = step_profiler()
+        self.assertIs(self.mcmc.enable_profiling(profiler), profiler)
+        self.mcmc.run(50)
+        self.assertEqual(profiler.steps, 50)
+
+    def test_disable(self):
+        profiler = self.mcmc.enable_profiling()
+        self.assertIsInstance(profiler, step_profiler)
+        self.mcmc.run(10)
+        self.mcmc.disable_profiling()
+        self.mcmc.run(10)
+        self.assertEqual(profiler.steps, 10)
+        self.assertIsNone(self.mcmc._profiling)
+
+    def tearDown(self):
+        pass
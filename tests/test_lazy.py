@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_lazy
+----------------------------------
+
+Tests for `lazy` module.
+"""
+
+
+import sys
+import unittest
+import subprocess
+
+from mcmc_graph_simulator.lazy import lazy_module
+
+
+
+class TestLazy_module(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def test_attributes(self):
+        json = lazy_module('json')
+        self.assertIn('not imported yet', repr(json))
+        self.assertEqual(json.loads('[1, 2]'), [1, 2])
+        self.assertNotIn('not imported yet', repr(json))
+
+    def test_missing_module(self):
+        missing = lazy_module('mcmc_graph_simulator_missing_module')
+        with self.assertRaises(ImportError):
+            missing.anything
+
+    def test_heavy_modules_not_imported(self):
+        #a fresh interpreter, since networkx is already imported by the other tests
+        code = 'import sys, mcmc_graph_simulator.mcmc_graph_simulator; print(sorted(m for m in ["networkx", "multiprocessing"] if m in sys.modules))'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.decode().strip(), '[]')
+
+    def test_networkx_loaded_when_used(self):
+        code = 'import sys, mcmc_graph_simulator.mcmc_graph_simulator as m; m.mcmc_graph([(0,0), (1,1), (2,0)], seed = 1).run(10); print("networkx" in sys.modules)'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.decode().strip(), 'True')
+
+    def tearDown(self):
+        pass
@@ -16,6 +16,9 @@ from click.testing import CliRunner
 import networkx as nx
 
 from mcmc_graph_simulator.mcmc_graph_simulator import *
+from mcmc_graph_simulator.observables import convergence
+
+from .helpers import stationary_distance
 
 
 
@@ -195,6 +198,15 @@ class TestMcmc_graph_simulator(unittest.TestCase):
         q = self.mcmc.quantile([0,0,0,0,2,3,4,100,100], 50)
         self.assertEqual(set(q), set([0,100])) #Convert to set to avoid errors with ordering of elements
 
+    def test_seed(self):
+        mcmc1 = mcmc_graph(self.nodes, seed = 5)
+        mcmc2 = mcmc_graph(self.nodes, seed = 5)
+        for i in range(200):
+            mcmc1.predict_next()
+            mcmc2.predict_next()
+
+        self.assertEqual(mcmc1.markov_chain, mcmc2.markov_chain)
+
     def test_run(self):
         #test possible to run with 10000 iterations
         stats = self.mcmc.run(10000)
@@ -203,17 +215,114 @@ class TestMcmc_graph_simulator(unittest.TestCase):
     def tearDown(self):
         pass
 
+class TestBlock_moves(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        pass
+
+    def check_state(self, mcmc):
+        #the incremental indexes agree with a rebuild from scratch
+        theta = mcmc.theta
+        bridges = set(mcmc._bridges.bridges)
+        key = mcmc._key
+        mcmc._rebuild()
+        self.assertAlmostEqual(theta, mcmc.theta)
+        self.assertEqual(bridges, mcmc._bridges.bridges)
+        self.assertEqual(key, mcmc.state.key())
+
+    def test_block_moves(self):
+        mcmc = mcmc_graph(self.nodes, T = 20, seed = 2, block_moves = 0.5, block_size = 3)
+        profiler = mcmc.enable_profiling()
+        mcmc.run(2000)
+
+        self.assertGreater(profiler.accepted['block'], 0)
+        self.assertGreater(profiler.accepted['rewire'], 0)
+        self.assertEqual(sum(profiler.proposed.values()), 2000)
+        self.check_state(mcmc)
+
+    def test_stationary_distribution(self):
+        #block moves mixed with the default single edge steps sample the same e**(theta / T)
+        nodes = [(0,0), (1,2), (3,1), (-2,1)]
+        for rewire in [0.5, 0]:
+            mcmc = mcmc_graph(nodes, 0.5, 3.0, keep_chain = False, seed = 5, block_moves = 0.5, rewire = rewire)
+            self.assertLess(stationary_distance(mcmc, nodes, 60000), 0.06)
+
+    def test_seed(self):
+        mcmc1 = mcmc_graph(self.nodes, seed = 4, block_moves = 0.3)
+        mcmc2 = mcmc_graph(self.nodes, seed = 4, block_moves = 0.3)
+        mcmc2.enable_profiling()
+        self.assertEqual(mcmc1.run(500)[:3], mcmc2.run(500)[:3])
+        self.assertEqual(mcmc1.markov_chain, mcmc2.markov_chain)
+
+    def test_adapt_block_size(self):
+        #block_size only changes during the burn in
+        mcmc = mcmc_graph(self.nodes, T = 2, seed = 1, burn_in = 3000, block_moves = 1, rewire = 0, block_size = 10, target_acceptance = 0.3)
+        mcmc.run(3000)
+        self.assertLess(mcmc.block_size, 10)
+
+        size = mcmc.block_size
+        mcmc.run(2000)
+        self.assertEqual(mcmc.block_size, size)
+
+    def test_no_trace(self):
+        mcmc = mcmc_graph(self.nodes, block_moves = 0.5)
+        with self.assertRaises(ValueError):
+            mcmc.start_trace('chain.trace')
+
+    def tearDown(self):
+        pass
+
 class TestParallel_mcmc(unittest.TestCase):
     def setUp(self):
-        nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
-        self.mcmc = parallel_mcmc(nodes)
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.mcmc = parallel_mcmc(self.nodes)
         pass
 
     def test_parallel_run(self):
         ans1 = self.mcmc._run(1000)
         ans2 = self.mcmc.run(1000)
         self.assertEqual(len(ans1), 4)
-        self.assertEqual(len(ans2), 3)
+        self.assertEqual(len(ans2), 4)
+
+    def test_parallel_progress(self):
+        mcmc = parallel_mcmc(self.nodes, seed = 1, chains = 3, processes = 2)
+        reports = []
+        stats = mcmc.run(250, chunk_size = 100, progress = lambda *report: reports.append(report))
+
+        self.assertEqual(len(stats), 4)
+        self.assertEqual(len(reports), 9) #three chunks from each of the three chains
+        self.assertEqual(sorted(r[1] for r in reports if r[0] == 0), [100, 200, 250])
+
+    def test_parallel_stop(self):
+        mcmc = parallel_mcmc(self.nodes, seed = 1, chains = 2, processes = 2)
+        stats = mcmc.run(200000, stop = convergence(rhat = 1.05, rel_mcse = 0.05, check_every = 500))
+
+        self.assertEqual(len(stats), 4)
+        self.assertEqual(len(mcmc.iterations_run), 2)
+        self.assertTrue(max(mcmc.iterations_run) < 200000)
+
+    def test_parallel_stop_needs_processes(self):
+        #chains that wait for a process would be compared at different iterations
+        mcmc = parallel_mcmc(self.nodes, seed = 1, chains = 3, processes = 2)
+        with self.assertRaises(ValueError):
+            mcmc.run(2000, stop = convergence(rhat = 1.1, check_every = 200))
+
+    def test_parallel_matches_serial(self):
+        #a chain gives the same result in a worker process as on its own
+        seed = chain_seeds(11, 1)[0]
+        serial = mcmc_graph(self.nodes, seed = seed, keep_chain = False)
+        serial.run(300)
+
+        parallel = parallel_mcmc(self.nodes, seed = 11, chains = 1, processes = 1)
+        stats = parallel.run(300)
+        expected = [serial.state.to_networkx(key) for key in top_states(serial.visits.counts, serial.visits.recorded)]
+
+        self.assertEqual([graph_key(g) for g in stats[3]], [graph_key(g) for g in expected])
+
+    def test_chain_seeds(self):
+        self.assertEqual(chain_seeds(3, 4), chain_seeds(3, 4))
+        self.assertEqual(len(set(chain_seeds(3, 4))), 4)
+        self.assertNotEqual(chain_seeds(3, 4), chain_seeds(4, 4))
 
     def tearDown(self):
         pass
\ No newline at end of file
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_observables
+----------------------------------
+
+Tests for `observables` module.
+"""
+
+
+import unittest
+import numpy as np
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.observables import running_stat, observables, gelman_rubin, convergence
+
+
+
+class TestRunning_stat(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.RandomState(1).normal(3, 2, size = 20000)
+        self.stat = running_stat(batches = 16)
+        for value in self.values:
+            self.stat.push(value)
+        pass
+
+    def test_mean_and_variance(self):
+        self.assertEqual(self.stat.count, 20000)
+        self.assertAlmostEqual(self.stat.mean, self.values.mean())
+        self.assertAlmostEqual(self.stat.variance, self.values.var(ddof = 1))
+
+    def test_batches_are_bounded(self):
+        self.assertTrue(16 <= len(self.stat.batch_means) < 32)
+        self.assertEqual(len(self.stat.batch_means) * self.stat.batch_size + self.stat._batch_count, 20000)
+
+    def test_independent_values(self):
+        #for independent values the standard error is close to sigma / sqrt(n)
+        self.assertTrue(0.5 < self.stat.mcse / (2 / np.sqrt(20000)) < 1.5)
+        self.assertTrue(5000 < self.stat.ess <= 20000)
+
+    def test_correlated_values(self):
+        stat = running_stat()
+        for value in np.repeat(self.values[:200], 100):
+            stat.push(value)
+
+        self.assertTrue(stat.ess < 2000)
+
+    def test_too_few_values(self):
+        stat = running_stat()
+        stat.push(1)
+        self.assertTrue(np.isnan(stat.variance))
+        self.assertTrue(np.isnan(stat.mcse))
+        self.assertTrue(np.isnan(stat.ess))
+
+    def tearDown(self):
+        pass
+
+
+class TestObservables(unittest.TestCase):
+
+    def test_chain_statistics(self):
+        nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        mcmc = mcmc_graph(nodes, seed = 3, burn_in = 100)
+        mcmc.add_observable('theta', lambda chain: chain.theta)
+        edges = []
+        mcmc.add_observable('edges', lambda chain: edges.append(chain.state.edge_count) or 0)
+
+        mcmc.run(1000)
+        summary = mcmc.summary()
+
+        self.assertEqual(list(summary), ['node0_connections', 'total_edges', 'longest_shortest_path', 'theta', 'edges'])
+        self.assertEqual(summary['total_edges']['count'], 1000 - 100 + 1)
+        self.assertAlmostEqual(summary['total_edges']['mean'], np.mean(edges))
+        self.assertEqual(mcmc.avg_total_edges, summary['total_edges']['mean'])
+        self.assertTrue(summary['theta']['mean'] > 0)
+
+    def test_registry(self):
+        registry = observables()
+        registry.add('one', lambda chain: 1)
+        registry.update(None)
+        registry.update(None)
+
+        self.assertIn('one', registry)
+        self.assertEqual(registry['one'].count, 2)
+        self.assertEqual(registry.summary()['one']['mean'], 1)
+
+    def tearDown(self):
+        pass
+
+
+class TestConvergence(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        pass
+
+    def test_gelman_rubin(self):
+        same = dict(mean = 1.0, variance = 2.0, count = 1000)
+        self.assertAlmostEqual(gelman_rubin([same, same]), np.sqrt(999 / 1000.0))
+        self.assertTrue(gelman_rubin([same, dict(same, mean = 5.0)]) > 1.5)
+        self.assertTrue(np.isnan(gelman_rubin([same])))
+
+    def test_needs_a_target(self):
+        self.assertRaises(ValueError, convergence)
+
+    def test_stops_early(self):
+        mcmc = mcmc_graph(self.nodes, seed = 3)
+        stop = convergence(rel_mcse = 0.05, check_every = 500)
+        mcmc.run(100000, stop = stop)
+
+        self.assertTrue(mcmc.iterations_run < 100000)
+        self.assertEqual(mcmc.iterations_run % 500, 0)
+        self.assertTrue(stop.satisfied([mcmc.summary()]))
+
+    def test_runs_to_the_end(self):
+        mcmc = mcmc_graph(self.nodes, seed = 3)
+        mcmc.run(1200, stop = convergence(min_ess = 10**6, check_every = 500))
+        self.assertEqual(mcmc.iterations_run, 1200)
+
+    def test_rhat_needs_chains(self):
+        mcmc = mcmc_graph(self.nodes, seed = 3)
+        self.assertRaises(ValueError, mcmc.run, 1000, convergence(rhat = 1.1))
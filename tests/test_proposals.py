@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_proposals
+----------------------------------
+
+Tests for `proposals` module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from mcmc_graph_simulator import proposals
+from mcmc_graph_simulator.proposals import nearest_neighbors, local_proposals
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.distance import distance_matrix
+from mcmc_graph_simulator.compact import compact_graph
+from mcmc_graph_simulator.bridges import bridge_index
+from mcmc_graph_simulator.edge_sets import edge_sets
+from mcmc_graph_simulator.rng import uniform_stream
+
+from .helpers import stationary_distance
+
+
+
+class TestNearest_neighbors(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.coordinates = rng.normal(size = (300, 3))
+        self.kd_tree = proposals._kd_tree
+        pass
+
+    def brute_force(self, k):
+        d = np.sqrt(((self.coordinates[:, None] - self.coordinates[None]) ** 2).sum(-1))
+        np.fill_diagonal(d, np.inf)
+        return np.argsort(d, axis = 1)[:, :k]
+
+    def test_kd_tree(self):
+        distances = distance_matrix(self.coordinates)
+        np.testing.assert_array_equal(nearest_neighbors(distances, 5), self.brute_force(5))
+
+    def test_without_scipy(self):
+        proposals._kd_tree = lambda: None
+        for form in ['dense', 'condensed', 'lazy']:
+            distances = distance_matrix(self.coordinates, form, block_size = 64)
+            np.testing.assert_array_equal(nearest_neighbors(distances, 5), self.brute_force(5))
+
+    def test_more_neighbors_than_nodes(self):
+        distances = distance_matrix([(0,0), (1,0), (3,0)])
+        np.testing.assert_array_equal(nearest_neighbors(distances, 10), [[1, 2], [0, 2], [1, 0]])
+
+    def tearDown(self):
+        proposals._kd_tree = self.kd_tree
+        pass
+
+
+
+class TestLocal_proposals(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.directory = tempfile.mkdtemp()
+        pass
+
+    def test_candidates(self):
+        graph = compact_graph([(0,0), (1,0), (5,0), (6,0)])
+        graph.toggle(0, 1)
+        local = local_proposals(graph, neighbors = 1)
+        self.assertEqual(local.candidates, set([0 * 4 + 1, 2 * 4 + 3]))
+        self.assertEqual(list(local.absent), [2 * 4 + 3])
+
+        with self.assertRaises(ValueError):
+            local_proposals(graph, neighbors = 1, locality = 1.5)
+
+    def test_absent_kept_up_to_date(self):
+        mcmc = mcmc_graph(self.nodes, seed = 2, neighbors = 3)
+        mcmc.run(500)
+
+        absent = set(mcmc._local.absent)
+        mcmc._local.rebuild()
+        self.assertEqual(absent, set(mcmc._local.absent))
+
+    def test_nearby_edges(self):
+        points = np.random.default_rng(1).normal(size = (60, 2))
+        graph = compact_graph(points)
+        for i in range(59):
+            graph.toggle(i, i + 1)
+
+        rng = uniform_stream(1)
+        edges = edge_sets(graph, bridge_index(graph))
+        local = local_proposals(graph, neighbors = 4, locality = 0.9)
+        uniform = local_proposals(graph, neighbors = 4, locality = 0)
+
+        #most pairs drawn are nearest neighbors with a high locality, few without
+        for proposal, low, high in [(local, 0.85, 1), (uniform, 0, 0.2)]:
+            pairs = [proposal.sample_absent(rng, edges) for i in range(2000)]
+            fraction = np.mean([min(u, v) * 60 + max(u, v) in proposal.candidates for u, v in pairs])
+            self.assertTrue(low <= fraction <= high, fraction)
+
+    def test_stationary_distribution(self):
+        #the chain samples every connected graph in proportion to e**(theta / T)
+        nodes = [(0,0), (1,2), (3,1), (-2,1)]
+        mcmc = mcmc_graph(nodes, 0.5, 3.0, keep_chain = False, seed = 5, neighbors = 1, locality = 0.8)
+        self.assertLess(stationary_distance(mcmc, nodes, 40000), 0.06)
+
+    def test_same_target_as_uniform(self):
+        #with locality 0 the proposals are the uniform ones, and both kernels sample the same distribution
+        nodes = [(0,0), (1,2), (3,1), (-2,1)]
+        uniform = mcmc_graph(nodes, 0.5, 3.0, keep_chain = False, seed = 5)
+        local = mcmc_graph(nodes, 0.5, 3.0, keep_chain = False, seed = 5, neighbors = 3, locality = 0.0)
+
+        self.assertLess(stationary_distance(uniform, nodes, 60000), 0.06)
+        self.assertLess(stationary_distance(local, nodes, 60000), 0.06)
+
+        counts = [chain.visits.counts for chain in [uniform, local]]
+        keys = set(counts[0]) | set(counts[1])
+        visits = float(sum(counts[0].values()))
+        self.assertLess(0.5 * sum(abs(counts[0].get(key, 0) - counts[1].get(key, 0)) for key in keys) / visits, 0.06)
+
+    def test_checkpoint(self):
+        path = os.path.join(self.directory, 'chain.npz')
+        mcmc = mcmc_graph(self.nodes, seed = 4, neighbors = 2, locality = 0.7)
+        mcmc.run(300)
+        mcmc.save_checkpoint(path)
+
+        loaded = mcmc_graph.load_checkpoint(path)
+        self.assertEqual(loaded._local.locality, 0.7)
+        self.assertEqual(loaded.run(300)[:3], mcmc.run(300)[:3])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_rng
+----------------------------------
+
+Tests for `rng` module.
+"""
+
+
+import unittest
+import numpy as np
+
+from mcmc_graph_simulator.rng import uniform_stream
+
+
+
+class TestUniform_stream(unittest.TestCase):
+
+    def test_matches_generator(self):
+        stream = uniform_stream(4, block_size = 10)
+        values = [stream.random() for i in range(25)]
+
+        #drawing in blocks gives the same numbers as drawing them all at once
+        self.assertEqual(values, np.random.default_rng(4).random(30)[:25].tolist())
+
+    def test_generator(self):
+        generator = np.random.default_rng(2)
+        stream = uniform_stream(generator)
+        self.assertIs(stream.generator, generator)
+
+    def test_integers(self):
+        stream = uniform_stream(0)
+        values = [stream.integer(3) for i in range(300)]
+        self.assertEqual(set(values), set([0, 1, 2]))
+        self.assertIn(stream.choice('abc'), 'abc')
+
+    def tearDown(self):
+        pass
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_sparse
+----------------------------------
+
+Tests for `sparse` module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from random import Random
+import networkx as nx
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.compact import compact_graph
+from mcmc_graph_simulator.incremental import theta_engine
+from mcmc_graph_simulator.sparse import sparse_theta_engine, networkx_distances, _csgraph
+
+
+
+@unittest.skipIf(_csgraph()[1] is None, "scipy is not installed")
+class TestSparse_theta_engine(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.graph = compact_graph(self.nodes)
+        for v in range(1, len(self.nodes)):
+            self.graph.toggle(0, v)
+        pass
+
+    def test_matches_theta_engine(self):
+        #every proposal, accepted or rejected, gives the same values as the compact engine
+        weight = lambda graph, u, v: graph.weight(u, v)
+        sparse = sparse_theta_engine(self.graph, 0, 0.5, weight)
+        compact = theta_engine(self.graph, 0, 0.5, weight)
+        rng = Random(5)
+
+        for i in range(300):
+            u, v = rng.sample(range(len(self.nodes)), 2)
+            add = self.graph.toggle(u, v)
+            w = self.graph.weight(u, v)
+
+            self.assertAlmostEqual(sparse.propose(self.graph, u, v, w, add), compact.propose(self.graph, u, v, w, add))
+            self.assertEqual(sparse.unreachable, compact.unreachable)
+
+            if sparse.theta != float('inf') and rng.random() < 0.6:
+                self.assertAlmostEqual(sparse.longest, compact.longest)
+                sparse.accept()
+                compact.accept()
+            else:
+                self.graph.toggle(u, v)
+                sparse.reject()
+                compact.reject()
+
+            self.assertAlmostEqual(sparse.theta, compact.theta)
+
+        self.assertEqual(sparse.matrix().nnz, self.graph.edge_count)
+
+    def test_extend(self):
+        engine = sparse_theta_engine(self.graph, 0)
+        before = engine.theta
+
+        self.graph.toggle(0, 1)
+        self.assertEqual(engine.propose(self.graph, 0, 1, self.graph.weight(0, 1), False), float('inf'))
+        self.graph.toggle(1, 2)
+        theta = engine.extend(self.graph, 1, 2, self.graph.weight(1, 2), True)
+        self.assertAlmostEqual(theta, sparse_theta_engine(self.graph, 0).theta)
+
+        engine.reject()
+        self.graph.toggle(1, 2)
+        self.graph.toggle(0, 1)
+        self.assertAlmostEqual(engine.theta, before)
+        self.assertEqual(engine.matrix().nnz, len(self.nodes) - 1)
+
+    def test_networkx_distances(self):
+        graph = nx.Graph()
+        graph.add_edge('a', 'b', weight = 2.0)
+        graph.add_edge('b', 'c', weight = 1.5)
+        graph.add_edge('a', 'c', weight = 5.0)
+
+        self.assertEqual(networkx_distances(graph, 'a'), nx.single_source_dijkstra_path_length(graph, 'a'))
+
+        graph.add_node('d')
+        with self.assertRaises(ValueError):
+            networkx_distances(graph, 'a')
+
+    def tearDown(self):
+        pass
+
+
+
+@unittest.skipIf(_csgraph()[1] is None, "scipy is not installed")
+class TestSparse_backend(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.directory = tempfile.mkdtemp()
+        pass
+
+    def test_same_chain(self):
+        #the backend only changes how theta is computed, not the moves of the chain
+        compact = mcmc_graph(self.nodes, 0.5, 2, seed = 7)
+        sparse = mcmc_graph(self.nodes, 0.5, 2, seed = 7, backend = 'sparse')
+        self.assertIsNone(sparse.state.adjacency)
+        self.assertEqual(sparse.state.distances.form, 'direct')
+
+        expected = compact.run(500)
+        stats = sparse.run(500)
+
+        self.assertEqual(stats[:2], expected[:2])
+        self.assertAlmostEqual(stats[2], expected[2])
+        self.assertEqual(sparse.markov_chain, compact.markov_chain)
+        self.assertAlmostEqual(sparse.theta, compact.theta)
+        self.assertAlmostEqual(sparse.calculate_theta(sparse.current_graph, (0,0), 0.5), compact.theta)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            mcmc_graph(self.nodes, backend = 'dense')
+
+    def test_resume(self):
+        path = os.path.join(self.directory, 'chain.npz')
+        mcmc = mcmc_graph(self.nodes, seed = 4, backend = 'sparse')
+        mcmc.run(300)
+        mcmc.save_checkpoint(path)
+        expected = mcmc.run(300)
+
+        loaded = mcmc_graph.load_checkpoint(path)
+        self.assertEqual(loaded.backend, 'sparse')
+        self.assertEqual(loaded.run(300)[:2], expected[:2])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass
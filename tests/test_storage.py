@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_storage
+----------------------------------
+
+Tests for `storage` module.
+"""
+
+
+import unittest
+import networkx as nx
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.storage import chain_store, graph_key, rank_states, top_states
+
+
+
+class TestChain_store(unittest.TestCase):
+
+    def test_burn_in_and_thin(self):
+        store = chain_store(burn_in = 3, thin = 2)
+        kept = [store.record(key) for key in 'abcdefghi']
+
+        self.assertEqual(kept, [False, False, False, True, False, True, False, True, False])
+        self.assertEqual(store.chain, ['d', 'f', 'h'])
+        self.assertEqual(store.steps, 9)
+        self.assertEqual(store.recorded, 3)
+
+        with self.assertRaises(ValueError):
+            chain_store(thin = 0)
+
+    def test_counts_without_chain(self):
+        store = chain_store(keep_chain = False)
+        for key in 'abacaba':
+            store.record(key)
+
+        self.assertIsNone(store.chain)
+        self.assertEqual(store.counts, {'a': 4, 'b': 2, 'c': 1})
+
+    def test_bounded_counts(self):
+        store = chain_store(keep_chain = False, max_states = 2)
+        for key in 'aaaabbbcde':
+            store.record(key)
+
+        #at 'd' every count is lowered by the third largest, 1, and c and d are dropped
+        self.assertEqual(store.counts, {'a': 3, 'b': 2, 'e': 1})
+        self.assertEqual(store.dropped, 4)
+        self.assertEqual(store.recorded, 10)
+
+    def test_late_frequent_state(self):
+        #a state that only becomes frequent after the counter is full is still kept
+        store = chain_store(keep_chain = False, max_states = 3)
+        keys = ['a'] * 50 + ['b'] * 40 + ['c'] * 30 + [str(i) for i in range(100)]
+        keys += [key for i in range(200) for key in ['z', 'x%d' % i]]
+        for key in keys:
+            store.record(key)
+
+        #z was recorded 200 times out of 620, more than 620 / 4, and is undercounted by at most that
+        self.assertIn('z', store.counts)
+        self.assertTrue(200 - len(keys) / 4.0 <= store.counts['z'] <= 200)
+        self.assertTrue(len(store.counts) < 6)
+        self.assertEqual(sum(store.counts.values()) + store.dropped, len(keys))
+
+    def test_streaming_chain(self):
+        nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        mcmc = mcmc_graph(nodes, keep_chain = False, burn_in = 10, max_states = 50)
+        stats = mcmc.run(500)
+
+        self.assertIsNone(mcmc.markov_chain)
+        self.assertEqual(mcmc.visits.recorded, 491)
+        self.assertTrue(len(mcmc.visits.counts) < 100)
+        self.assertEqual(len(stats), 4)
+
+    def test_graph_key(self):
+        graph1 = nx.Graph()
+        graph1.add_edge((0,0), (1,1))
+        graph1.add_edge((2,2), (1,1))
+        graph2 = nx.Graph()
+        graph2.add_edge((1,1), (2,2))
+        graph2.add_edge((1,1), (0,0))
+
+        self.assertEqual(graph_key(graph1), graph_key(graph2))
+        self.assertEqual(hash(graph_key(graph1)), hash(graph_key(graph2)))
+
+        graph2.add_edge((0,0), (2,2))
+        self.assertNotEqual(graph_key(graph1), graph_key(graph2))
+
+    def test_ranking(self):
+        counts = {'a': 1, 'b': 5, 'c': 1, 'd': 3}
+        self.assertEqual(rank_states(counts), [('b', 5), ('d', 3), ('a', 1), ('c', 1)])
+        self.assertEqual(top_states(counts, 10, 99), ['b'])
+        self.assertEqual(top_states(counts, 10, 30), ['b', 'd'])
+        self.assertEqual(top_states(counts, 10, 0), ['b', 'd', 'a', 'c'])
+
+    def test_quantile_counts_equal_graphs(self):
+        nodes = [(0,0), (1,1), (2,2)]
+        mcmc = mcmc_graph(nodes)
+
+        graphs = []
+        for i in range(3):
+            graphs.append(nx.Graph())
+            graphs[-1].add_path(nodes)
+        graphs.append(nx.Graph())
+        graphs[-1].add_cycle(nodes)
+
+        top = mcmc.quantile(graphs, 50)
+        self.assertEqual(len(top), 1)
+        self.assertIs(top[0], graphs[0])
+
+    def tearDown(self):
+        pass
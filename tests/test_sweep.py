@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_sweep
+----------------------------------
+
+Tests for `sweep` module.
+"""
+
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.sweep import parameter_sweep, parameter_grid
+
+
+
+class TestParameter_sweep(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.directory = tempfile.mkdtemp()
+        self.results = os.path.join(self.directory, 'sweep.jsonl')
+        pass
+
+    def test_grid(self):
+        jobs = parameter_grid([1, 2], [1, 10, 100], repeats = 2, seed = 0)
+        self.assertEqual(len(jobs), 12)
+        self.assertEqual([job['index'] for job in jobs], list(range(12)))
+        self.assertEqual(len(set(job['seed'] for job in jobs)), 12)
+        self.assertEqual((jobs[2]['r'], jobs[2]['T']), (1, 10))
+
+    def test_run(self):
+        sweep = parameter_sweep(self.nodes, [1, 2], [1, 10], seed = 4, processes = 2)
+        reports = []
+        results = sweep.run(300, self.results, progress = lambda result, finished, total: reports.append((finished, total)))
+
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertEqual(sorted(reports), [(1, 4), (2, 4), (3, 4), (4, 4)])
+
+        #every job is the same chain as a mcmc_graph run on its own
+        job = sweep.jobs[3]
+        stats = mcmc_graph(self.nodes, job['r'], job['T'], keep_chain = False, seed = job['seed']).run(300)
+        self.assertEqual(results[3]['total_edges'], stats[1])
+        self.assertEqual(len(results[3]['top_states']), len(stats[3]))
+
+        with open(self.results) as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+    def test_resume(self):
+        sweep = parameter_sweep(self.nodes, [1], [1, 10, 100], seed = 4, processes = 2)
+        first = sweep.run(200, self.results)
+
+        #drop the last result and cut the line before it short, as an interrupted run would
+        with open(self.results) as f:
+            lines = f.readlines()
+        with open(self.results, 'w') as f:
+            f.writelines(lines[:1] + [lines[1][:20]])
+
+        results = sweep.run(200, self.results)
+        self.assertEqual([r['total_edges'] for r in results], [r['total_edges'] for r in first])
+
+        #results are written as jobs finish, so the kept one can be any of them
+        kept = json.loads(lines[0])['index']
+        with open(self.results) as f:
+            self.assertEqual(sorted(json.loads(line)['index'] for line in f.readlines()[2:]), sorted(set([0, 1, 2]) - set([kept])))
+
+    def test_resume_other_sweep(self):
+        #a results file of another grid, seed or length is refused rather than reused
+        parameter_sweep(self.nodes, [1], [1, 10], seed = 4, processes = 2).run(100, self.results)
+
+        for sweep, iterations in [(parameter_sweep(self.nodes, [2], [1, 10], seed = 4, processes = 2), 100),
+                (parameter_sweep(self.nodes, [1], [1, 10], seed = 5, processes = 2), 100),
+                (parameter_sweep(self.nodes, [1], [1, 10], seed = 4, processes = 2), 200)]:
+            with self.assertRaises(ValueError):
+                sweep.run(iterations, self.results)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass
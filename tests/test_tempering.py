@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_tempering
+----------------------------------
+
+Tests for `tempering` module.
+"""
+
+
+import unittest
+
+from mcmc_graph_simulator.tempering import parallel_tempering, geometric_ladder
+
+from .helpers import stationary_target, total_variation
+
+
+
+class TestParallel_tempering(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        pass
+
+    def test_geometric_ladder(self):
+        ladder = geometric_ladder(1, 8, 4)
+        self.assertEqual(len(ladder), 4)
+        self.assertAlmostEqual(ladder[0], 1)
+        self.assertAlmostEqual(ladder[1], 2)
+        self.assertAlmostEqual(ladder[3], 8)
+
+    def test_ladder_order(self):
+        self.assertRaises(ValueError, parallel_tempering, self.nodes, [2, 1])
+
+    def test_run(self):
+        tempering = parallel_tempering(self.nodes, geometric_ladder(1, 16, 4), seed = 2, processes = 2)
+        stats = tempering.run(2000, swap_every = 20, burn_in = 500)
+        summary = tempering.summary()
+
+        self.assertEqual(len(stats), 4)
+        self.assertEqual(len(summary), 4)
+        self.assertAlmostEqual(summary[0]['T'], 1)
+        self.assertAlmostEqual(summary[-1]['T'], 16)
+        self.assertEqual(stats[1], summary[0]['stats']['total_edges']['mean'])
+
+        #every temperature is measured once for every iteration after the burn in
+        counts = [replica['stats']['total_edges']['count'] for replica in summary]
+        self.assertEqual(sum(counts), 4 * 1500)
+        self.assertTrue(all(0 <= replica['swap_acceptance'] <= 1 for replica in summary[:-1]))
+        self.assertTrue(tempering.attempted.sum() > 0)
+
+    def test_burn_in_too_long(self):
+        #a burn in that does not end at a swap before the end would leave nothing to measure
+        tempering = parallel_tempering(self.nodes, geometric_ladder(1, 16, 4), seed = 2, processes = 2)
+        for burn_in in [2000, 3000, 1990]:
+            self.assertRaises(ValueError, tempering.run, 2000, 20, burn_in)
+
+    def test_stationary_distribution(self):
+        #every replica samples e**(theta / T), so the swaps leave the coldest one sampling it too
+        nodes = [(0,0), (1,2), (3,1), (-2,1)]
+        tempering = parallel_tempering(nodes, [3, 6], r = 0.5, seed = 3, processes = 2, adapt = False)
+        tempering.run(40000, swap_every = 10)
+
+        self.assertLess(total_variation(tempering.replicas[0]['counts'], stationary_target(nodes, 0.5, 3)), 0.06)
+
+    def test_fixed_ladder(self):
+        ladder = [1, 2, 3]
+        tempering = parallel_tempering(self.nodes, ladder, seed = 2, processes = 1, adapt = False)
+        tempering.run(300, swap_every = 10)
+        self.assertEqual(tempering.temperatures, ladder)
+
+    def tearDown(self):
+        pass
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_trace
+----------------------------------
+
+Tests for `trace` module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import tracemalloc
+import numpy as np
+
+from mcmc_graph_simulator.mcmc_graph_simulator import mcmc_graph
+from mcmc_graph_simulator.storage import graph_key
+from mcmc_graph_simulator.trace import trace_writer, trace_reader
+
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [(0,0), (1,2), (3,3), (3,-5), (0,2), (1,-1), (-2,-2), (1,5), (6,2)]
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'chain.trace')
+        pass
+
+    def test_replay(self):
+        #small buffers and capacity make the file grow several times
+        mcmc = mcmc_graph(self.nodes, seed = 2, burn_in = 100)
+        mcmc.start_trace(self.path, capacity = 16, buffer_size = 50)
+        mcmc.run(1000)
+        mcmc.stop_trace()
+
+        reader = trace_reader(self.path)
+        self.assertEqual(len(reader), 1001)
+        self.assertEqual(os.path.getsize(self.path), 1001 * reader.dtype.itemsize)
+        #the kept chain starts after the burn in
+        self.assertEqual(list(reader.states(100)), mcmc.markov_chain)
+        self.assertEqual(list(reader.states(500, 900, 7)), mcmc.markov_chain[400:800:7])
+        self.assertEqual(reader.state(-1), mcmc.state.key())
+        self.assertEqual(graph_key(reader.graph(300)), graph_key(mcmc.state.to_networkx(mcmc.markov_chain[200])))
+
+        #the values after the burn in are the ones the statistics were computed from
+        self.assertAlmostEqual(reader['total_edges'][100:].mean(), mcmc.avg_total_edges)
+        self.assertEqual(reader.accepted.sum(), len(reader.edges[reader.accepted]))
+        self.assertEqual(reader.edges[0], -1)
+
+    def test_skip_in_chunks(self):
+        mcmc = mcmc_graph(self.nodes, seed = 5)
+        mcmc.start_trace(self.path)
+        mcmc.run(300)
+        mcmc.stop_trace()
+
+        reader = trace_reader(self.path)
+        self.assertEqual(list(reader.states(250, chunk_size = 16)), mcmc.markov_chain[250:])
+
+    def test_replay_many_nodes(self):
+        #replaying works from the edges alone, nothing of size n**2 is allocated
+        n = 20000
+        nodes = [(i, 0) for i in range(n)]
+        initial = [i * n + i + 1 for i in range(100)]
+        with trace_writer(self.path, nodes, ['a'], initial) as writer:
+            for i, edge in enumerate([-1, 5 * n + 7, 3 * n + 4, 5 * n + 7, 19998 * n + 19999]):
+                writer.append(edge, edge >= 0, [i])
+
+        reader = trace_reader(self.path)
+        tracemalloc.start()
+        keys = list(reader.states())
+        self.assertLess(tracemalloc.get_traced_memory()[1], 10**6)
+        tracemalloc.stop()
+
+        expected = sorted(initial + [5 * n + 7])
+        self.assertEqual(np.frombuffer(keys[1], dtype = reader.key_dtype).tolist(), expected)
+        expected.remove(3 * n + 4)
+        self.assertEqual(np.frombuffer(keys[2], dtype = reader.key_dtype).tolist(), expected)
+        self.assertEqual(np.frombuffer(reader.state(-1), dtype = reader.key_dtype).tolist(), sorted(initial[:3] + initial[4:] + [19998 * n + 19999]))
+        self.assertEqual(keys[0], np.array(initial, dtype = reader.key_dtype).tobytes())
+
+    def test_unfinished_trace(self):
+        writer = trace_writer(self.path, self.nodes, ['a'], [0, 10], buffer_size = 4)
+        for i in range(10):
+            writer.append(-1, False, [i])
+
+        #only the flushed records are visible until the writer is closed
+        self.assertEqual(len(trace_reader(self.path)), 8)
+        writer.close()
+        self.assertEqual(list(trace_reader(self.path)['a']), list(range(10)))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pass